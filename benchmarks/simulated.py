@@ -0,0 +1,134 @@
+"""
+Simulated time benchmark - runs hours of the bot's scheduled activity against a SimulatedClock, and checks nothing was lost.
+
+A local stand-in for the Twitch IRC server accepts the login and counts the chat messages it receives.
+The bot's automated message timers run as the clock is advanced, and their messages go through the real outbox
+and its rate limit, so the writer thread has to keep up with simulated time. A burst bigger than the rate limit
+allows at once is then queued, and the clock advanced just far enough for all of it to be sent.
+
+Usage:
+    python benchmarks/simulated.py [HOURS]
+"""
+
+from time import perf_counter, time
+import threading
+import socket
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bot import TwitchBot
+from bot.clock import SimulatedClock
+
+# Minutes between automated messages
+TIMER = 5
+
+# Messages queued at once, and the rate limit they are sent within
+BURST = 100
+RATE_LIMIT = (20, 30)
+
+
+class StandIn:
+    """
+    This is a class for the stand-in IRC server, which welcomes the bot and counts the chat messages it sends.
+
+    Attributes:
+        server (socket): The listening socket.
+        counts (dict): The number of PRIVMSG lines received holding each text.
+        lock (Lock): Guards counts.
+    """
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.counts = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        conn, _ = self.server.accept()
+        buffer = b''
+        while True:
+            data = conn.recv(4096)
+            if not data:
+                return
+
+            buffer += data
+            *lines, buffer = buffer.split(b'\r\n')
+            for line in lines:
+                if line.startswith(b'NICK '):
+                    conn.send(b':tmi.twitch.tv 001 benchbot :Welcome, GLHF!\r\n')
+                elif line.startswith(b'PRIVMSG '):
+                    text = line.split(b' :', 1)[1].decode()
+                    with self.lock:
+                        self.counts[text] = self.counts.get(text, 0) + 1
+
+    def count(self, text):
+        with self.lock:
+            return self.counts.get(text, 0)
+
+    def settle(self, text, expected, timeout=5):
+        """
+        This function waits for the last messages written to arrive.
+
+        Parameters:
+            text (string): The message text.
+            expected (int): The number of copies expected.
+            timeout (float): The most real seconds to wait.
+
+        Returns:
+            count (int): The number of copies received.
+        """
+
+        deadline = perf_counter() + timeout
+        while self.count(text) < expected and perf_counter() < deadline:
+            threading.Event().wait(0.01)
+
+        return self.count(text)
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    os.chdir(ROOT)
+    server = StandIn()
+    clock = SimulatedClock(epoch=time())
+    bot = TwitchBot('127.0.0.1', server.server.getsockname()[1], 'benchbot', 'oauth:benchmark', 'benchmark', '$', None, rate_limit=RATE_LIMIT, clock=clock)
+
+    # Start from a clean slate, whatever the data directory holds
+    bot.start_time = clock.time()
+    for timer in bot.auto_timers.values():
+        timer.cancel()
+    bot.auto_messages = {'Automated message': {'Timer': TIMER, 'LastTime': 0}}
+    bot.schedule_auto_message('Automated message')
+    bot.irc.outbox.start()
+
+    start = perf_counter()
+    clock.advance(hours * 3600)
+    expected = int(hours * 60 // TIMER)
+    sent = server.settle('Automated message', expected)
+    elapsed = perf_counter() - start
+    print(f'{hours:g} simulated hours in {elapsed:.2f}s: {sent}/{expected} automated messages sent')
+
+    for i in range(BURST):
+        bot.irc.send_channel('Burst message')
+
+    capacity, seconds = RATE_LIMIT
+    # What the window has room for goes straight away, then a window's worth every window, with a second left to spare
+    needed = -(-(BURST - bot.irc.limiter.available()) // capacity) * seconds + 1
+    start = perf_counter()
+    clock.advance(needed)
+    burst = server.settle('Burst message', BURST)
+    elapsed = perf_counter() - start
+    print(f'Burst of {BURST} within {capacity} per {seconds}s, over {needed:g} simulated seconds in {elapsed:.2f}s: {burst}/{BURST} sent')
+
+    bot.irc.outbox.stop()
+    if sent != expected or burst != BURST:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
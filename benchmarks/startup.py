@@ -0,0 +1,78 @@
+"""
+Startup benchmark - measures the time from starting a bot process to it joining the channel.
+
+A local stand-in for the Twitch IRC server accepts the login, and each run starts a fresh
+Python process which constructs a TwitchBot against it. The clock starts just before the
+process is spawned and stops when the server receives the JOIN line.
+
+Usage:
+    python benchmarks/startup.py [RUNS]
+"""
+
+from statistics import median
+from time import perf_counter
+import subprocess
+import socket
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The bot process - the metrics endpoint is left off so runs don't fight over its port
+CHILD = '''
+import sys
+from bot import TwitchBot
+TwitchBot('127.0.0.1', sys.argv[1], 'benchbot', 'oauth:benchmark', 'benchmark', '$', None)
+'''
+
+
+def time_to_join(server):
+    """
+    This function starts one bot process and times how long it takes to join the channel.
+
+    Parameters:
+        server (socket): The listening socket of the stand-in IRC server.
+
+    Returns:
+        elapsed (float): The seconds from spawning the process to receiving JOIN.
+    """
+
+    start = perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', CHILD, str(server.getsockname()[1])], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    conn, _ = server.accept()
+    buffer = b''
+    welcomed = False
+    try:
+        while True:
+            data = conn.recv(4096)
+            if not data:
+                raise RuntimeError('Bot disconnected before joining.')
+
+            buffer += data
+            if b'NICK ' in buffer and not welcomed:
+                conn.send(b':tmi.twitch.tv 001 benchbot :Welcome, GLHF!\r\n')
+                welcomed = True
+
+            if b'\r\nJOIN ' in buffer:
+                return perf_counter() - start
+    finally:
+        conn.close()
+        child.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    times = [time_to_join(server) for _ in range(runs)]
+    server.close()
+
+    print(f'Process start to JOIN over {runs} runs: min {min(times) * 1000:.1f}ms, median {median(times) * 1000:.1f}ms, max {max(times) * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
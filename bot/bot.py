@@ -1,14 +1,40 @@
 from .irc import TwitchIrc
-from time import sleep
+from .metrics import Metrics, MetricsServer
+from .tracing import Tracer
+from .profiling import Profiler, KINDS
+from .logs import Demojized
+from .checkpoint import Checkpoint
+from .clock import CLOCK
+from .pipeline import Pipeline
+from .moderation import Moderator
+from .history import History
+from .presence import Presence
+from .loyalty import Loyalty
+from .raffle import Raffle
+from .templates import Templates
+from .events import EventStream
+from .registry import Registry
+from .listings import Listings, paginate, PAGES_PER_REQUEST
+from .outbox import BULK
+from .overload import OverloadController, NORMAL, EXTRAS, COMMANDS
+from time import sleep, perf_counter
 import logging
 from sys import exit
 import json
 from random import randint, sample
 import operator
+import math
 from traceback import format_exception_only
-import emoji
-from datetime import datetime, timedelta
+from datetime import datetime
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import signal
+import os
+
+# Data files are found relative to the package, so the bot can be started from any directory
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+POLL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'poll.json')
 
 class TwitchBot:
 	"""
@@ -21,16 +47,32 @@ class TwitchBot:
 			title (string): The title of the poll.
 			choices (list): A list of strings representing options on the poll.
 			random (boolean): Whether or not randomized/arbitrary voting is allowed (just for fun).
-		start_time (datetime): The time at which the bot is started. Used for automated messaging.
+		start_time (float): The time at which the bot is started, in seconds since the epoch. Used for automated messaging, and restored from the checkpoint.
+		launch_time (float): The time at which this run of the bot started, in seconds since the epoch. Used for {uptime}, so time spent down isn't counted.
+		clock (Clock): The source of time, whose timers send automated messages and start presence snapshots and loyalty rounds.
+		auto_timers (dict): The timer of each automated message.
 		permission_values (dict): The numeric value assigned to different Twitch badges for easy comparison.
 		command_map (dict): A dictionary with command names and their corresponding functions. Acts as a switch statement for evaluating command messages.
 		admins (list): A list of users who do not need badge permissions to control the bot.
 		custom_commands (dict): A dictionary of custom prefixed commands and their responses.
 		auto_replies (dist): A dictionary of messages to automatically reply to.
 		auto_messages (dict): A dictionary of messages to send every _ minutes.
+		metrics (Metrics): The counters and histograms describing the bot's activity.
+		metrics_server (MetricsServer): The HTTP endpoint serving metrics, or None if disabled.
+		command_metrics (dict): A dictionary of command names and their (count, latency) metrics, cached for the hot path.
+		tracer (Tracer): Samples per-message traces and keeps the most recent ones.
+		profiler (Profiler): Runs cpu, sampling, and memory profiles on demand.
+		checkpoint (Checkpoint): Saves the running poll and scheduled message timers, so a restart doesn't lose them. Votes go to its journal.
+		unsynced_replies (list): The (user, message) replies to send once the checkpoint journal is synced - see sync_checkpoint.
+		pipeline (Pipeline): Receives and parses messages on their own threads, ahead of the bot's loop.
+		shard (int): The number of this worker process when the channels are split between several, or None.
+		shared_poll (SharedPoll): A poll shared with the other worker processes, or None if polls are local.
+		listings (Listings): The cached pages of the reply, schedule and command listings.
+		overload (OverloadController): Decides what work to shed when chat arrives too fast, or None to never shed work.
+		plugins (Registry): The plugins, whose commands are in command_map, and which are loaded the first time they are needed.
 	"""
 
-	def __init__(self, url, port, user, token, chan, prefix):
+	def __init__(self, url, port, user, token, chan, prefix, metrics_port=None, trace_sample_rate=0.0, checkpoint_interval=0, parse_processes=0, queue_size=10000, queue_policy='block', rate_limit=(20, 30), moderation=None, history_size=20, history_users=10000, presence_interval=300, presence_snapshots=12, loyalty_interval=0, loyalty_points=(10, 5), raffle_weights=(1, 2, 3, 4), count_interval=60, event_socket=None, senders=(), overload=None, plugins=None, clock=None, shard=None, shared_poll=None):
 		"""
 		The constructor for the TwitchBot class.
 
@@ -39,18 +81,112 @@ class TwitchBot:
             port (string or int): The IRC address port - typically = 6667
             user (string): The bot account's username.
             token (string): The 'oauth:' prepended string of characters used for the bot account password.
-            chan (string): The lowercase username of the Twitch channel to connect to.
+            chan (string or list): The lowercase username of the Twitch channel to connect to, or a list of them.
 			prefix (string): The command prefix to signify the beginning of a command message.
+			metrics_port (string or int): The local port to serve Prometheus metrics on, or None to disable the endpoint.
+			trace_sample_rate (float): The fraction of messages to trace, from 0 to 1.
+			checkpoint_interval (float): The minimum number of seconds between checkpoint writes. 0 writes after every change.
+			parse_processes (int): The number of worker processes to parse messages in, or 0 to parse them on a thread.
+			queue_size (int): The number of messages each pipeline queue can hold.
+			queue_policy (string): What a full pipeline queue does - 'block', 'drop_newest', or 'drop_oldest'.
+			rate_limit (tuple): The number of messages which may be sent, and in how many seconds.
+			moderation (dict): Settings for timing out spammers - see bot/moderation.py - or None to turn moderation off.
+			history_size (int): The number of recent messages remembered per user, for the history command.
+			history_users (int): The number of users whose recent messages are remembered at once.
+			presence_interval (float): The seconds between snapshots of who is in each channel.
+			presence_snapshots (int): The number of snapshots kept per channel.
+			loyalty_interval (float): The seconds between rounds of loyalty points, or 0 to turn loyalty points off.
+			loyalty_points (tuple): The points everyone present earns each round, and the extra points anyone who chatted earns.
+			raffle_weights (tuple): The raffle tickets of users who aren't subscribed, then of tier 1, 2 and 3 subscribers.
+			count_interval (float): The minimum number of seconds between writes of how often each custom command was used.
+			event_socket (string): The Unix domain socket file to publish parsed messages and events on - see bot/events.py - or None to turn it off.
+			senders (list): The (username, token) of each extra account to send messages with, to share out the rate limit.
+			overload (dict): Settings for shedding work when chat arrives too fast - see bot/overload.py - or None to never shed work.
+			plugins (list): The names of the plugin modules to use - see bot/plugins - or None for every module in bot/plugins.
+			clock (Clock): The source of time and timers for everything in the bot - see bot/clock.py. A SimulatedClock makes timing deterministic for tests.
+			shard (int): The number of this worker process when the channels are split between several, or None.
+			shared_poll (SharedPoll): A poll shared with the other worker processes, or None to keep polls local.
 		"""
 
-		self.irc = TwitchIrc(url, port, user, token, chan)
-		self.irc.connect()
+		self.clock = clock or CLOCK
+		self.metrics = Metrics()
+		self.command_count = self.metrics.counter('twitchbot_commands_total', 'Commands handled.', ('command',))
+		self.command_latency = self.metrics.histogram('twitchbot_command_latency_seconds', 'Time spent handling a command.', ('command',))
+		self.loop_errors = self.metrics.counter('twitchbot_loop_errors_total', 'Exceptions caught by the main loop.')
+		self.moderation_actions = self.metrics.counter('twitchbot_moderation_actions_total', 'Timeouts issued for breaking a moderation rule.', ('rule',))
+		shed = self.metrics.counter('twitchbot_shed_total', 'Work skipped because the bot was overloaded.', ('work',))
+		self.shed = {work: shed.labels(work) for work in ('events', 'loyalty', 'auto_reply', 'command')}
+		self.command_metrics = {}
+
+		self.metrics_server = None
+		if metrics_port:
+			self.metrics_server = MetricsServer(self.metrics, metrics_port)
+
+		self.tracer = Tracer(trace_sample_rate)
+
+		self.events = None
+		if event_socket:
+			# Each shard publishes on its own socket
+			self.events = EventStream(event_socket if shard is None else f'{event_socket}-{shard}', self.metrics, clock=self.clock)
+
+		self.irc = TwitchIrc(url, port, user, token, chan, self.metrics, self.tracer, rate_limit, senders, self.clock)
+		self.moderator = Moderator(moderation, self.clock) if moderation is not None else None
+		self.overload = None
+		if overload is not None:
+			self.overload = OverloadController(overload, self.clock)
+			self.metrics.gauge_callback('twitchbot_overload_stage', 'Stage of work shedding - 0 normal, 1 extras, 2 commands.', lambda: self.overload.stage)
+			self.metrics.gauge_callback('twitchbot_overload_lag_seconds', 'Seconds behind Twitch the last batch of messages was.', lambda: self.overload.lag)
+		self.chat_history = History(history_size, history_users, self.clock)
+		self.presence = Presence(presence_snapshots, self.clock)
+		self.clock.call_every(presence_interval, self.presence.snapshot)
+		self.raffles = {}
+		self.plugins = Registry(self, plugins)
+		self.current_tags = {}
+		self.raffle_weights = raffle_weights
+		self.loyalty = None
+		if loyalty_interval:
+			self.loyalty = Loyalty(os.path.join(DATA_DIR, 'loyalty.db'), *loyalty_points)
+			self.clock.call_every(loyalty_interval, lambda: self.loyalty.accrue(self.presence.channels, [self.irc.user]))
+
+		# Load the data files and start the metrics endpoint while waiting on the network to connect and log in
+		with ThreadPoolExecutor(max_workers=2) as pool:
+			startup = [pool.submit(self.read_data_files)]
+			if self.metrics_server:
+				startup.append(pool.submit(self.metrics_server.start))
+
+			self.irc.connect()
+			# Sender accounts log in on their own threads, and join the pool as they connect
+			for sender in self.irc.senders:
+				sender.start()
+
+			for task in startup:
+				task.result()
 
 		self.prefix = prefix
+		self.shard = shard
+		self.shared_poll = shared_poll
 		self.current_poll = {'open': False}
-		self.start_time = datetime.now()
+		self.unsynced_replies = []
+		self.start_time = self.launch_time = self.clock.time()
+
+		checkpointFile = 'state.checkpoint' if shard is None else f'state-{shard}.checkpoint'
+		self.checkpoint = Checkpoint(os.path.join(DATA_DIR, checkpointFile), checkpoint_interval, self.clock)
+		self.restore_checkpoint()
+
+		self.auto_timers = {}
+		for msg in self.auto_messages:
+			self.schedule_auto_message(msg)
 
-		self.read_data_files()
+		countsFile = 'counts.checkpoint' if shard is None else f'counts-{shard}.checkpoint'
+		self.templates = Templates(Checkpoint(os.path.join(DATA_DIR, countsFile), count_interval, self.clock), self.clock)
+		self.listings = Listings()
+
+		self.pipeline = Pipeline(self.irc, self.metrics, parse_processes, queue_size, queue_policy)
+
+		self.profiler = Profiler()
+		# Signal handlers can only be installed from the main thread, and SIGUSR1 doesn't exist on Windows
+		if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+			signal.signal(signal.SIGUSR1, self.toggle_profile)
 		
 		self.permission_values = {
 			'broadcaster': 4,
@@ -74,12 +210,19 @@ class TwitchBot:
 
 		self.command_map = {}
 		for command, aliases in commands.items():
+			function = getattr(self, command, None)
+			if not callable(function):
+				raise ValueError(f'Unknown command "{command}" in commands.json')
+
 			for alias in aliases:
-				self.command_map[alias] = eval(f'self.{command}')
+				if alias in self.command_map:
+					logging.warning(f'Command alias "{alias}" is listed for both {self.command_map[alias].__name__} and {command}, using {command}.')
+				self.command_map[alias] = function
 
 	def read_data_files(self):
 		"""
 		This function opens and stores the contents of multiple files within the data directory.
+		It runs on a worker thread during startup, alongside the IRC connection.
 
 		Parameters:
 			None
@@ -88,27 +231,28 @@ class TwitchBot:
 			None
 		"""
 
-		with open('bot/data/admins.json') as f:
+		with open(os.path.join(DATA_DIR, 'admins.json')) as f:
 			self.admins = json.load(f)
 
-		with open('bot/data/custom_commands.json') as f:
+		with open(os.path.join(DATA_DIR, 'custom_commands.json')) as f:
 			self.custom_commands = json.load(f)
 
-		with open('bot/data/auto_replies.json') as f:
+		with open(os.path.join(DATA_DIR, 'auto_replies.json')) as f:
 			self.auto_replies = json.load(f)
 
-		with open('bot/data/auto_messages.json') as f:
+		with open(os.path.join(DATA_DIR, 'auto_messages.json')) as f:
 			self.auto_messages = json.load(f)
 
-		with open('bot/data/commands.json') as f:
+		with open(os.path.join(DATA_DIR, 'commands.json')) as f:
 			commands = json.load(f)
 		self.generate_command_map(commands)
+		self.plugins.install(self.command_map)
 
 	def run(self):
 		"""
 		This function is the main driver for the TwitchBot class.
-		It constantly receives message from the IRC and parses them.
-		It also checks if it is time to send an automated message, and replies to messages in self.auto_replies.
+		It starts the pipeline which receives and parses messages from the IRC, then dispatches the parsed messages.
+		It also runs the clock's timers, such as automated messages, at least once a second.
 
 		Parameters:
 			None
@@ -117,29 +261,254 @@ class TwitchBot:
 			None
 		"""
 
+		self.irc.outbox.start()
+		if self.events:
+			self.events.start()
+		self.pipeline.start()
+
 		while True:
 			try:
-				messages = self.irc.recv_messages()
-				if messages:
-					for msg in messages:
-						if msg:
-							if msg['message'].startswith(self.prefix):
-								msg['message'] = msg['message'][1:]
-								self.handle_command(msg)
-							elif msg['message'] in self.auto_replies:
-								logging.info(f'Replying to {msg["message"]}...')
-								self.irc.send_channel(self.auto_replies[msg['message']])
-
-				minsPassed = round((datetime.now() - self.start_time).total_seconds() / 60)
-				for autoMessage, timeInfo in self.auto_messages.items():
-					if minsPassed % timeInfo['Timer'] == 0 and minsPassed - timeInfo['LastTime'] >= timeInfo['Timer']:
-						timeInfo['LastTime'] = minsPassed
-						self.irc.send_channel(autoMessage)
+				batch = self.pipeline.get_batch()
+				if self.overload:
+					self.overload.observe(batch, self.pipeline.depth())
+
+				for msg in batch:
+					self.dispatch(msg)
+				self.sync_checkpoint()
+
+				if self.shared_poll and self.shared_poll.generation.value != self.current_poll.get('generation'):
+					self.adopt_shared_poll()
+
+				self.clock.run_due()
+
+				if self.checkpoint.due():
+					self.save_checkpoint()
+				self.templates.flush()
+
+				if self.profiler.active and self.profiler.due():
+					self.finish_profile()
 			except (KeyboardInterrupt, SystemExit):
+				if self.checkpoint.dirty:
+					self.save_checkpoint()
+				self.checkpoint.close()
+				self.templates.flush(force=True)
 				raise
 			except Exception as e:
+				self.loop_errors.inc()
 				logging.fatal(f'Exception Caught: {" ".join(format_exception_only(type(e), e))}')
 
+	def dispatch(self, msg):
+		"""
+		This function handles a single parsed message.
+		It runs commands, replies to messages in self.auto_replies, and passes Twitch events on to handle_event.
+		While overloaded, auto replies, loyalty points for chatting and the event stream are skipped first, then commands from users who aren't moderators.
+		An exception is logged and only loses this message, not the rest of its batch.
+
+		Parameters:
+			msg (dict): The parsed message.
+
+		Returns:
+			None
+		"""
+
+		try:
+			trace = msg.get('trace')
+			self.tracer.current = trace
+			if trace:
+				trace.mark('dispatch')
+
+			# Reply in the channel the message came from
+			self.irc.channel = msg['channel']
+
+			stage = self.overload.stage if self.overload else NORMAL
+
+			if self.events and self.events.consumers:
+				if stage >= EXTRAS:
+					self.shed['events'].inc()
+				else:
+					self.events.publish(msg)
+
+			if msg['command'] != 'PRIVMSG':
+				self.handle_event(msg)
+			else:
+				# Commands which need more than the user and their badges, such as their user-id, read the tags from here
+				self.current_tags = msg['tags']
+				self.chat_history.add(msg)
+				if self.loyalty:
+					if stage >= EXTRAS:
+						self.shed['loyalty'].inc()
+					else:
+						self.loyalty.chat(msg['channel'], msg['user'])
+
+				if self.moderator and self.moderate(msg):
+					# The sender was timed out, so their message isn't acted on
+					pass
+				elif msg['message'].startswith(self.prefix):
+					if stage >= COMMANDS and not self.has_permission(msg['user'], msg['badges']):
+						self.shed['command'].inc()
+					else:
+						msg['message'] = msg['message'][1:]
+						self.handle_command(msg)
+				elif msg['message'] in self.auto_replies:
+					if stage >= EXTRAS:
+						self.shed['auto_reply'].inc()
+					else:
+						logging.info(f'Replying to {msg["message"]}...')
+						self.irc.send_channel(self.auto_replies[msg['message']])
+
+			if trace:
+				trace.mark('handler')
+				self.tracer.finish(trace)
+		except Exception as e:
+			self.loop_errors.inc()
+			logging.fatal(f'Exception Caught: {" ".join(format_exception_only(type(e), e))}')
+
+	def handle_event(self, event):
+		"""
+		This function handles a Twitch event other than a chat message.
+		CLEARCHAT and CLEARMSG mark the removed messages in self.chat_history, and MEMBERSHIP events update self.presence.
+		Every event is then passed on to any plugins subscribed to it.
+
+		Parameters:
+			event (dict): The parsed event, from parse_event.
+
+		Returns:
+			None
+		"""
+
+		if event['command'] == 'MEMBERSHIP':
+			self.presence.apply(event)
+
+			if event['complete']:
+				logging.info(f'{self.presence.count(event["channel"])} users are in {event["channel"]}.')
+		elif event['command'] in ('CLEARCHAT', 'CLEARMSG'):
+			self.chat_history.apply(event)
+
+			if event['command'] == 'CLEARCHAT' and event['target']:
+				duration = event['tags'].get('ban-duration')
+				logging.info(f'{event["target"]} was {f"timed out for {duration} seconds" if duration else "banned"} in {event["channel"]}.')
+
+		self.plugins.publish(event)
+
+	def moderate(self, msg):
+		"""
+		This function checks a message against the moderation rules, and times out its sender if it breaks one.
+
+		Parameters:
+			msg (dict): The parsed message.
+
+		Returns:
+			timedOut (bool): True if the sender was timed out, in which case the message is otherwise ignored.
+		"""
+
+		action = self.moderator.check(msg['user'], msg['message'], msg['badges'], msg['emotes'])
+		if msg.get('trace'):
+			msg['trace'].mark('moderate')
+
+		if not action:
+			return False
+
+		rule, seconds, reason = action
+		self.irc.timeout(msg['user'], seconds, reason)
+		self.moderation_actions.labels(rule).inc()
+		logging.info(f'Timed out {msg["user"]} in {msg["channel"]} for {seconds} seconds. ({rule})')
+
+		return True
+
+	def adopt_shared_poll(self):
+		"""
+		This function picks up a poll created or closed by another shard.
+		A new poll clears this shard's votes. A poll restored from the checkpoint with the same generation keeps them.
+
+		Parameters:
+			None
+
+		Returns:
+			None
+		"""
+
+		generation, poll = self.shared_poll.read()
+		if poll is None or generation == self.current_poll.get('generation'):
+			return
+
+		if poll['open']:
+			self.current_poll = {**poll, 'votes': {}, 'generation': generation}
+			self.shared_poll.reset(self.shard)
+			logging.info(f'Opened shared poll: {self.current_poll}')
+		else:
+			self.current_poll['open'] = False
+			self.current_poll['generation'] = generation
+			logging.info('Shared poll closed.')
+
+		self.save_checkpoint()
+
+	def sync_checkpoint(self):
+		"""
+		This function syncs the checkpoint journal to disk, then sends the replies which were waiting on it,
+		so nothing is acknowledged in chat before it would survive a crash. Syncing once per batch keeps busy polls cheap.
+
+		Parameters:
+			None
+
+		Returns:
+			None
+		"""
+
+		if not self.unsynced_replies and not self.checkpoint.unsynced:
+			return
+
+		self.checkpoint.sync()
+
+		replies, self.unsynced_replies = self.unsynced_replies, []
+		for user, message in replies:
+			self.irc.send_private(user, message)
+
+	def save_checkpoint(self):
+		"""
+		This function writes the running poll and scheduled message timers to the checkpoint file.
+
+		Parameters:
+			None
+
+		Returns:
+			None
+		"""
+
+		self.checkpoint.save({
+			'start_time': self.start_time,
+			'poll': self.current_poll,
+			'last_times': {msg: timeInfo['LastTime'] for msg, timeInfo in self.auto_messages.items()}
+		})
+
+	def restore_checkpoint(self):
+		"""
+		This function restores the state saved by the last run, if there is any.
+		The original start time is kept, so scheduled messages carry on their timers instead of all firing at once.
+
+		Parameters:
+			None
+
+		Returns:
+			None
+		"""
+
+		state = self.checkpoint.load()
+		if not state:
+			return
+
+		self.start_time = state['start_time']
+		self.current_poll = state['poll']
+
+		for record in self.checkpoint.replay():
+			if record[0] == 'vote':
+				self.current_poll['votes'][record[1]] = record[2]
+
+		for msg, lastTime in state['last_times'].items():
+			if msg in self.auto_messages:
+				self.auto_messages[msg]['LastTime'] = lastTime
+
+		logging.info(f'Restored checkpoint from {datetime.fromtimestamp(self.start_time)}. Poll open: {self.current_poll["open"]}')
+
 	def handle_command(self, data):
 		"""
 		This function executes the command given by a user message.
@@ -160,10 +529,40 @@ class TwitchBot:
 
 		command = args.pop(0).lower()
 
+		start = perf_counter()
+
 		if command in self.custom_commands:
-			self.irc.send_channel(self.custom_commands[command])
+			name = 'custom'
+			self.irc.send_channel(self.templates.render(command, self.custom_commands[command], user, args, self.launch_time))
 		else:
-			self.command_map.get(command, self.unknown_command)(user, badges, args)
+			function = self.command_map.get(command, self.unknown_command)
+			name = function.__name__
+			function(user, badges, args)
+
+		self.record_command(name, perf_counter() - start)
+
+		if self.tracer.current:
+			self.tracer.current.label = name
+
+	def record_command(self, name, elapsed):
+		"""
+		This function records the count and latency of a handled command.
+		Commands are labelled by their function name rather than the alias used, so the number of label values stays small.
+
+		Parameters:
+			name (string): The name of the function which handled the command.
+			elapsed (float): The time spent handling the command, in seconds.
+
+		Returns:
+			None
+		"""
+
+		metrics = self.command_metrics.get(name)
+		if metrics is None:
+			metrics = self.command_metrics[name] = (self.command_count.labels(name), self.command_latency.labels(name))
+
+		metrics[0].inc()
+		metrics[1].observe(elapsed)
 
 	def unknown_command(self, user, badges, args):
 		"""
@@ -221,6 +620,22 @@ class TwitchBot:
 
 		logging.info(f'Received DISCONNECT command from {user}')
 
+		self.sync_checkpoint()
+		if self.checkpoint.dirty:
+			self.save_checkpoint()
+		self.checkpoint.close()
+		self.templates.flush(force=True)
+
+		self.pipeline.stop()
+		if self.loyalty:
+			self.loyalty.close()
+		self.plugins.close()
+		if self.events:
+			self.events.stop()
+		if self.metrics_server:
+			self.metrics_server.stop()
+		self.irc.outbox.flush()
+		self.irc.outbox.stop()
 		self.irc.close()
 
 		logging.debug(f'Disconnected from IRC Server. ({self.irc.url}:{self.irc.port})')
@@ -249,7 +664,7 @@ class TwitchBot:
 
 		message = ' '.join(args)
 
-		logging.info(f'Received ECHO command from {user}: "{emoji.demojize(message)}"')
+		logging.info('Received ECHO command from %s: "%s"', user, Demojized(message))
 
 		self.irc.send_channel(message)
 
@@ -305,24 +720,39 @@ class TwitchBot:
 		try:
 			if args[0].lower() == 'auto':
 				# Generate a poll using the input file
-				with open('poll.json') as f:
+				with open(POLL_FILE) as f:
 					new_poll = json.load(f)
 			else:
 				# Rejoin the args and use them to generate a poll
 				args = ' '.join(args)
 				new_poll = json.loads(args)
 
-			self.current_poll['title'] = new_poll['title']
-			self.current_poll['random'] = new_poll['random']
-			self.current_poll['votes'] = {}
-			self.current_poll['choices'] = new_poll['choices']
+			# Built aside, so a poll which can't be opened leaves the running one as it was
+			poll = {
+				'title': new_poll['title'],
+				'random': new_poll['random'],
+				'votes': {},
+				'choices': new_poll['choices'],
+				'open': True
+			}
 
-			if not self.current_poll['choices']:
+			if not poll['choices']:
 				return self.irc.send_private(user, 'Error creating poll - "choices" must have some elements.')
 
 			logging.info(f'Received command POLL CREATE from {user}')
 
-			self.current_poll['open'] = True
+			if self.shared_poll:
+				# Checks the poll fits in shared memory before publishing anything
+				try:
+					poll['generation'] = self.shared_poll.publish(poll)
+				except ValueError as e:
+					return self.irc.send_private(user, f'Error creating poll - {e}')
+				self.shared_poll.reset(self.shard)
+
+			self.current_poll = poll
+
+			# Votes are journaled against the snapshot, so the poll they belong to is written straight away
+			self.save_checkpoint()
 
 			logging.info(f'Opened poll: {self.current_poll}')
 
@@ -351,11 +781,18 @@ class TwitchBot:
 
 		# Close the poll
 		self.current_poll['open'] = False
+		self.save_checkpoint()
 
 		# Calculate the winner
 		games = {i : 0 for i in range(len(self.current_poll['choices']))}
-		for choice in self.current_poll['votes'].values():
-			games[choice - 1] += 1
+		if self.shared_poll:
+			# Count the votes from every shard, and let the other shards know the poll has closed
+			for i, count in enumerate(self.shared_poll.totals(len(games))):
+				games[i] = count
+			self.current_poll['generation'] = self.shared_poll.publish(self.current_poll)
+		else:
+			for choice in self.current_poll['votes'].values():
+				games[choice - 1] += 1
 
 		ranking = {}
 		displayList = {game : count for game, count in zip(self.current_poll['choices'], games.values())}
@@ -438,11 +875,17 @@ class TwitchBot:
 			if pick <= 0 or pick > len(self.current_poll['choices']):
 				return self.irc.send_private(user, 'Error - your choice must be in the list of options!')
 
+			previous = self.current_poll['votes'].get(user)
 			self.current_poll['votes'][user] = pick
+			self.checkpoint.append(('vote', user, pick))
+
+			if self.shared_poll:
+				self.shared_poll.vote(self.shard, previous, pick)
 
 			logging.info(f'Received command VOTE from {user}: {pick}')
-			
-			self.irc.send_private(user, 'Your vote has been receieved.')
+
+			# Acknowledged once the journal is synced, after the batch
+			self.unsynced_replies.append((user, 'Your vote has been receieved.'))
 		except:
 			self.irc.send_private(user, 'Error - invalid choice!')
 
@@ -473,7 +916,7 @@ class TwitchBot:
 		elif function == 'delete':
 			self.delete_reply(user, args)
 		elif function == 'display':
-			self.display_reply(user)
+			self.display_reply(user, args)
 		else:
 			self.irc.send_private(user, f'Error - unknown argument {function}. Try [create | display | delete] instead.')
 
@@ -500,8 +943,9 @@ class TwitchBot:
 			return self.irc.send_private(user, 'Error - two | separated arguments required.')
 
 		self.auto_replies[args[0]] = args[1]
+		self.listings.invalidate('replies')
 
-		with open('bot/data/auto_replies.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'auto_replies.json'), 'w') as f:
 			json.dump(self.auto_replies, f)
 
 		logging.info(f'Received command REPLY CREATE from {user}: {args[0]}: {args[1]}')
@@ -528,38 +972,35 @@ class TwitchBot:
 
 		args = ' '.join(args).split(' | ')
 
+		self.listings.invalidate('replies')
 		for msg in args:
 			response = self.auto_replies.pop(msg, None)
 
 			if response:
 				logging.info(f'Recevied command REPLY DELETE from {user}: {msg}: {response}')
 
-		with open('bot/data/auto_replies.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'auto_replies.json'), 'w') as f:
 			json.dump(self.auto_replies, f)
 
-	def display_reply(self, user):
+	def display_reply(self, user, args):
 		"""
-		This function displays all message-response data.
+		This function displays all message-response data, a few pages at a time.
 
 		Parameters:
 			user (string): The user who called the command.
+			args (list): A list of strings sent by the user along with their command, which may hold a page number.
 
 		Returns:
 			None
 		"""
 
-		displayString = ''
-		for msg, rply in self.auto_replies.items():
-			displayString += f'{msg}: {rply} | '
-
-		displayString = displayString[:-3]
-
-		if not displayString:
-			displayString = 'Error - No replies to display.'
+		logging.info(f'Recevied command REPLY DISPLAY from {user}')
 
-		self.irc.send_private(user, displayString)
+		if not self.auto_replies:
+			return self.irc.send_private(user, 'Error - No replies to display.')
 
-		logging.info(f'Recevied command REPLY DISPLAY from {user}')
+		pages = self.listings.get('replies', lambda: [f'{msg}: {rply}' for msg, rply in self.auto_replies.items()])
+		self.send_pages(user, 'reply display', pages, args)
 
 	def schedule(self, user, badges, args):
 		"""
@@ -588,7 +1029,7 @@ class TwitchBot:
 		elif function == 'delete':
 			self.delete_schedule(user, args)
 		elif function == 'display':
-			self.display_schedule(user)
+			self.display_schedule(user, args)
 		else:
 			self.irc.send_private(user, f'Error - unknown argument {function}. Try [create | display | end] instead.')
 
@@ -628,6 +1069,8 @@ class TwitchBot:
 			}
 		except:
 			self.irc.send_private(user, 'Error creating scheduled message - use two | separated arguments.')
+		self.listings.invalidate('schedules')
+		self.schedule_auto_message(args[0])
 
 		# Create a deep copy for json writing purposes.
 		# We don't want to interfere with established LastTime values.
@@ -635,11 +1078,50 @@ class TwitchBot:
 		for msg in autoMsgs:
 			autoMsgs[msg]['LastTime'] = 0
 
-		with open('bot/data/auto_messages.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'auto_messages.json'), 'w') as f:
 			json.dump(autoMsgs, f)
 
 		logging.info(f'Received command SCHEDULE CREATE from {user}: {args[0]}: {args[1]}')
 
+	def schedule_auto_message(self, msg):
+		"""
+		This function starts the timer which sends an automated message, replacing any it already had.
+		It is sent every Timer minutes since the bot started, skipping any time less than Timer minutes after it was last sent,
+		so a restart carries on where the last run left off.
+
+		Parameters:
+			msg (string): The automated message, which must be in self.auto_messages.
+
+		Returns:
+			None
+		"""
+
+		if msg in self.auto_timers:
+			self.auto_timers.pop(msg).cancel()
+
+		timeInfo = self.auto_messages[msg]
+		period = timeInfo['Timer'] * 60
+		elapsed = self.clock.time() - self.start_time
+		due = max(math.ceil(elapsed / period), math.ceil(timeInfo['LastTime'] / timeInfo['Timer']) + 1) * period
+
+		self.auto_timers[msg] = self.clock.call_every(period, self.send_auto_message, msg, first=self.start_time + due - self.clock.time())
+
+	def send_auto_message(self, msg):
+		"""
+		This function sends an automated message to every channel. It is called by the message's timer.
+
+		Parameters:
+			msg (string): The automated message.
+
+		Returns:
+			None
+		"""
+
+		self.auto_messages[msg]['LastTime'] = round((self.clock.time() - self.start_time) / 60)
+		self.checkpoint.mark()
+		for channel in self.irc.channels:
+			self.irc.send_channel(msg, channel)
+
 	def delete_schedule(self, user, args):
 		"""
 		This function deletes a scheduled message.
@@ -659,8 +1141,12 @@ class TwitchBot:
 
 		args = ' '.join(args).split(' | ')
 
+		self.listings.invalidate('schedules')
 		for msg in args:
 			timeData = self.auto_messages.pop(msg, None)
+			timer = self.auto_timers.pop(msg, None)
+			if timer:
+				timer.cancel()
 
 			if timeData:
 				logging.info(f'Recevied command SCHEDULE DELETE from {user}: {msg}: {timeData["Timer"]}')
@@ -671,32 +1157,28 @@ class TwitchBot:
 		for msg in autoMsgs:
 			autoMsgs[msg]['LastTime'] = 0
 
-		with open('bot/data/auto_messages.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'auto_messages.json'), 'w') as f:
 			json.dump(autoMsgs, f)
 
-	def display_schedule(self, user):
+	def display_schedule(self, user, args):
 		"""
-		This function displays all scheduled message data.
+		This function displays all scheduled message data, a few pages at a time.
 
 		Parameters:
 			user (string): The user who called the command.
+			args (list): A list of strings sent by the user along with their command, which may hold a page number.
 
 		Returns:
 			None
 		"""
 
-		displayString = ''
-		for msg, timeData in self.auto_messages.items():
-			displayString += f'{msg}: {timeData["Timer"]} | '
-
-		displayString = displayString[:-3]
-
-		if not displayString:
-			displayString = 'Error - No schedules to display.'
+		logging.info(f'Received command SCHEDULE DISPLAY from {user}')
 
-		self.irc.send_private(user, displayString)
+		if not self.auto_messages:
+			return self.irc.send_private(user, 'Error - No schedules to display.')
 
-		logging.info(f'Received command SCHEDULE DISPLAY from {user}')
+		pages = self.listings.get('schedules', lambda: [f'{msg}: {timeData["Timer"]}' for msg, timeData in self.auto_messages.items()])
+		self.send_pages(user, 'schedule display', pages, args)
 
 	def command(self, user, badges, args):
 		"""
@@ -725,14 +1207,15 @@ class TwitchBot:
 		elif function == 'delete':
 			self.delete_command(user, args)
 		elif function == 'display':
-			self.display_command(user)
+			self.display_command(user, args)
 		else:
 			self.irc.send_private(user, f'Error - unknown argument {function}. Try [create | display | delete] instead.')
 
 	def create_command(self, user, args):
 		"""
-		This function creates a custom command.
+		This function creates a custom command, or replaces one with the same name.
 		Adds the command-response object to bot/data/custom_commands.json
+		The response may use variables, such as {user} - see bot/templates.py.
 
 		Parameters:
 			user (string): The user who called the command.
@@ -756,8 +1239,10 @@ class TwitchBot:
 		msg = ' '.join(args[1:])
 
 		self.custom_commands[cmd] = msg
+		self.templates.invalidate(cmd)
+		self.listings.invalidate('commands')
 
-		with open('bot/data/custom_commands.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'custom_commands.json'), 'w') as f:
 			json.dump(self.custom_commands, f)
 
 		logging.info(f'Received command COMMAND CREATE from {user}: {cmd}: {args[1:]}')
@@ -778,40 +1263,391 @@ class TwitchBot:
 		if not args:
 			return self.arg_missing_error(user, 'COMMAND DELETE', '{COMMAND}')
 
+		self.listings.invalidate('commands')
 		for cmd in args:
 			cmd = cmd.lower()
 
 			msg = self.custom_commands.pop(cmd, None)
+			self.templates.invalidate(cmd, forget=True)
 
 			if msg:
 				logging.info(f'Recevied command COMMAND DELETE from {user}: {cmd}: {msg}')
 
-		with open('bot/data/custom_commands.json', 'w') as f:
+		with open(os.path.join(DATA_DIR, 'custom_commands.json'), 'w') as f:
 			json.dump(self.custom_commands, f)
 
-	def display_command(self, user):
+	def display_command(self, user, args):
 		"""
-		This function displays all custom command data.
+		This function displays all custom command data, a few pages at a time.
 
 		Parameters:
 			user (string): The user who called the command.
+			args (list): A list of strings sent by the user along with their command, which may hold a page number.
 
 		Returns:
 			None
 		"""
 
-		displayString = ''
-		for cmd, res in self.custom_commands.items():
-			displayString += f'{cmd}: {res} | '
+		logging.info(f'Received command COMMAND DISPLAY from {user}')
 
-		displayString = displayString[:-3]
+		if not self.custom_commands:
+			return self.irc.send_private(user, 'Error - No commands to display.')
 
-		if not displayString:
-			displayString = 'Error - No commands to display.'
+		pages = self.listings.get('commands', lambda: [f'{cmd}: {res}' for cmd, res in self.custom_commands.items()])
+		self.send_pages(user, 'command display', pages, args)
 
-		self.irc.send_private(user, displayString)
+	def trace(self, user, badges, args):
+		"""
+		This function writes the most recent message traces to disk, and whispers the user a summary of them.
 
-		logging.info(f'Received command COMMAND DISPLAY from {user}')
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.has_permission(user, badges):
+			return self.permission_error(user, 'TRACE')
+
+		summary = self.tracer.summary()
+		if not summary:
+			return self.irc.send_private(user, f'Error - No traces recorded yet. Sample rate is {self.tracer.sample_rate}.')
+
+		path = self.tracer.dump()
+
+		logging.info(f'Received command TRACE from {user}: wrote {path}')
+
+		self.irc.send_private(user, f'{summary} (written to {path})')
+
+	def history(self, user, badges, args):
+		"""
+		This function whispers the user the most recent messages another user sent in this channel, newest first, and whether they were removed.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.has_permission(user, badges):
+			return self.permission_error(user, 'HISTORY')
+
+		if not args:
+			return self.arg_missing_error(user, 'history', '{USER}')
+
+		target = args[0].lstrip('@').lower()
+		entries = self.chat_history.get(self.irc.channel, target)
+
+		logging.info(f'Received command HISTORY from {user} for {target}')
+
+		if not entries:
+			return self.irc.send_private(user, f'Error - No recent messages from {target}.')
+
+		lines = []
+		for entry in reversed(entries):
+			line = f'[{datetime.fromtimestamp(entry.time / 1000):%H:%M:%S}] {entry.text}'
+			if entry.deleted:
+				line += f' ({entry.deleted})'
+			lines.append(line)
+		lines[0] = f'{target}: {lines[0]}'
+
+		self.send_pages(user, f'history {target}', paginate(lines), args[1:])
+
+	def chatters(self, user, badges, args):
+		"""
+		This function whispers the user how many users are in this channel, and how many were at the oldest snapshot.
+		Given a username, it says whether they are in the channel instead, or when they were last seen.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.has_permission(user, badges):
+			return self.permission_error(user, 'CHATTERS')
+
+		channel = self.irc.channel
+		logging.info(f'Received command CHATTERS from {user}')
+
+		if args:
+			target = args[0].lstrip('@').lower()
+			if self.presence.is_present(channel, target):
+				return self.irc.send_private(user, f'{target} is in {channel}.')
+
+			seen = self.presence.last_seen(channel, target)
+			if seen is None:
+				return self.irc.send_private(user, f'{target} is not in {channel}.')
+
+			return self.irc.send_private(user, f'{target} is not in {channel}, but was at {datetime.fromtimestamp(seen):%H:%M:%S}.')
+
+		message = f'{self.presence.count(channel)} users are in {channel}.'
+		oldest = self.presence.oldest(channel)
+		if oldest:
+			message += f' There were {len(oldest[1])} at {datetime.fromtimestamp(oldest[0]):%H:%M:%S}.'
+
+		self.irc.send_private(user, message)
+
+	def points(self, user, badges, args):
+		"""
+		This function whispers the user their loyalty points in this channel, or another user's if one is given.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.loyalty:
+			return self.irc.send_private(user, 'Error - loyalty points are turned off.')
+
+		target = args[0].lstrip('@').lower() if args else user
+		points = self.loyalty.balance(self.irc.channel, target)
+
+		self.irc.send_private(user, f'{"You have" if target == user else f"{target} has"} {points} points.')
+
+	def leaderboard(self, user, badges, args):
+		"""
+		This function whispers the user the users with the most loyalty points in this channel.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.loyalty:
+			return self.irc.send_private(user, 'Error - loyalty points are turned off.')
+
+		try:
+			count = int(args[0]) if args else 5
+		except ValueError:
+			return self.irc.send_private(user, 'Error - invalid number of users.')
+
+		if not 1 <= count <= 10:
+			return self.irc.send_private(user, 'Error - number of users must be between 1 and 10.')
+
+		leaders = self.loyalty.top(self.irc.channel, count)
+		if not leaders:
+			return self.irc.send_private(user, 'Error - nobody has any points yet.')
+
+		self.irc.send_private(user, ' | '.join(f'{rank}. {leader} ({points})' for rank, (leader, points) in enumerate(leaders, 1)))
+
+	def raffle(self, user, badges, args):
+		"""
+		This function handles all functions related to raffles, which run separately in each channel.
+			open: Starts a raffle, which users enter with the enter command.
+			close: Stops taking entries.
+			draw {COUNT}: Draws one or more winners, who can't win again in the same raffle.
+			status: Displays the number of entrants and winners.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if not self.has_permission(user, badges):
+			return self.permission_error(user, 'RAFFLE')
+
+		if not args:
+			return self.arg_missing_error(user, 'RAFFLE', '[open | close | draw | status]')
+
+		function = args.pop(0).lower()
+		channel = self.irc.channel
+		raffle = self.raffles.get(channel)
+
+		logging.info(f'Received command RAFFLE {function.upper()} from {user}')
+
+		if function == 'open':
+			if raffle is not None and raffle.open:
+				return self.irc.send_private(user, 'Error - a raffle is already open!')
+
+			self.raffles[channel] = Raffle()
+			self.irc.send_channel(f'A raffle has started! Type {self.prefix}enter to join. Subscribers get extra tickets.')
+		elif raffle is None:
+			self.irc.send_private(user, 'Error - There is no raffle in this channel!')
+		elif function == 'close':
+			raffle.open = False
+			self.irc.send_channel(f'The raffle is closed, with {len(raffle)} entrants.')
+		elif function == 'draw':
+			try:
+				count = int(args[0]) if args else 1
+			except ValueError:
+				return self.irc.send_private(user, 'Error - invalid number of winners.')
+
+			if not 1 <= count <= 20:
+				return self.irc.send_private(user, 'Error - number of winners must be between 1 and 20.')
+
+			winners = [winner for winner in (raffle.draw() for _ in range(count)) if winner]
+			if not winners:
+				return self.irc.send_private(user, 'Error - nobody is left to win!')
+
+			self.irc.send_channel(f'Congratulations to {", ".join(winners)}!')
+		elif function == 'status':
+			self.irc.send_private(user, f'{"Open" if raffle.open else "Closed"} raffle: {len(raffle)} entrants, {len(raffle.winners)} winners.')
+		else:
+			self.irc.send_private(user, f'Error - unknown argument {function}. Try [open | close | draw | status] instead.')
+
+	def enter(self, user, badges, args):
+		"""
+		This function enters the user into the open raffle in this channel.
+		Subscribers get more tickets depending on their tier, as set by self.raffle_weights.
+		Entering is silent, as whispering every entrant would use up the rate limit.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		raffle = self.raffles.get(self.irc.channel)
+		if raffle is None or not raffle.open:
+			return
+
+		# Subscriber badge versions are 0, 3, 6... for tier 1, then 2000 and 3000 upwards for tiers 2 and 3
+		tier = 0
+		version = badges.get('subscriber', badges.get('founder'))
+		if version is not None:
+			tier = 3 if version >= 3000 else 2 if version >= 2000 else 1
+
+		raffle.enter(self.current_tags.get('user-id', user), user, self.raffle_weights[tier])
+
+	def profile(self, user, badges, args):
+		"""
+		This function starts or stops a profile of the running bot. Only admins may use it.
+		When the profile finishes, its results are written to the profiles directory and the top offenders are whispered to the user.
+
+		Parameters:
+			user (string): The user who called the command.
+			badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+			args (list): A list of strings sent by the user along with their command.
+
+		Returns:
+			None
+		"""
+
+		if user not in self.admins:
+			return self.permission_error(user, 'PROFILE', 'ADMIN')
+
+		if not args:
+			return self.arg_missing_error(user, 'PROFILE', '[cpu | sample | memory | stop] {SECONDS}')
+
+		kind = args[0].lower()
+
+		if kind == 'stop':
+			if not self.profiler.active:
+				return self.irc.send_private(user, 'Error - There is no running profile to stop!')
+			return self.finish_profile(user)
+
+		if kind not in KINDS:
+			return self.irc.send_private(user, f'Error - unknown argument {kind}. Try [cpu | sample | memory | stop] instead.')
+
+		try:
+			seconds = int(args[1]) if len(args) > 1 else 30
+		except ValueError:
+			return self.irc.send_private(user, 'Error - invalid number of seconds.')
+
+		if seconds <= 0 or seconds > 600:
+			return self.irc.send_private(user, 'Error - seconds must be between 1 and 600.')
+
+		if not self.profiler.start(kind, seconds, user):
+			return self.irc.send_private(user, f'Error - a {self.profiler.active} profile is already running.')
+
+		logging.info(f'Received command PROFILE from {user}: {kind} {seconds}')
+
+		self.irc.send_private(user, f'Started {kind} profile for {seconds} seconds.')
+
+	def finish_profile(self, user=None):
+		"""
+		This function stops the running profile and whispers its summary to whoever asked for it.
+		Profiles started by a signal are only summarized in the log.
+
+		Parameters:
+			user (string): The user to whisper the summary to, instead of the one who started the profile.
+
+		Returns:
+			None
+		"""
+
+		user = user or self.profiler.requester
+		path, summary = self.profiler.stop()
+
+		if user:
+			self.irc.send_private(user, f'{summary} (written to {path})'[:450])
+
+	def toggle_profile(self, signum, frame):
+		"""
+		This function handles SIGUSR1 by starting a 30 second cpu profile, or stopping the running one.
+
+		Parameters:
+			signum (int): The signal number.
+			frame (frame): The frame which was interrupted.
+
+		Returns:
+			None
+		"""
+
+		if self.profiler.active:
+			self.finish_profile()
+		else:
+			self.profiler.start('cpu', 30)
+
+	def send_pages(self, user, command, pages, args):
+		"""
+		This function whispers the user pages of a listing, at bulk priority so they don't hold up other messages.
+		The first few pages are sent unless args asks for a particular one, and the last page sent says how to ask for the next.
+
+		Parameters:
+			user (string): The user who called the command.
+			command (string): The command and arguments which display the listing, without the prefix or a page number.
+			pages (list): The listing's pages - see bot/listings.py.
+			args (list): The arguments after the command, which may hold a page number.
+
+		Returns:
+			None
+		"""
+
+		if args:
+			try:
+				first = int(args[0])
+			except ValueError:
+				return self.irc.send_private(user, f'Error - invalid page {args[0]}.')
+
+			if not 1 <= first <= len(pages):
+				return self.irc.send_private(user, f'Error - page {first} does not exist. There are {len(pages)} pages.')
+			last = first
+		else:
+			first, last = 1, min(len(pages), PAGES_PER_REQUEST)
+
+		for number in range(first, last + 1):
+			page = pages[number - 1]
+			if len(pages) > 1:
+				page += f' ({number}/{len(pages)})'
+			if number == last and last < len(pages):
+				page += f' - {self.prefix}{command} {last + 1} for more'
+			self.irc.send_private(user, page, BULK)
 
 	def has_permission(self, user, badges, minimum='moderator'):
 		"""
@@ -834,7 +1670,7 @@ class TwitchBot:
 		for badge in badges:
 			perms.append(self.permission_values.get(badge, -1))
 
-		return max(perms) >= self.permission_values[minimum]
+		return max(perms, default=-1) >= self.permission_values[minimum]
 
 	def help(self, user, badges, args):
 		"""
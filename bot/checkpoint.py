@@ -0,0 +1,241 @@
+from .clock import CLOCK
+import logging
+import marshal
+import os
+
+# Identifies a checkpoint file and the layout of the state inside it
+MAGIC = b'TBCP'
+VERSION = 2
+
+# Journal records which make the journal worth compacting into the snapshot, once the interval allows
+COMPACT_RECORDS = 1000
+
+
+def fsync_directory(path):
+    """
+    This function flushes a directory to disk, so a file just renamed into it survives a crash.
+
+    Parameters:
+        path (string): A file in the directory.
+
+    Returns:
+        None
+    """
+
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Checkpoint:
+    """
+    This is a class for saving the bot's in-memory state to disk, so a restart can carry on where it left off.
+    State is only written after it changes, as a compact marshal snapshot which replaces the previous one atomically.
+
+    Frequent small changes, such as votes, are appended to a journal instead of rewriting the snapshot each time.
+    The journal is synced to disk in one go per batch, and compacted into the snapshot once it grows, or whenever the snapshot is written.
+    Each record is tagged with the snapshot it follows, so records already compacted are never applied twice.
+
+    Attributes:
+        path (string): The checkpoint file. The journal is kept next to it, with '.journal' added.
+        interval (float): The minimum number of seconds between writes. 0 writes every change.
+        dirty (bool): Whether the state has changed since it was last written.
+        last_write (float): The monotonic time of the last write.
+        sequence (int): The number of the snapshot on disk, which journal records are tagged with.
+        journal (file): The journal, opened for appending once there is something to append.
+        records (int): The records appended since the journal was last compacted.
+        unsynced (bool): Whether records have been appended since the journal was last synced.
+        clock (Clock): The source of time.
+    """
+
+    def __init__(self, path, interval=0, clock=None):
+        """
+        The constructor for the Checkpoint class.
+
+        Parameters:
+            path (string): The checkpoint file.
+            interval (float): The minimum number of seconds between writes. 0 writes every change.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.path = path
+        self.interval = interval
+        self.dirty = False
+        self.last_write = float('-inf')
+        self.sequence = 0
+        self.journal = None
+        self.records = 0
+        self.unsynced = False
+
+    def mark(self):
+        """
+        This function records that the state has changed and should be written.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.dirty = True
+
+    def due(self):
+        """
+        This function determines whether the state should be written now.
+
+        Parameters:
+            None
+
+        Returns:
+            due (bool): True if the state has changed, or the journal has grown long, and the interval has passed.
+        """
+
+        return (self.dirty or self.records >= COMPACT_RECORDS) and self.clock.monotonic() - self.last_write >= self.interval
+
+    def append(self, record):
+        """
+        This function adds a change to the journal. It isn't on disk until sync is called.
+
+        Parameters:
+            record (tuple): The change. It may only hold the types marshal supports.
+
+        Returns:
+            None
+        """
+
+        if self.journal is None:
+            self.journal = open(self.path + '.journal', 'ab')
+
+        marshal.dump((self.sequence, record), self.journal)
+        self.records += 1
+        self.unsynced = True
+
+    def sync(self):
+        """
+        This function makes sure every record appended so far is on disk.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if not self.unsynced:
+            return
+
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.unsynced = False
+
+    def save(self, state):
+        """
+        This function writes the state to disk, and empties the journal, whose changes the state must already include.
+        It is written and synced to a temporary file which then replaces the checkpoint, so a crash mid-write can't corrupt it.
+
+        Parameters:
+            state (dict): The state to write. It may only hold the types marshal supports - dicts, lists, strings, numbers, and so on.
+
+        Returns:
+            None
+        """
+
+        sequence = self.sequence + 1
+
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(MAGIC + bytes([VERSION]))
+            marshal.dump((sequence, state), f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp, self.path)
+        fsync_directory(self.path)
+
+        # Records tagged with the old sequence are now ignored, so a crash before the journal is emptied is harmless
+        self.sequence = sequence
+        if self.journal is not None or self.records:
+            self.close()
+            open(self.path + '.journal', 'wb').close()
+            self.records = 0
+
+        self.dirty = False
+        self.last_write = self.clock.monotonic()
+
+    def load(self):
+        """
+        This function reads the state written by the last run.
+
+        Parameters:
+            None
+
+        Returns:
+            state (dict): The saved state, or None if there is no usable checkpoint.
+        """
+
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(len(MAGIC) + 1)
+                if header == MAGIC + bytes([1]):
+                    # Written before the journal, so nothing in it can follow this snapshot
+                    self.sequence = -1
+                    return marshal.load(f)
+
+                if header != MAGIC + bytes([VERSION]):
+                    logging.error(f'Ignoring checkpoint with an unknown format. ({self.path})')
+                    return None
+
+                self.sequence, state = marshal.load(f)
+                return state
+        except FileNotFoundError:
+            return None
+        except (EOFError, ValueError, TypeError) as e:
+            logging.error(f'Ignoring unreadable checkpoint. ({self.path}) ({type(e).__name__})')
+            return None
+
+    def replay(self):
+        """
+        This function reads the journal records which follow the snapshot returned by load.
+        A record cut short by a crash ends the journal.
+
+        Parameters:
+            None
+
+        Returns:
+            records (list): The records, oldest first.
+        """
+
+        records = []
+        try:
+            with open(self.path + '.journal', 'rb') as f:
+                while True:
+                    sequence, record = marshal.load(f)
+                    if sequence == self.sequence:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        except (EOFError, ValueError, TypeError):
+            pass
+
+        self.records = len(records)
+        return records
+
+    def close(self):
+        """
+        This function syncs and closes the journal, if it is open.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if self.journal is not None:
+            self.sync()
+            self.journal.close()
+            self.journal = None
@@ -0,0 +1,353 @@
+import itertools
+import threading
+import heapq
+import time
+
+
+class Timer:
+    """
+    This is a class for a callback scheduled on a Clock, which may repeat.
+
+    Attributes:
+        deadline (float): The monotonic time the callback is next due.
+        interval (float): The seconds between calls of a repeating timer, or None to call it once.
+        callback (callable): The function to call.
+        args (tuple): The arguments to call it with.
+        cancelled (bool): Whether the timer has been cancelled.
+    """
+
+    __slots__ = ('deadline', 'interval', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, interval, callback, args):
+        self.deadline = deadline
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        This function stops the timer from being called again.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.cancelled = True
+
+
+class Clock:
+    """
+    This is a class for the bot's source of time, which every time-dependent part of the bot reads instead of the time module.
+    It also runs timers, which are called by run_due on whichever thread calls it - the bot's loop, for the bot's own timers.
+    Swapping in a SimulatedClock lets hours of scheduled activity run in milliseconds, and repeat exactly.
+
+    Attributes:
+        timers (list): The heap of (deadline, sequence, Timer) entries.
+        sequence (iterator): Keeps timers with the same deadline in the order they were scheduled.
+        lock (Lock): Guards timers, as they may be scheduled from any thread.
+    """
+
+    def __init__(self):
+        """
+        The constructor for the Clock class.
+
+        Parameters:
+            None
+        """
+
+        self.timers = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+    def monotonic(self):
+        """
+        This function returns the time for measuring intervals, which never goes backwards.
+
+        Parameters:
+            None
+
+        Returns:
+            now (float): The monotonic time, in seconds.
+        """
+
+        return time.monotonic()
+
+    def time(self):
+        """
+        This function returns the wall clock time, for timestamps.
+
+        Parameters:
+            None
+
+        Returns:
+            now (float): The seconds since the epoch.
+        """
+
+        return time.time()
+
+    def sleep(self, seconds):
+        """
+        This function waits for a number of seconds.
+
+        Parameters:
+            seconds (float): The seconds to wait.
+
+        Returns:
+            None
+        """
+
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout=None):
+        """
+        This function waits on a condition until it is notified, or the timeout passes. The caller must hold the condition's lock.
+
+        Parameters:
+            condition (Condition): The condition to wait on.
+            timeout (float): The most seconds to wait, or None to wait until notified.
+
+        Returns:
+            notified (bool): False if the timeout passed.
+        """
+
+        return condition.wait(timeout)
+
+    def call_later(self, delay, callback, *args):
+        """
+        This function schedules a callback to be called once.
+
+        Parameters:
+            delay (float): The seconds until the callback is due.
+            callback (callable): The function to call.
+            args (any): The arguments to call it with.
+
+        Returns:
+            timer (Timer): The timer, which can be cancelled.
+        """
+
+        return self.schedule(Timer(self.monotonic() + delay, None, callback, args))
+
+    def call_every(self, interval, callback, *args, first=None):
+        """
+        This function schedules a callback to be called repeatedly.
+
+        Parameters:
+            interval (float): The seconds between calls.
+            callback (callable): The function to call.
+            args (any): The arguments to call it with.
+            first (float): The seconds until the first call, or None to wait one interval.
+
+        Returns:
+            timer (Timer): The timer, which can be cancelled.
+        """
+
+        return self.schedule(Timer(self.monotonic() + (interval if first is None else first), interval, callback, args))
+
+    def schedule(self, timer):
+        """
+        This function adds a timer to the heap.
+
+        Parameters:
+            timer (Timer): The timer.
+
+        Returns:
+            timer (Timer): The same timer.
+        """
+
+        with self.lock:
+            heapq.heappush(self.timers, (timer.deadline, next(self.sequence), timer))
+
+        return timer
+
+    def next_deadline(self):
+        """
+        This function finds when the next timer is due, dropping any cancelled timers at the front of the heap.
+
+        Parameters:
+            None
+
+        Returns:
+            deadline (float): The monotonic time the next timer is due, or None if there are no timers.
+        """
+
+        with self.lock:
+            while self.timers and self.timers[0][2].cancelled:
+                heapq.heappop(self.timers)
+
+            return self.timers[0][0] if self.timers else None
+
+    def run_due(self):
+        """
+        This function calls every timer which is due, in the order they are due.
+        A repeating timer which fell behind skips the calls it missed, rather than making them all at once, and keeps to its schedule.
+
+        Parameters:
+            None
+
+        Returns:
+            wait (float): The seconds until the next timer is due, or None if there are no timers.
+        """
+
+        while True:
+            with self.lock:
+                while self.timers and self.timers[0][2].cancelled:
+                    heapq.heappop(self.timers)
+
+                if not self.timers:
+                    return None
+
+                now = self.monotonic()
+                deadline, _, timer = self.timers[0]
+                if deadline > now:
+                    return deadline - now
+
+                heapq.heappop(self.timers)
+                if timer.interval:
+                    missed = (now - deadline) // timer.interval
+                    timer.deadline = deadline + (missed + 1) * timer.interval
+                    heapq.heappush(self.timers, (timer.deadline, next(self.sequence), timer))
+
+            timer.callback(*timer.args)
+
+
+class SimulatedClock(Clock):
+    """
+    This is a class for a clock whose time only moves when it is advanced, for tests and benchmarks.
+    Advancing it steps through every moment something is due - each timer, and each thread waiting through wait with a timeout -
+    calling the timers on the advancing thread. At each step the waiting threads are woken, and the clock doesn't move on until
+    every thread which has waited on it is waiting again, so a thread such as the outbox writer sees every step, and its rate limit frees up at each.
+
+    Attributes:
+        now (float): The simulated monotonic time.
+        epoch (float): The wall clock time when now is 0.
+        conditions (set): Conditions which threads have waited on, to be notified when the clock advances.
+        settle (Condition): Guards sleepers and threads, and is notified whenever a thread starts waiting.
+        sleepers (dict): The simulated time each waiting thread's timeout ends, or None, by thread.
+        threads (set): Every live thread which has waited on the clock.
+        sleeping (Condition): What threads calling sleep wait on, until the clock is advanced past their deadline.
+        settle_timeout (float): The most real seconds to wait for a thread to wait again, in case it is blocked on something else.
+    """
+
+    def __init__(self, start=0.0, epoch=1600000000.0, settle_timeout=1.0):
+        """
+        The constructor for the SimulatedClock class.
+
+        Parameters:
+            start (float): The simulated monotonic time to start at.
+            epoch (float): The wall clock time when the monotonic time is 0.
+            settle_timeout (float): The most real seconds to wait for a thread to wait again.
+        """
+
+        super().__init__()
+        self.now = start
+        self.epoch = epoch
+        self.conditions = set()
+        self.settle = threading.Condition()
+        self.sleepers = {}
+        self.threads = set()
+        self.sleeping = threading.Condition()
+        self.settle_timeout = settle_timeout
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def sleep(self, seconds):
+        # Only the thread calling advance moves time, so a sleeping thread waits for it to pass the deadline like any other
+        deadline = self.now + seconds
+        with self.sleeping:
+            while self.now < deadline:
+                self.wait(self.sleeping, deadline - self.now)
+
+    def wait(self, condition, timeout=None):
+        # Time only passes when the clock is advanced, which stops at the timeout and notifies the condition,
+        # so the real wait is only ever ended by a notification
+        thread = threading.current_thread()
+        with self.settle:
+            self.conditions.add(condition)
+            # A timeout too small to move the clock would be woken at the same time over and over
+            self.sleepers[thread] = None if timeout is None else self.now + max(timeout, 1e-6)
+            self.threads.add(thread)
+            self.settle.notify_all()
+
+        try:
+            return condition.wait()
+        finally:
+            with self.settle:
+                self.sleepers.pop(thread, None)
+
+    def advance(self, seconds):
+        """
+        This function moves the clock forward, stopping at every timer and waiting thread's timeout along the way.
+
+        Parameters:
+            seconds (float): The seconds to move forward.
+
+        Returns:
+            None
+        """
+
+        target = self.now + seconds
+        # Anything which changed since the last step, such as a message being queued, is seen before time moves
+        self.wake()
+        while True:
+            with self.settle:
+                sleepers = list(self.sleepers.values())
+
+            deadlines = [deadline for deadline in (self.next_deadline(), *sleepers) if deadline is not None and deadline <= target]
+            if not deadlines:
+                break
+
+            self.now = max(self.now, min(deadlines))
+            self.run_due()
+            self.wake()
+
+        self.now = target
+        self.wake()
+
+    def wake(self):
+        """
+        This function wakes every thread waiting on the clock, then waits until each has finished what it was woken for and waits again.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        with self.settle:
+            # Forgotten here rather than as each thread wakes, so none can look like it is still waiting
+            self.sleepers.clear()
+            conditions = list(self.conditions)
+
+        for condition in conditions:
+            with condition:
+                condition.notify_all()
+
+        self.settle_threads()
+
+    def settle_threads(self):
+        """
+        This function waits until every live thread which has waited on the clock is waiting on it again, or settle_timeout passes.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        with self.settle:
+            self.threads = {thread for thread in self.threads if thread.is_alive()}
+            self.settle.wait_for(lambda: all(thread in self.sleepers or not thread.is_alive() for thread in self.threads), self.settle_timeout)
+
+
+# The clock used by anything which isn't given one
+CLOCK = Clock()
@@ -0,0 +1,184 @@
+import re
+
+# Anything other than whitespace between emotes means a message isn't emote-only
+NOT_SPACE = re.compile(r'\S')
+
+# How a /me message is wrapped. Twitch counts its emote positions from the text inside
+ACTION_START = '\x01ACTION '
+ACTION_END = '\x01'
+
+
+class Emotes:
+    """
+    This is a class for the emotes in a chat message, read from its emotes tag, such as '25:0-4,12-16/1902:6-10'.
+    Most messages are never asked about their emotes, so the tag is only decoded the first time the spans are needed, then kept.
+    The helpers work on positions in the message rather than slices of it, so they copy as little of the text as they can.
+
+    Attributes:
+        tag (string): The raw emotes tag, empty if the message has no emotes.
+        text (string): The message the positions refer to. For a /me message, this is the text inside its ACTION wrapper.
+            Stripping the command prefix from a message doesn't change this.
+    """
+
+    __slots__ = ('tag', 'text', '_spans', '_stripped')
+
+    def __init__(self, tag, text):
+        """
+        The constructor for the Emotes class.
+
+        Parameters:
+            tag (string): The raw emotes tag, or an empty string.
+            text (string): The message.
+        """
+
+        if text.startswith(ACTION_START) and text.endswith(ACTION_END):
+            text = text[len(ACTION_START):-len(ACTION_END)]
+
+        self.tag = tag
+        self.text = text
+        self._spans = None
+        self._stripped = None
+
+    def __bool__(self):
+        return bool(self.tag)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    @property
+    def spans(self):
+        """
+        The (start, end, id) of each emote, in the order they appear in the message. end is exclusive, so text[start:end] is the emote.
+        Ranges outside the message, or overlapping an earlier emote, are left out.
+        """
+
+        if self._spans is None:
+            self._spans = self.decode()
+
+        return self._spans
+
+    def decode(self):
+        """
+        This function decodes the emotes tag into spans.
+
+        Parameters:
+            None
+
+        Returns:
+            spans (tuple): The (start, end, id) of each emote, ordered by start.
+        """
+
+        if not self.tag:
+            return ()
+
+        spans = []
+        for emote in self.tag.split('/'):
+            id, _, positions = emote.partition(':')
+            for position in positions.split(','):
+                start, _, end = position.partition('-')
+                if start.isdigit() and end.isdigit():
+                    spans.append((int(start), int(end) + 1, id))
+
+        spans.sort()
+
+        length = len(self.text)
+        kept = []
+        last = 0
+        for start, end, id in spans:
+            if start >= last and start < end <= length:
+                kept.append((start, end, id))
+                last = end
+
+        return tuple(kept)
+
+    def gaps(self):
+        """
+        This function finds the parts of the message between its emotes.
+
+        Parameters:
+            None
+
+        Returns:
+            gaps (generator): The (start, end) of each part of the message which isn't an emote, skipping empty ones.
+        """
+
+        last = 0
+        for start, end, id in self.spans:
+            if start > last:
+                yield last, start
+            last = end
+
+        if last < len(self.text):
+            yield last, len(self.text)
+
+    def names(self):
+        """
+        This function lists the emotes in the message as they were typed.
+
+        Parameters:
+            None
+
+        Returns:
+            names (list): The text of each emote, in order.
+        """
+
+        text = self.text
+        return [text[start:end] for start, end, id in self.spans]
+
+    def counts(self):
+        """
+        This function counts how many times each emote was used in the message.
+
+        Parameters:
+            None
+
+        Returns:
+            counts (dict): The number of uses of each emote, by its id.
+        """
+
+        counts = {}
+        for start, end, id in self.spans:
+            counts[id] = counts.get(id, 0) + 1
+
+        return counts
+
+    def only(self):
+        """
+        This function determines whether the message is nothing but emotes.
+
+        Parameters:
+            None
+
+        Returns:
+            only (bool): True if the message has emotes and nothing else but whitespace.
+        """
+
+        if not self.tag:
+            return False
+
+        text = self.text
+        # Searching between positions avoids slicing the text
+        return bool(self.spans) and not any(NOT_SPACE.search(text, start, end) for start, end in self.gaps())
+
+    def stripped(self):
+        """
+        This function removes the emotes from the message. The result is kept, and a message without emotes is returned as is.
+
+        Parameters:
+            None
+
+        Returns:
+            text (string): The message without its emotes.
+        """
+
+        if self._stripped is None:
+            if not self.spans:
+                self._stripped = self.text
+            else:
+                text = self.text
+                self._stripped = ''.join([text[start:end] for start, end in self.gaps()])
+
+        return self._stripped
@@ -0,0 +1,385 @@
+"""
+The event stream - publishes the bot's parsed chat messages and events to local consumers over a Unix domain socket.
+
+Every frame, in both directions, is a 4 byte big-endian length followed by that many bytes of payload.
+
+A consumer first sends one frame to subscribe, holding an IRC tag style filter, such as
+    channels=#one,#two;types=PRIVMSG,CLEARCHAT
+Either part can be left out to receive everything, and an empty frame subscribes to all events.
+
+Each event the bot sends is then laid out as:
+    type (1 byte): 1 PRIVMSG, 2 CLEARCHAT, 3 CLEARMSG, 4 JOIN, 5 PART
+    time (8 byte big-endian double): The time the bot handled the event, in seconds since the epoch.
+    Four strings, each a 2 byte big-endian length followed by that many bytes of UTF-8:
+        channel: The '#' prepended channel.
+        user: The sender of a PRIVMSG, or the target of a CLEARCHAT, or empty.
+        text: The message of a PRIVMSG or CLEARMSG, or the space separated users of a JOIN or PART.
+              Users who don't fit in one JOIN or PART are sent in more JOIN or PART events.
+        tags: The event's IRC tags, as 'name=value' pairs separated by ';'.
+
+A consumer which falls too far behind is disconnected, so it can never slow the bot down.
+"""
+
+from .clock import CLOCK
+import threading
+import logging
+import socket
+import struct
+import queue
+import os
+
+TYPES = {'PRIVMSG': 1, 'CLEARCHAT': 2, 'CLEARMSG': 3, 'JOIN': 4, 'PART': 5}
+
+LENGTH = struct.Struct('>I')
+HEADER = struct.Struct('>Bd')
+STRING = struct.Struct('>H')
+
+# The largest subscription frame a consumer may send
+MAX_SUBSCRIPTION = 4096
+
+# The most bytes a string's 2 byte length can describe
+MAX_STRING = 0xFFFF
+
+
+def pack_string(text):
+    """
+    This function encodes a string field, truncating it to the 65535 bytes its length can describe.
+    Only the tags of an unusual event could be that long, and they are cut at a whole character, so they always decode.
+
+    Parameters:
+        text (string): The field.
+
+    Returns:
+        data (bytes): The length prefixed UTF-8 bytes.
+    """
+
+    data = text.encode('utf8')
+    if len(data) > MAX_STRING:
+        data = data[:MAX_STRING].decode('utf8', 'ignore').encode('utf8')
+
+    return STRING.pack(len(data)) + data
+
+
+def join_users(users):
+    """
+    This function joins users into as few space separated strings as fit in a string field, so none are left out of a big JOIN or PART.
+
+    Parameters:
+        users (iterable): The usernames.
+
+    Returns:
+        texts (list): The space separated users, each at most MAX_STRING bytes once encoded.
+    """
+
+    texts = []
+    chunk = []
+    size = 0
+    for user in users:
+        length = len(user.encode('utf8'))
+        if chunk and size + 1 + length > MAX_STRING:
+            texts.append(' '.join(chunk))
+            chunk = []
+            size = 0
+
+        size += length + (1 if chunk else 0)
+        chunk.append(user)
+
+    if chunk:
+        texts.append(' '.join(chunk))
+
+    return texts
+
+
+def encode(type, now, channel, user, text, tags):
+    """
+    This function encodes an event as a frame.
+
+    Parameters:
+        type (string): The event type - a key of TYPES.
+        now (float): The time the bot handled the event, in seconds since the epoch.
+        channel (string): The '#' prepended channel.
+        user (string): The event's user, or ''.
+        text (string): The event's text, or ''.
+        tags (dict): The event's IRC tags.
+
+    Returns:
+        frame (bytes): The length prefixed frame.
+    """
+
+    payload = b''.join((
+        HEADER.pack(TYPES[type], now),
+        pack_string(channel),
+        pack_string(user),
+        pack_string(text),
+        pack_string(';'.join(f'{name}={value}' for name, value in tags.items()))
+    ))
+
+    return LENGTH.pack(len(payload)) + payload
+
+
+def receive_exactly(sock, size):
+    """
+    This function reads an exact number of bytes from a socket.
+
+    Parameters:
+        sock (socket): The socket to read from.
+        size (int): The number of bytes to read.
+
+    Returns:
+        data (bytes): The bytes read, or None if the socket closed first.
+    """
+
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+
+    return data
+
+
+class Consumer:
+    """
+    This is a class for one connected consumer of the event stream.
+    Frames wait in a bounded queue, which the consumer's own thread writes to its socket.
+
+    Attributes:
+        sock (socket): The consumer's connection.
+        channels (frozenset): The channels the consumer wants, or None for all of them.
+        types (frozenset): The event types the consumer wants, or None for all of them.
+        frames (Queue): Frames waiting to be written.
+        closed (bool): Whether the consumer has been disconnected.
+    """
+
+    def __init__(self, sock, channels, types, backlog):
+        """
+        The constructor for the Consumer class.
+
+        Parameters:
+            sock (socket): The consumer's connection.
+            channels (frozenset): The channels the consumer wants, or None for all of them.
+            types (frozenset): The event types the consumer wants, or None for all of them.
+            backlog (int): The number of frames the consumer may fall behind by before it is disconnected.
+        """
+
+        self.sock = sock
+        self.channels = channels
+        self.types = types
+        self.frames = queue.Queue(backlog)
+        self.closed = False
+
+    def wants(self, type, channel):
+        return (self.types is None or type in self.types) and (self.channels is None or channel in self.channels)
+
+    def close(self):
+        """
+        This function disconnects the consumer, and wakes its thread so it can exit.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+        try:
+            self.frames.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class EventStream:
+    """
+    This is a class for publishing the bot's parsed messages and events to local consumers.
+    Publishing with no consumers costs one check, and each event is encoded once however many consumers want it.
+    A consumer whose queue is full is disconnected on the spot rather than waited for.
+
+    Attributes:
+        path (string): The Unix domain socket's file.
+        backlog (int): The number of frames a consumer may fall behind by.
+        consumers (tuple): The subscribed consumers. It is replaced rather than changed, so publishing never takes a lock.
+        lock (Lock): Held while replacing consumers.
+        server (socket): The listening socket, or None until started.
+        dropped (Counter): The number of consumers disconnected for falling behind.
+        clock (Clock): The source of time, for the events' timestamps.
+    """
+
+    def __init__(self, path, metrics, backlog=10000, clock=None):
+        """
+        The constructor for the EventStream class.
+
+        Parameters:
+            path (string): The Unix domain socket's file.
+            metrics (Metrics): The metrics to report consumers to.
+            backlog (int): The number of frames a consumer may fall behind by before it is disconnected.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.path = path
+        self.backlog = backlog
+        self.consumers = ()
+        self.lock = threading.Lock()
+        self.server = None
+        self.dropped = metrics.counter('twitchbot_event_consumers_dropped_total', 'Event stream consumers disconnected for falling behind.')
+        metrics.gauge_callback('twitchbot_event_consumers', 'Connected event stream consumers.', lambda: len(self.consumers))
+
+    def start(self):
+        """
+        This function starts listening for consumers, replacing any socket file left by an earlier run.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen()
+
+        threading.Thread(target=self.accept, name='events', daemon=True).start()
+        logging.info(f'Publishing events on {self.path}')
+
+    def stop(self):
+        """
+        This function disconnects every consumer and stops listening.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if self.server is None:
+            return
+
+        self.server.close()
+        self.server = None
+        for consumer in self.consumers:
+            consumer.close()
+        self.consumers = ()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def accept(self):
+        """
+        This function accepts consumers, giving each its own thread.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        while self.server:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+
+            threading.Thread(target=self.serve, args=(sock,), name='events-consumer', daemon=True).start()
+
+    def serve(self, sock):
+        """
+        This function reads a consumer's subscription, then writes its frames until it disconnects or falls behind.
+
+        Parameters:
+            sock (socket): The consumer's connection.
+
+        Returns:
+            None
+        """
+
+        try:
+            sock.settimeout(5)
+            header = receive_exactly(sock, LENGTH.size)
+            size = LENGTH.unpack(header)[0] if header else None
+            if size is None or size > MAX_SUBSCRIPTION:
+                return sock.close()
+
+            subscription = receive_exactly(sock, size) if size else b''
+            if subscription is None:
+                return sock.close()
+
+            filters = {}
+            for part in subscription.decode('utf8').split(';'):
+                name, _, value = part.partition('=')
+                if value:
+                    filters[name] = frozenset(value.split(','))
+
+            sock.settimeout(None)
+        except (OSError, ValueError):
+            return sock.close()
+
+        consumer = Consumer(sock, filters.get('channels'), filters.get('types'), self.backlog)
+        with self.lock:
+            self.consumers += (consumer,)
+        logging.info(f'Event stream consumer subscribed: {subscription.decode("utf8") or "everything"}')
+
+        try:
+            while not consumer.closed:
+                frame = consumer.frames.get()
+                if frame is None:
+                    break
+                sock.sendall(frame)
+        except OSError:
+            pass
+        finally:
+            consumer.close()
+            with self.lock:
+                self.consumers = tuple(c for c in self.consumers if c is not consumer)
+
+    def publish(self, msg):
+        """
+        This function sends a parsed message or event to every consumer which wants it.
+
+        Parameters:
+            msg (dict): The parsed message or event.
+
+        Returns:
+            None
+        """
+
+        consumers = self.consumers
+        if not consumers:
+            return
+
+        command, channel, now = msg['command'], msg['channel'], self.clock.time()
+        if command == 'PRIVMSG':
+            frames = [('PRIVMSG', encode('PRIVMSG', now, channel, msg['user'], msg['message'], msg['tags']))]
+        elif command == 'MEMBERSHIP':
+            frames = [(type, encode(type, now, channel, '', text, {})) for type, users in (('JOIN', msg['joined']), ('PART', msg['parted'])) for text in join_users(users)]
+        elif command == 'CLEARMSG':
+            frames = [(command, encode(command, now, channel, msg['tags'].get('login', ''), msg['target'] or '', msg['tags']))]
+        elif command in TYPES:
+            frames = [(command, encode(command, now, channel, msg['target'] or '', '', msg['tags']))]
+        else:
+            return
+
+        for consumer in consumers:
+            for type, frame in frames:
+                if consumer.closed or not consumer.wants(type, channel):
+                    continue
+
+                try:
+                    consumer.frames.put_nowait(frame)
+                except queue.Full:
+                    logging.error('Disconnecting an event stream consumer which fell behind.')
+                    self.dropped.inc()
+                    consumer.close()
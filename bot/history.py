@@ -0,0 +1,173 @@
+from collections import OrderedDict, deque
+from .clock import CLOCK
+
+
+class Entry:
+    """
+    This is a class for one remembered chat message.
+
+    Attributes:
+        id (string): The message's id, from its 'id' tag.
+        time (int): The time Twitch received the message, in milliseconds since the epoch.
+        text (string): What the message said.
+        deleted (string): Why the message was removed - such as 'deleted', 'timed out for 600s', or 'banned' - or None if it wasn't.
+        badges (dict): The badges the user had when they sent it, and their levels.
+    """
+
+    __slots__ = ('id', 'time', 'text', 'deleted', 'badges')
+
+    def __init__(self, id, time, text, badges=None):
+        """
+        The constructor for the Entry class.
+
+        Parameters:
+            id (string): The message's id.
+            time (int): The time Twitch received the message, in milliseconds since the epoch.
+            text (string): What the message said.
+            badges (dict): The badges the user had when they sent it.
+        """
+
+        self.id = id
+        self.time = time
+        self.text = text
+        self.deleted = None
+        self.badges = badges or {}
+
+
+class History:
+    """
+    This is a class for remembering the last few messages each user sent in each channel.
+    Appending a message is O(1), and the least recently active users are forgotten once there are too many,
+    so memory stays capped at max_users * size messages.
+    Twitch's CLEARCHAT and CLEARMSG events mark messages as removed rather than forgetting them, so timeouts and bans can be checked later.
+
+    Attributes:
+        size (int): The number of messages remembered per user.
+        max_users (int): The number of users remembered at once.
+        users (OrderedDict): Maps each (channel, user) pair to a deque of their Entry objects, least recently active first.
+        clock (Clock): The source of time, for messages without a tmi-sent-ts tag.
+    """
+
+    def __init__(self, size=20, max_users=10000, clock=None):
+        """
+        The constructor for the History class.
+
+        Parameters:
+            size (int): The number of messages remembered per user.
+            max_users (int): The number of users remembered at once.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.size = size
+        self.max_users = max_users
+        self.users = OrderedDict()
+
+    def add(self, msg):
+        """
+        This function remembers a chat message.
+
+        Parameters:
+            msg (dict): The parsed message.
+
+        Returns:
+            None
+        """
+
+        key = (msg['channel'], msg['user'])
+        entries = self.users.get(key)
+        if entries is None:
+            entries = self.users[key] = deque(maxlen=self.size)
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(key)
+
+        tags = msg['tags']
+        sent = tags.get('tmi-sent-ts')
+        entries.append(Entry(tags.get('id'), int(sent) if sent else int(self.clock.time() * 1000), msg['message'], msg.get('badges')))
+
+    def get(self, channel, user):
+        """
+        This function returns the messages remembered for a user.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            entries (list): The user's Entry objects, oldest first.
+        """
+
+        return list(self.users.get((channel, user), ()))
+
+    def badges(self, channel, user):
+        """
+        This function returns the badges a user had in their last remembered message.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            badges (dict): The user's badges and their levels, or None if none of their messages are remembered.
+        """
+
+        entries = self.users.get((channel, user))
+        return entries[-1].badges if entries else None
+
+    def search(self, channel, pattern, since):
+        """
+        This function finds the users whose recent messages in a channel match a pattern, such as the line a spam bot raid is posting.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            pattern (Pattern): The compiled regular expression messages are searched with.
+            since (int): The earliest time of a message to search, in milliseconds since the epoch.
+
+        Returns:
+            users (list): The lowercase usernames with a matching message, most recently active first.
+        """
+
+        users = []
+        # Users are kept least recently active first, so the search can stop at the first user with nothing recent
+        for (userChannel, user), entries in reversed(self.users.items()):
+            if entries[-1].time < since:
+                break
+
+            if userChannel == channel and any(entry.time >= since and pattern.search(entry.text) for entry in entries):
+                users.append(user)
+
+        return users
+
+    def apply(self, event):
+        """
+        This function marks messages removed by a CLEARCHAT or CLEARMSG event.
+
+        Parameters:
+            event (dict): The parsed event, from parse_event.
+
+        Returns:
+            None
+        """
+
+        tags = event['tags']
+
+        if event['command'] == 'CLEARMSG':
+            for entry in self.users.get((event['channel'], tags.get('login')), ()):
+                if entry.id == tags.get('target-msg-id'):
+                    entry.deleted = 'deleted'
+            return
+
+        if event['target']:
+            duration = tags.get('ban-duration')
+            reason = f'timed out for {duration}s' if duration else 'banned'
+            entries = self.users.get((event['channel'], event['target']), ())
+        else:
+            # The whole chat was cleared, which is rare enough to scan for
+            reason = 'chat cleared'
+            entries = [entry for (channel, user), userEntries in self.users.items() if channel == event['channel'] for entry in userEntries]
+
+        for entry in entries:
+            if entry.deleted is None:
+                entry.deleted = reason
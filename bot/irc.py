@@ -1,25 +1,362 @@
 import socket
 import logging
+import threading
 import re
-import emoji
-import copy
 from sys import exit
+from time import perf_counter, perf_counter_ns
+from .metrics import Metrics
+from .tracing import Tracer
+from .logs import Demojized
+from .emotes import Emotes
+from .outbox import Outbox, RateLimiter, NORMAL, MODERATION
+from .clock import CLOCK
+
+def parse_tags(line):
+    """
+    This function extracts the IRCv3 tags from the start of a line.
+
+    Parameters:
+        line (string): The decoded line from the IRC server.
+
+    Returns:
+        tags (dict): A dictionary of tag names and their raw values, empty if the line has no tags.
+    """
+
+    if not line.startswith('@'):
+        return {}
+
+    tags = {}
+    for tag in line[1:line.index(' ')].split(';'):
+        name, _, value = tag.partition('=')
+        tags[name] = value
+
+    return tags
+
+MESSAGE_PATTERN = re.compile(r':[a-zA-Z0-9_]+\![a-zA-Z0-9_]+@[a-zA-Z0-9_]+(\.tmi\.twitch\.tv|\.testserver\.local) PRIVMSG #[a-zA-Z0-9_]+ :.+$')
+USER_PATTERN = re.compile(r'!(\w+)@')
+TEXT_PATTERN = re.compile(r'PRIVMSG (#\w+) :(.+)$')
+# Twitch events the bot acts on, other than chat messages
+EVENT_PATTERN = re.compile(r'^(?:@\S+ )?:tmi\.twitch\.tv (CLEARCHAT|CLEARMSG) (#\w+)(?: :(.*))?$')
+MEMBERSHIP_PATTERN = re.compile(r'^:(\w+)!\w+@\S+ (JOIN|PART) (#\w+)$')
+NAMES_PATTERN = re.compile(r'^:\S+ (353|366) \w+ (?:[=*@] )?(#\w+) :(.*)$')
+# Events merged into MEMBERSHIP events by TwitchIrc.merge_membership
+MEMBERSHIP_COMMANDS = frozenset(('JOIN', 'PART', '353', '366'))
+
+def check_has_message(data):
+    """
+    This function determines whether a line contains a chat message using regular expressions.
+
+    Parameters:
+        data (bytes): The encoded line received from the IRC server.
+
+    Returns:
+        search (bool): True if a message is found in data, false otherwise.
+    """
+
+    return MESSAGE_PATTERN.search(data.decode())
+
+def parse_event(data):
+    """
+    This function parses a line holding one of the Twitch events the bot acts on, other than a chat message.
+        CLEARCHAT: A user was timed out or banned, or the whole chat was cleared if there is no user.
+        CLEARMSG: A single message was deleted. Its id is in the 'target-msg-id' tag, and its sender in the 'login' tag.
+        JOIN, PART: A user joined or left the channel.
+        353, 366: A part of the NAMES list of users in the channel, sent after joining it, and the end of the list.
+
+    Parameters:
+        data (bytes): The encoded line from the IRC server.
+
+    Returns:
+        eventData (dict): The event's command, channel, IRC tags, and its target - the user for CLEARCHAT, JOIN and PART,
+            the deleted message for CLEARMSG, or the space separated users for 353. None if the line isn't one of these events.
+    """
+
+    dd = data.decode('utf8')
+
+    event = MEMBERSHIP_PATTERN.match(dd)
+    if event:
+        return {'command': event.group(2), 'channel': event.group(3), 'target': event.group(1), 'tags': {}}
+
+    event = NAMES_PATTERN.match(dd)
+    if event:
+        return {'command': event.group(1), 'channel': event.group(2), 'target': event.group(3), 'tags': {}}
+
+    event = EVENT_PATTERN.match(dd)
+    if event:
+        return {'command': event.group(1), 'channel': event.group(2), 'target': event.group(3), 'tags': parse_tags(dd)}
+
+    return None
+
+def parse_line(data):
+    """
+    This function parses a line and extracts the message data from it.
+    It runs in parser worker processes, so it must not log or touch any shared state.
+
+    Parameters:
+        data (bytes): The encoded line from the IRC server.
+
+    Returns:
+        userData (dict): Information about the message, such as who sent it, the channel, their badges, their IRC tags, what it says,
+            and its emotes (Emotes), which are only decoded if they are used. Its 'command' is 'PRIVMSG' for chat messages, or the event's command for lines parsed by parse_event.
+            None if the line is neither.
+    """
+
+    if not check_has_message(data):
+        return parse_event(data)
+
+    dd = data.decode('utf8')
+
+    tags = parse_tags(dd)
+    text = TEXT_PATTERN.search(dd)
+    userData = {
+        'command': 'PRIVMSG',
+        'user': USER_PATTERN.search(dd).group(1),
+        'channel': text.group(1),
+        'message': text.group(2),
+        'badges': {},
+        'tags': tags,
+        'emotes': Emotes(tags.get('emotes', ''), text.group(2))
+    }
+
+    for tag in tags.get('badges', '').split(','):
+        if tag:
+            tagData = tag.split('/')
+            userData['badges'][tagData[0]] = int(tagData[1])
+
+    return userData
+
+def parse_batch(lines):
+    """
+    This function parses a batch of lines. Batching amortizes the cost of handing lines to a worker process.
+
+    Parameters:
+        lines (list): The encoded lines from the IRC server.
+
+    Returns:
+        results (list): For each line, its parsed data, None if it isn't a chat message,
+            or the name of the exception raised if it failed to parse.
+    """
+
+    results = []
+    for line in lines:
+        try:
+            results.append(parse_line(line))
+        except Exception as e:
+            results.append(type(e).__name__)
+
+    return results
+
+class Sender:
+    """
+    This is a class for an extra account the bot sends messages with, to share out Twitch's per-account rate limit.
+    It logs in on its own connection with its own rate limit, but joins no channels, so it receives nothing but PINGs.
+    A thread keeps it connected, and it is only in the outbox's pool while its connection is up.
+
+    Attributes:
+        irc (TwitchIrc): The bot's main connection, whose server, outbox and metrics it shares.
+        user (string): The username of the account.
+        token (string): The 'oauth:' prepended string of characters used for the account's password.
+        limiter (RateLimiter): Limits how fast the account sends messages.
+        sock (socket): The account's connection, or None while it is disconnected.
+        send_lock (Lock): Held while writing to the socket, as PINGs are answered from the account's own thread.
+        backoff (Condition): Waited on between failed connection attempts, and notified to stop waiting when the account is stopped.
+        running (bool): Whether the account should stay connected.
+    """
+
+    def __init__(self, irc, user, token, rate_limit):
+        """
+        The constructor for the Sender class.
+
+        Parameters:
+            irc (TwitchIrc): The bot's main connection.
+            user (string): The account's username.
+            token (string): The 'oauth:' prepended string of characters used for the account's password.
+            rate_limit (tuple): The number of messages the account may send, and in how many seconds.
+        """
+
+        self.irc = irc
+        self.user = user.lower()
+        self.token = token
+        self.limiter = RateLimiter(*rate_limit, irc.clock)
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.backoff = threading.Condition()
+        self.running = False
+
+    def start(self):
+        """
+        This function starts the thread which connects the account and keeps it connected.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.running = True
+        threading.Thread(target=self.run, name=f'sender-{self.user}', daemon=True).start()
+
+    def stop(self):
+        """
+        This function takes the account out of the pool and closes its connection.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        with self.backoff:
+            self.running = False
+            self.backoff.notify_all()
+
+        self.irc.outbox.remove(self)
+        if self.sock is not None:
+            self.sock.close()
+
+    def connect(self):
+        """
+        This function connects and logs in, without joining any channels.
+
+        Parameters:
+            None
+
+        Returns:
+            connected (bool): True if the account logged in.
+        """
+
+        try:
+            self.sock = socket.create_connection((self.irc.url, self.irc.port), timeout=10)
+            self.write(f'USER {self.user}')
+            self.write(f'PASS {self.token}')
+            self.write(f'NICK {self.user}')
+
+            if not self.irc.logged_in(self.sock.recv(1024)):
+                logging.error(f'Invalid login for sender account {self.user}')
+                self.sock.close()
+                return False
+
+            self.sock.settimeout(None)
+        except OSError as e:
+            logging.error(f'Error connecting sender account {self.user}. ({type(e).__name__}: {e})')
+            return False
+
+        logging.info(f'Sender account {self.user} logged in.')
+        return True
+
+    def run(self):
+        """
+        This function is the account's thread. It connects, adds the account to the pool, and answers PINGs until the connection is lost,
+        then takes the account out of the pool and reconnects, waiting longer after each failure.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        delay = 1
+        while self.running:
+            if not self.connect():
+                self.wait(delay)
+                delay = min(delay * 2, 60)
+                continue
+
+            delay = 1
+            self.irc.outbox.add(self)
+
+            buffer = b''
+            while self.running:
+                try:
+                    data = self.sock.recv(4096)
+                except OSError:
+                    data = b''
+
+                if not data:
+                    break
+
+                *lines, buffer = (buffer + data).split(b'\r\n')
+                for line in lines:
+                    if line.startswith(b'PING'):
+                        with self.send_lock:
+                            self.sock.sendall(line.replace(b'PING', b'PONG', 1) + b'\r\n')
+
+            self.irc.outbox.remove(self)
+            if self.running:
+                logging.error(f'Sender account {self.user} lost connection, reconnecting...')
+                self.irc.reconnects.inc()
+
+    def wait(self, seconds):
+        """
+        This function waits before the next connection attempt, or until the account is stopped.
+        It waits on the clock rather than sleeping through it, so a SimulatedClock is only ever moved forward by whoever advances it.
+
+        Parameters:
+            seconds (float): The seconds to wait.
+
+        Returns:
+            None
+        """
+
+        clock = self.irc.clock
+        deadline = clock.monotonic() + seconds
+        with self.backoff:
+            # The clock may wake the thread before the deadline, such as a SimulatedClock at each step it advances through
+            while self.running and clock.monotonic() < deadline:
+                clock.wait(self.backoff, deadline - clock.monotonic())
+
+    def write(self, data, trace=None):
+        """
+        The function to write data to the account's connection.
+
+        Parameters:
+            data (string): The data to be written, without its line ending.
+            trace (Trace): The trace of the message this is a reply to, or None.
+
+        Returns:
+            None
+        """
+
+        logging.debug('Sent data as %s: %s', self.user, Demojized(data))
+        encoded = str.encode(data + '\r\n')
+
+        with self.send_lock:
+            self.sock.sendall(encoded)
+        self.irc.bytes_sent.inc(len(encoded))
+        self.irc.lines_sent.inc()
+
+        if trace:
+            trace.mark('write')
 
 class TwitchIrc:
     """
-    This is a class for connecting to a Twitch IRC channel.
+    This is a class for connecting to one or more Twitch IRC channels.
 
     Attributes:
         url (string): The IRC address to connect to.
         port (int): The port to use while connecting.
         user (string): The username of the Twitch account to use while connecting.
         token (string): The 'oauth:' prepended string of characters used for the bot account password.
-        channel (string): The '#' prepended lowercase username of the Twitch channel to connect to.
+        channels (list): The '#' prepended lowercase usernames of the Twitch channels to connect to.
+        channel (string): The channel send_channel and send_private send to - the first channel, unless changed to reply to a message.
         attempts (int): The number of attempts made to connect to the IRC server.
         sock (socket): The socket connection to the IRC server.
+        buffer (bytes): Received data which does not yet make up a complete line.
+        ping_sent (float): The perf_counter time at which our last PING probe was sent, or None if no probe is outstanding.
+        read_ns (int): The perf_counter_ns time at which the last chunk of data was read from the socket.
+        send_lock (Lock): Held while writing to the socket, as the reader and the writer send from different threads.
+        limiter (RateLimiter): Limits how fast this account sends messages.
+        senders (list): The extra accounts messages are also sent with.
+        outbox (Outbox): Queues outgoing messages by priority and writes them with whichever account is within its rate limit.
+        metrics (Metrics): The metrics the connection reports to.
+        tracer (Tracer): Samples per-message traces from the socket read to the reply being written.
+        clock (Clock): The source of time for the rate limits, reconnect backoff, and read times.
     """
 
-    def __init__(self, url, port, user, token, chan):
+    def __init__(self, url, port, user, token, chan, metrics=None, tracer=None, rate_limit=(20, 30), senders=(), clock=None):
         """
         The constructor for the TwitchIrc class.
 
@@ -28,15 +365,41 @@ class TwitchIrc:
             port (string or int): The IRC address port - typically = 6667
             user (string): The bot account's username.
             token (string): The 'oauth:' prepended string of characters used for the bot account password.
-            chan (string): The lowercase username of the Twitch channel to connect to.
+            chan (string or list): The lowercase username of the Twitch channel to connect to, or a list of them.
+            metrics (Metrics): The metrics to report to - a private set is created if omitted.
+            tracer (Tracer): The tracer to record message timelines with - tracing is off if omitted.
+            rate_limit (tuple): The number of messages each account may send, and in how many seconds.
+            senders (list): The (username, token) of each extra account to send messages with. They only send, so all messages are received here.
+            clock (Clock): The source of time - see bot/clock.py.
         """
 
         self.url = url
         self.port = int(port)
         self.user = user.lower()
         self.token = token
-        self.channel = '#' + chan
+        self.channels = ['#' + c for c in ([chan] if isinstance(chan, str) else chan)]
+        self.channel = self.channels[0]
         self.attempts = 0
+        self.buffer = b''
+        self.ping_sent = None
+        self.read_ns = 0
+        self.send_lock = threading.Lock()
+        self.tracer = tracer or Tracer()
+
+        self.metrics = metrics or Metrics()
+        self.bytes_received = self.metrics.counter('twitchirc_received_bytes_total', 'Bytes received from the IRC server.')
+        self.lines_received = self.metrics.counter('twitchirc_received_lines_total', 'Complete lines received from the IRC server.')
+        self.bytes_sent = self.metrics.counter('twitchirc_sent_bytes_total', 'Bytes sent to the IRC server.')
+        self.lines_sent = self.metrics.counter('twitchirc_sent_lines_total', 'Lines sent to the IRC server.')
+        self.parse_failures = self.metrics.counter('twitchirc_parse_failures_total', 'Chat lines which could not be parsed.')
+        self.reconnects = self.metrics.counter('twitchirc_reconnects_total', 'Reconnections after losing the IRC server.')
+        self.ping_rtt = self.metrics.histogram('twitchirc_ping_rtt_seconds', 'Round-trip time of PING probes to the IRC server.')
+
+        self.clock = clock or CLOCK
+        self.limiter = RateLimiter(*rate_limit, self.clock)
+        self.outbox = Outbox([self], self.metrics, self.clock)
+        self.senders = [Sender(self, senderUser, senderToken, rate_limit) for senderUser, senderToken in senders]
+        self.metrics.gauge_callback('twitchirc_sender_accounts', 'Accounts currently connected and able to send messages.', lambda: len(self.outbox.accounts))
 
     def connect(self):
         """
@@ -70,12 +433,15 @@ class TwitchIrc:
 
         # After establishing a connection, remain connected
         self.attempts = 0
+        self.buffer = b''
+        self.ping_sent = None
         sock.settimeout(None)
 
         # Send credentials
-        self.send(f'USER {self.user}')
-        self.send(f'PASS {self.token}')
-        self.send(f'NICK {self.user}')
+        # Logging in is written straight to the socket, ahead of anything queued
+        self.write(f'USER {self.user}')
+        self.write(f'PASS {self.token}')
+        self.write(f'NICK {self.user}')
 
         if self.logged_in(self.recv()):
             logging.info('Login successful.')
@@ -83,8 +449,9 @@ class TwitchIrc:
             logging.critical('Invalid login')
             exit('Failed to log in to IRC server.')
 
-        self.send(f'JOIN {self.channel}')
-        logging.info(f'Joined channel {self.channel}')
+        for channel in self.channels:
+            self.write(f'JOIN {channel}')
+            logging.info(f'Joined channel {channel}')
 
         self.get_permissions()
     
@@ -99,6 +466,8 @@ class TwitchIrc:
             None
         """
 
+        for sender in self.senders:
+            sender.stop()
         self.sock.close()
         logging.info('Closed connection to IRC server.')
 
@@ -118,43 +487,78 @@ class TwitchIrc:
         """
 
         logging.debug('Gathering permissions...')
-        self.send('CAP REQ :twitch.tv/membership')
-        self.send('CAP REQ :twitch.tv/commands')
-        self.send('CAP REQ :twitch.tv/tags')
+        self.write('CAP REQ :twitch.tv/membership')
+        self.write('CAP REQ :twitch.tv/commands')
+        self.write('CAP REQ :twitch.tv/tags')
     
-    def send_channel(self, message):
+    def send_channel(self, message, channel=None, priority=NORMAL):
         """
-        The function to send a message to the connect channel's public chat.
+        The function to send a message to a connected channel's public chat.
 
         Parameters:
             message (string): The message to be sent.
+            channel (string): The '#' prepended channel to send to - defaults to self.channel.
+            priority (int): The priority to queue the message with - see bot/outbox.py.
         
         Returns:
             None
         """
 
-        self.send(f'PRIVMSG {self.channel} :{message}')
+        self.send(f'PRIVMSG {channel or self.channel} :{message}', priority)
 
-    def send_private(self, user, message):
+    def send_private(self, user, message, priority=NORMAL):
         """
         The function to privately send a message to a Twitch user.
 
         Parameters:
             message (string): The message to be sent.
+            priority (int): The priority to queue the message with - see bot/outbox.py.
         
         Returns:
             None
         """
 
-        self.send(f'PRIVMSG {self.channel} :.w {user} {message}')
-        
+        self.send(f'PRIVMSG {self.channel} :.w {user} {message}', priority)
 
-    def send(self, data):
+    def timeout(self, user, seconds, reason='', channel=None):
         """
-        The function to send raw encoded data to the IRC server through the socket connection.
+        The function to time a user out of a channel's chat. It is sent ahead of any queued chat messages.
+
+        Parameters:
+            user (string): The user to time out.
+            seconds (int): The length of the timeout.
+            reason (string): The reason shown to the user and the other moderators.
+            channel (string): The '#' prepended channel to time them out of - defaults to self.channel.
+
+        Returns:
+            None
+        """
+
+        self.send_channel(f'.timeout {user} {seconds} {reason}'.rstrip(), channel, MODERATION)
+
+    def ban(self, user, reason='', channel=None):
+        """
+        The function to ban a user from a channel's chat. It is sent ahead of any queued chat messages.
+
+        Parameters:
+            user (string): The user to ban.
+            reason (string): The reason shown to the user and the other moderators.
+            channel (string): The '#' prepended channel to ban them from - defaults to self.channel.
+
+        Returns:
+            None
+        """
+
+        self.send_channel(f'.ban {user} {reason}'.rstrip(), channel, MODERATION)
+
+    def send(self, data, priority=NORMAL):
+        """
+        The function to send raw data to the IRC server.
+        Once the writer is running the data is queued and written within the rate limit, otherwise it is written straight away.
 
         Parameters:
             data (string): The data to be sent.
+            priority (int): The priority to queue the data with - see bot/outbox.py.
         
         Returns:
             None
@@ -162,26 +566,77 @@ class TwitchIrc:
 
         if data[-2:] == '\r\n':
             data = data[0:-2]
-        logging.debug(f'Sent data: {emoji.demojize(data)}')
-        self.sock.send(str.encode(data + '\r\n'))
+
+        trace = self.tracer.current
+        if not self.outbox.running:
+            return self.write(data, trace)
+
+        if trace:
+            trace.mark('enqueue')
+        self.outbox.put(data, priority, trace)
+
+    def write(self, data, trace=None):
+        """
+        The function to write data to the socket connection.
+
+        Parameters:
+            data (string): The data to be written, without its line ending.
+            trace (Trace): The trace of the message this is a reply to, or None.
+
+        Returns:
+            None
+        """
+
+        logging.debug('Sent data: %s', Demojized(data))
+        encoded = str.encode(data + '\r\n')
+
+        with self.send_lock:
+            self.sock.sendall(encoded)
+        self.bytes_sent.inc(len(encoded))
+        self.lines_sent.inc()
+
+        if trace:
+            trace.mark('write')
     
     def ping(self, data):
         """
         The function to respond to automatic Twitch IRC server ping messages.
         Failure to respond results in being kicked from the server.
         Checks to see if the message is a PING message, and replies accordingly.
+        Also sends a PING probe of our own so the round-trip time can be measured.
 
         Parameters:
-            data (bytes): The encoded message from the server.
+            data (bytes): A single encoded line from the server.
         
         Returns:
             None
         """
 
         if data.startswith(b'PING'):
-            self.sock.send(data.replace(b'PING', b'PONG'))
+            with self.send_lock:
+                self.sock.sendall(data.replace(b'PING', b'PONG', 1) + b'\r\n')
             logging.debug('Sent automated Ping to IRC server.')
 
+            if self.ping_sent is None:
+                self.ping_sent = perf_counter()
+                with self.send_lock:
+                    self.sock.sendall(b'PING :rtt\r\n')
+
+    def pong(self, data):
+        """
+        The function to handle the server's reply to one of our PING probes.
+
+        Parameters:
+            data (bytes): A single encoded line from the server.
+
+        Returns:
+            None
+        """
+
+        if self.ping_sent is not None and data.endswith(b':rtt'):
+            self.ping_rtt.observe(perf_counter() - self.ping_sent)
+            self.ping_sent = None
+
     def recv(self, amount=1024):
         """
         This function receives data and logs it.
@@ -194,21 +649,28 @@ class TwitchIrc:
 
         """
         data = self.sock.recv(amount)
+        self.read_ns = perf_counter_ns()
+        self.bytes_received.inc(len(data))
 
-        dd = data.decode().split('\r\n')
+        # Skip splitting the data at all unless it will be logged
+        if logging.root.isEnabledFor(logging.DEBUG):
+            dd = data.split(b'\r\n')
 
-        if not dd[-1]:
-            dd.pop(-1)
+            if not dd[-1]:
+                dd.pop(-1)
 
-        for line in dd:
-            logging.debug(f'Received data: {emoji.demojize(line)}')
+            for line in dd:
+                logging.debug('Received data: %s', Demojized(line))
 
         return data
 
     def recv_messages(self, amount=1024):
         """
         This function is the main driver of the TwitchIrc class.
-        It receives chunks of encoded data and passes it on to a parser.
+        It receives chunks of encoded data, splits them into lines, and passes any messages on to a parser.
+        Lines which fail to parse are counted and skipped, so one bad line can't drop the rest of the chunk.
+        Sampled messages carry their Trace under the 'trace' key.
+        TwitchBot runs these two steps on separate threads instead - see read_lines and parse_lines.
 
         Parameters:
             amount (int): The number of bytes to accept at once.
@@ -217,15 +679,151 @@ class TwitchIrc:
             parsed_messages (list): A list of messages received.
         """
 
+        return self.parse_lines(self.read_lines(amount))
+
+    def read_lines(self, amount=4096):
+        """
+        This function receives one chunk of data and splits it into lines, without parsing them.
+        PING messages are answered straight away, and a lost connection is re-established.
+
+        Parameters:
+            amount (int): The number of bytes to accept at once.
+
+        Returns:
+            pending (list): A list of (line, trace, read_time) tuples for the lines which still need parsing.
+                trace (Trace): The line's trace, or None if it wasn't sampled.
+                read_time (float): The wall clock time at which the line was read.
+        """
+
         data = self.recv(amount)
         if not data:
             logging.error('Lost connection, reconnecting...')
+            self.reconnects.inc()
             self.connect()
+            return []
+
+        read_time = self.clock.time()
+        spans = [('read', self.read_ns)]
+        lines = self.frame(data)
+        spans.append(('frame', perf_counter_ns()))
+
+        pending = []
+        for line in lines:
+            if line.startswith(b'PING'):
+                self.ping(line)
+            elif line.endswith(b':rtt'):
+                self.pong(line)
+            elif line:
+                pending.append((line, self.tracer.sample(spans), read_time))
+
+        return pending
+
+    def parse_lines(self, pending, results=None):
+        """
+        This function parses lines returned by read_lines into messages.
+
+        Parameters:
+            pending (list): A list of (line, trace, read_time) tuples from read_lines.
+            results (list): The lines already parsed by parse_batch, such as in a worker process, or None to parse them on this thread.
+
+        Returns:
+            parsed_messages (list): A list of messages received.
+                JOIN, PART and NAMES lines are merged into one MEMBERSHIP event per channel - see merge_membership.
+        """
+
+        if results is None:
+            results = parse_batch([line for line, trace, read_time in pending])
+
+        parsed_messages = []
+        membership = {}
+        for (line, trace, read_time), message in zip(pending, results):
+            if message is None:
+                continue
+
+            if isinstance(message, str):
+                self.parse_failures.inc()
+                logging.error('Failed to parse message: %s (%s)', Demojized(line), message)
+                continue
+
+            if message['command'] in MEMBERSHIP_COMMANDS:
+                self.merge_membership(membership, parsed_messages, message)
+                continue
+
+            if message['command'] != 'PRIVMSG':
+                logging.debug('Parsed event: %s %s %s', message['command'], message['channel'], Demojized(message['target'] or ''))
+            else:
+                # The message is demojized lazily, and only if the record is written - log files can't handle emojis
+                logging.debug('Parsed message data: user=%s badges=%s message=%s', message['user'], message['badges'], Demojized(message['message']))
+
+            if trace:
+                trace.mark('parse')
+                self.tracer.ingress(trace, message['tags'], read_time)
+                message['trace'] = trace
+
+            parsed_messages.append(message)
+
+        return parsed_messages
+
+    def merge_membership(self, membership, parsed_messages, event):
+        """
+        This function merges a JOIN, PART or NAMES event into the batch's MEMBERSHIP event for its channel.
+        Big channels send thousands of these lines at once, and merging them lets the bot apply a whole batch with a couple of set operations.
+
+        A MEMBERSHIP event holds:
+            joined (set): Users who joined, or were listed by NAMES.
+            parted (set): Users who left.
+            reset (bool): Whether the bot itself joined, so anyone from an earlier connection should be forgotten first.
+            complete (bool): Whether the NAMES list ended.
+
+        Parameters:
+            membership (dict): The batch's MEMBERSHIP events so far, by channel.
+            parsed_messages (list): The batch's parsed messages, which a new MEMBERSHIP event is added to.
+            event (dict): The parsed JOIN, PART, 353 or 366 event.
+
+        Returns:
+            None
+        """
 
-        self.ping(data)
+        merged = membership.get(event['channel'])
+        if merged is None:
+            merged = membership[event['channel']] = {'command': 'MEMBERSHIP', 'channel': event['channel'], 'tags': {}, 'joined': set(), 'parted': set(), 'reset': False, 'complete': False}
+            parsed_messages.append(merged)
+
+        command, target = event['command'], event['target']
+        if command == 'JOIN' and target == self.user:
+            merged['reset'] = True
+            merged['joined'].clear()
+            merged['parted'].clear()
+        elif command == 'JOIN':
+            merged['joined'].add(target)
+            merged['parted'].discard(target)
+        elif command == 'PART':
+            merged['parted'].add(target)
+            merged['joined'].discard(target)
+        elif command == '353':
+            names = target.split()
+            merged['joined'].update(names)
+            merged['parted'].difference_update(names)
+        else:
+            merged['complete'] = True
+
+    def frame(self, data):
+        """
+        This function splits received data into complete lines.
+        A line split across two reads is held in self.buffer until the rest of it arrives.
 
-        if self.check_has_message(data):
-            return [self.parse_message(line) for line in data.split(b'\r\n')]
+        Parameters:
+            data (bytes): The data received from the socket.
+
+        Returns:
+            lines (list): The complete lines, without their line endings.
+        """
+
+        lines = (self.buffer + data).split(b'\r\n')
+        self.buffer = lines.pop()
+        self.lines_received.inc(len(lines))
+
+        return lines
 
     def check_has_message(self, data):
         """
@@ -238,7 +836,7 @@ class TwitchIrc:
             search (bool): True if a message is found in data, false otherwise.
         """
 
-        return re.search(r':[a-zA-Z0-9_]+\![a-zA-Z0-9_]+@[a-zA-Z0-9_]+(\.tmi\.twitch\.tv|\.testserver\.local) PRIVMSG #[a-zA-Z0-9_]+ :.+$', data.decode())
+        return check_has_message(data)
 
     def parse_message(self, data):
         """
@@ -248,29 +846,11 @@ class TwitchIrc:
             data (bytes): The encoded data from the IRC server which contains a message.
         
         Returns:
-            userData (dict): Information about the message, such as who sent it, their badges, and what it says.
+            userData (dict): Information about the message, such as who sent it, their badges, their IRC tags, and what it says.
         """
 
         if data:
-            dd = data.decode('utf8')
-
-            userData = {
-                'user': re.search(r'!(\w+)@', dd).group(1),
-                'message': re.search(r'PRIVMSG #\w+ :(.+)$', dd).group(1),
-                'badges': {}
-            }
-
-            tagList = re.search(r';badges=((.)*?);', dd).group(1).split(',')
-            for tag in tagList:
-                tagData = tag.split('/')
-                userData['badges'][tagData[0]] = int(tagData[1])
-
-            # Create a demojized copy of the data so we can log it without crashing - log files can't handle emojis
-            loggedData = copy.deepcopy(userData)
-            loggedData['message'] = emoji.demojize(loggedData['message'])
-            logging.debug(f'Parsed message data: {loggedData}')
-
-            return userData
+            return parse_line(data)
 
     def logged_in(self, data):
         """
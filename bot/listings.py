@@ -0,0 +1,119 @@
+# Twitch drops messages over 500 characters, and a whisper also carries '.w {user} ' and the page marker,
+# so each page holds at most this many bytes of the listing
+PAGE_BYTES = 400
+
+# The number of pages sent when no page is asked for
+PAGES_PER_REQUEST = 3
+
+SEPARATOR = ' | '
+
+
+def split_bytes(data, size):
+    """
+    This function splits encoded text into pieces of at most size bytes, never cutting a character in half.
+
+    Parameters:
+        data (bytes): The UTF-8 encoded text.
+        size (int): The most bytes in each piece.
+
+    Returns:
+        pieces (list): The pieces, in order.
+    """
+
+    pieces = []
+    while len(data) > size:
+        cut = size
+        # UTF-8 continuation bytes look like 10xxxxxx, so back up to the byte which starts the character
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(data[:cut])
+        data = data[cut:]
+
+    pieces.append(data)
+    return pieces
+
+
+def paginate(entries, size=PAGE_BYTES):
+    """
+    This function joins entries into pages of at most size bytes of UTF-8.
+    Pages only break between entries, unless a single entry is too long for a page by itself.
+
+    Parameters:
+        entries (iterable): The entries, as strings.
+        size (int): The most bytes on each page.
+
+    Returns:
+        pages (list): The pages, as strings, or an empty list if there are no entries.
+    """
+
+    separator = SEPARATOR.encode('utf8')
+    pages = []
+    page = b''
+    for entry in entries:
+        data = entry.encode('utf8')
+
+        if page and len(page) + len(separator) + len(data) <= size:
+            page += separator + data
+            continue
+
+        if page:
+            pages.append(page)
+
+        *full, page = split_bytes(data, size)
+        pages.extend(full)
+
+    if page:
+        pages.append(page)
+
+    return [page.decode('utf8') for page in pages]
+
+
+class Listings:
+    """
+    This is a class for caching the pages of listings, such as every custom command, which only change when their data does.
+    Each listing is rendered and split into pages the first time it is asked for, and the pages are reused until it is invalidated.
+
+    Attributes:
+        pages (dict): The pages of each listing rendered since it last changed.
+    """
+
+    def __init__(self):
+        """
+        The constructor for the Listings class.
+
+        Parameters:
+            None
+        """
+
+        self.pages = {}
+
+    def get(self, name, render):
+        """
+        This function returns a listing's pages, rendering them if they aren't cached.
+
+        Parameters:
+            name (string): The name of the listing.
+            render (callable): Returns the listing's entries, as strings. Only called if the pages aren't cached.
+
+        Returns:
+            pages (list): The listing's pages.
+        """
+
+        pages = self.pages.get(name)
+        if pages is None:
+            pages = self.pages[name] = paginate(render())
+
+        return pages
+
+    def invalidate(self, name):
+        """
+        This function drops a listing's pages, after its data has changed.
+
+        Parameters:
+            name (string): The name of the listing.
+
+        Returns:
+            None
+        """
+
+        self.pages.pop(name, None)
@@ -0,0 +1,134 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from functools import lru_cache
+import logging
+import atexit
+import queue
+import os
+
+
+@lru_cache(maxsize=4096)
+def demojize_cached(text):
+    """
+    This function replaces emojis with their text names, caching the result.
+    Chat repeats itself a lot, so the same lines are often demojized many times.
+    The emoji module is slow to import, so it is only imported the first time it is needed.
+
+    Parameters:
+        text (string): The text to demojize.
+
+    Returns:
+        demojized (string): The text with emojis replaced.
+    """
+
+    import emoji
+
+    return emoji.demojize(text)
+
+
+def demojize(text):
+    """
+    This function replaces emojis with their text names so they can be written to the log.
+    Plain ASCII text can't contain emojis, so it is returned as is.
+
+    Parameters:
+        text (string): The text to demojize.
+
+    Returns:
+        demojized (string): The text with emojis replaced.
+    """
+
+    if text.isascii():
+        return text
+
+    return demojize_cached(text)
+
+
+class Demojized:
+    """
+    This is a class for passing text to a log call without demojizing it up front.
+    The text is only demojized if the record is actually written, and then on the logging thread.
+
+    Attributes:
+        text (string or bytes): The text to log. Bytes are decoded as UTF-8.
+    """
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        """
+        The constructor for the Demojized class.
+
+        Parameters:
+            text (string or bytes): The text to log. Bytes are decoded as UTF-8.
+        """
+
+        self.text = text
+
+    def __str__(self):
+        text = self.text
+        if isinstance(text, bytes):
+            text = text.decode(errors='replace')
+
+        return demojize(text)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    This is a class for handing log records to a background thread without formatting them first.
+    The standard QueueHandler formats each record on the calling thread, which is the work we want to move off the bot's loop.
+    Arguments passed to a log call must therefore not be modified afterwards.
+    """
+
+    def prepare(self, record):
+        """
+        This function prepares a record for the queue.
+        Only exception information is rendered here, as the traceback may not outlive the calling frame.
+
+        Parameters:
+            record (LogRecord): The record to prepare.
+
+        Returns:
+            record (LogRecord): The record to enqueue.
+        """
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+def setup_logging(filename, level, max_bytes=10 * 1024 * 1024, backups=5, format='%(asctime)s %(levelname)s: %(message)s'):
+    """
+    This function configures the root logger to write through a queue to a rotating log file on a background thread.
+    Each run starts a fresh log file, and the previous run's log is kept as a backup.
+    The listener is stopped at exit, so records still in the queue are flushed even if the bot exits during startup.
+
+    Parameters:
+        filename (string): The log file.
+        level (string or int): The logging level.
+        max_bytes (int): The size at which the log file is rotated.
+        backups (int): The number of rotated log files to keep.
+        format (string): The log record format.
+
+    Returns:
+        listener (QueueListener): The running listener.
+    """
+
+    handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter(format))
+
+    if os.path.exists(filename) and os.path.getsize(filename):
+        handler.doRollover()
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(LazyQueueHandler(records))
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    return listener
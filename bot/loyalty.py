@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import logging
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS points (
+    channel TEXT NOT NULL,
+    user TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (channel, user)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS leaderboard ON points (channel, points DESC);
+'''
+
+ACCRUE = '''
+INSERT INTO points (channel, user, points) VALUES (?, ?, ?)
+ON CONFLICT (channel, user) DO UPDATE SET points = points + excluded.points
+'''
+
+
+class Loyalty:
+    """
+    This is a class for the loyalty points users earn by being in a channel and chatting in it.
+    Each round, everyone present earns points, and anyone who chatted since the last round earns a bonus. The bot starts a round on a timer.
+    The whole round is written as one transaction on a background thread, so crediting tens of thousands of users doesn't hold up commands.
+
+    Points are kept in SQLite, with an index on (channel, points), which SQLite keeps sorted as points change.
+    The leaderboard reads the first N entries of that index instead of sorting the table.
+
+    Attributes:
+        path (string): The database file.
+        present_points (int): The points everyone present earns each round.
+        chat_points (int): The extra points anyone who chatted earns each round.
+        chatted (dict): The set of users who chatted in each channel since the last round.
+        reader (Connection): The connection commands read from, only used on the dispatch thread.
+        connection (Connection): The connection rounds are written with, only used on the writer thread.
+        writer (ThreadPoolExecutor): The single thread rounds are written on.
+    """
+
+    def __init__(self, path, present_points=10, chat_points=5):
+        """
+        The constructor for the Loyalty class.
+
+        Parameters:
+            path (string): The database file, which is created if it doesn't exist.
+            present_points (int): The points everyone present earns each round.
+            chat_points (int): The extra points anyone who chatted earns each round.
+        """
+
+        # Only loaded when loyalty is turned on, to keep startup quick
+        import sqlite3
+
+        self.path = path
+        self.present_points = present_points
+        self.chat_points = chat_points
+        self.chatted = {}
+
+        # Write-ahead logging lets commands read while a round is being written, including from other shards
+        setup = sqlite3.connect(path, timeout=30)
+        setup.execute('PRAGMA journal_mode=WAL')
+        setup.executescript(SCHEMA)
+        setup.close()
+
+        # Each connection is only used by one thread, but not necessarily the one which opened it
+        self.reader = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # A crash can lose the last round at worst, but never corrupt the database
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='loyalty')
+
+    def chat(self, channel, user):
+        """
+        This function records that a user chatted, so they earn the chat bonus this round.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            None
+        """
+
+        chatters = self.chatted.get(channel)
+        if chatters is None:
+            chatters = self.chatted[channel] = set()
+        chatters.add(user)
+
+    def accrue(self, present, exclude=()):
+        """
+        This function starts a round of points, which is written on the background thread.
+
+        Parameters:
+            present (dict): The set of users present in each channel - see Presence.channels.
+            exclude (iterable): Users who never earn points, such as the bot itself.
+
+        Returns:
+            future (Future): Completes with the number of users credited once the round is written.
+        """
+
+        chatted, self.chatted = self.chatted, {}
+        exclude = set(exclude)
+
+        rows = []
+        for channel in present.keys() | chatted.keys():
+            chatters = chatted.get(channel, set())
+            for user in present.get(channel, set()) | chatters:
+                if user not in exclude:
+                    rows.append((channel, user, self.present_points + (self.chat_points if user in chatters else 0)))
+
+        return self.writer.submit(self.write, rows)
+
+    def write(self, rows):
+        """
+        This function writes a round of points as one transaction. It runs on the background thread.
+
+        Parameters:
+            rows (list): The (channel, user, points) to add.
+
+        Returns:
+            count (int): The number of users credited.
+        """
+
+        start = perf_counter()
+        try:
+            with self.connection:
+                self.connection.executemany(ACCRUE, rows)
+        except Exception as e:
+            logging.error(f'Failed to credit loyalty points to {len(rows)} users. ({type(e).__name__}: {e})')
+            return 0
+
+        logging.info(f'Credited loyalty points to {len(rows)} users in {perf_counter() - start:.3f} seconds.')
+        return len(rows)
+
+    def balance(self, channel, user):
+        """
+        This function looks up a user's points.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            points (int): The user's points, or 0 if they have none.
+        """
+
+        row = self.reader.execute('SELECT points FROM points WHERE channel = ? AND user = ?', (channel, user)).fetchone()
+        return row[0] if row else 0
+
+    def top(self, channel, count):
+        """
+        This function returns the users with the most points, read in order from the leaderboard index.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            count (int): The number of users to return.
+
+        Returns:
+            leaders (list): The (user, points) of the top users, highest first.
+        """
+
+        return self.reader.execute('SELECT user, points FROM points WHERE channel = ? ORDER BY points DESC LIMIT ?', (channel, count)).fetchall()
+
+    def close(self):
+        """
+        This function waits for any round being written, then closes the database.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.writer.shutdown(wait=True)
+        self.reader.close()
+        self.connection.close()
@@ -0,0 +1,544 @@
+from bisect import bisect_left
+import threading
+import logging
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_labels(labels):
+    """
+    This function renders a dictionary of labels in Prometheus text format.
+
+    Parameters:
+        labels (dict): The label names and values.
+
+    Returns:
+        rendered (string): The labels in the form {name="value",...}, or an empty string if there are none.
+    """
+
+    if not labels:
+        return ''
+
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+
+    return '{' + ','.join(pairs) + '}'
+
+
+class Cells:
+    """
+    This is a class for a value kept in one cell per thread which updates it, and summed when it is read.
+    Metrics are updated from the reader, writer and sender threads, and += is not atomic, but as each thread only ever
+    changes its own cell, updates need no lock. The lock is only taken the first time a thread updates the value, to add its cell.
+
+    Attributes:
+        local (local): The calling thread's cell.
+        cells (list): Every thread's cell, each a one item list.
+        lock (Lock): Guards adding to cells.
+    """
+
+    __slots__ = ('local', 'cells', 'lock')
+
+    def __init__(self):
+        """
+        The constructor for the Cells class.
+        """
+
+        self.local = threading.local()
+        self.cells = []
+        self.lock = threading.Lock()
+
+    def cell(self):
+        """
+        This function gets the calling thread's cell, adding one the first time.
+
+        Parameters:
+            None
+
+        Returns:
+            cell (list): The thread's cell, holding its share of the value.
+        """
+
+        try:
+            return self.local.cell
+        except AttributeError:
+            cell = self.local.cell = [0]
+            with self.lock:
+                self.cells.append(cell)
+
+            return cell
+
+    @property
+    def value(self):
+        return sum([cell[0] for cell in self.cells])
+
+
+class Counter(Cells):
+    """
+    This is a class for a monotonically increasing value.
+
+    Attributes:
+        value (int or float): The current count, summed from each thread's cell.
+    """
+
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        """
+        This function increases the counter.
+
+        Parameters:
+            amount (int or float): The amount to increase by.
+
+        Returns:
+            None
+        """
+
+        try:
+            self.local.cell[0] += amount
+        except AttributeError:
+            self.cell()[0] += amount
+
+
+class Gauge(Cells):
+    """
+    This is a class for a value which can go up and down, such as a queue depth.
+
+    Attributes:
+        value (int or float): The current value, summed from each thread's cell.
+    """
+
+    __slots__ = ()
+
+    def set(self, value):
+        """
+        This function sets the gauge to a new value. Updates made on other threads at the same time may be lost.
+
+        Parameters:
+            value (int or float): The new value.
+
+        Returns:
+            None
+        """
+
+        self.cell()[0] += value - self.value
+
+    def inc(self, amount=1):
+        """
+        This function increases the gauge.
+
+        Parameters:
+            amount (int or float): The amount to increase by.
+
+        Returns:
+            None
+        """
+
+        self.cell()[0] += amount
+
+    def dec(self, amount=1):
+        """
+        This function decreases the gauge.
+
+        Parameters:
+            amount (int or float): The amount to decrease by.
+
+        Returns:
+            None
+        """
+
+        self.cell()[0] -= amount
+
+
+class CallbackGauge:
+    """
+    This is a class for a gauge whose value is read from a function when the metrics are rendered.
+    It suits values which are cheaper to look up on demand than to keep updated, such as the size of a queue.
+
+    Attributes:
+        function (callable): Returns the current value.
+    """
+
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        """
+        The constructor for the CallbackGauge class.
+
+        Parameters:
+            function (callable): Returns the current value.
+        """
+
+        self.function = function
+
+    @property
+    def value(self):
+        return self.function()
+
+
+class Histogram:
+    """
+    This is a class for recording the distribution of observed values, such as latencies.
+    Like a Counter, each thread observes into its own cell, a preallocated list, so observations are cheap enough for the hot path.
+
+    Attributes:
+        buckets (tuple): The sorted upper bounds of each bucket.
+        local (local): The calling thread's cell.
+        cells (list): Every thread's cell - the number of observations which fell into each bucket,
+            with a final +Inf bucket, followed by the sum of its observations.
+        lock (Lock): Guards adding to cells.
+    """
+
+    __slots__ = ('buckets', 'local', 'cells', 'lock')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        The constructor for the Histogram class.
+
+        Parameters:
+            buckets (tuple): The sorted upper bounds of each bucket.
+        """
+
+        self.buckets = tuple(buckets)
+        self.local = threading.local()
+        self.cells = []
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        This function records a single observation.
+
+        Parameters:
+            value (float): The observed value.
+
+        Returns:
+            None
+        """
+
+        try:
+            cell = self.local.cell
+        except AttributeError:
+            cell = self.local.cell = [0] * (len(self.buckets) + 1) + [0.0]
+            with self.lock:
+                self.cells.append(cell)
+
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self):
+        """
+        This function adds up every thread's observations.
+
+        Parameters:
+            None
+
+        Returns:
+            counts (list): The number of observations which fell into each bucket, with a final +Inf bucket.
+            sum (float): The sum of all observations.
+            count (int): The number of observations, counted from the buckets so that they always add up to it.
+        """
+
+        totals = [sum(column) for column in zip(*self.cells)] or [0] * (len(self.buckets) + 1) + [0.0]
+        counts = totals[:-1]
+
+        return counts, totals[-1], sum(counts)
+
+
+class Family:
+    """
+    This is a class for a named metric with zero or more label combinations.
+
+    Attributes:
+        name (string): The metric name.
+        help (string): A description of the metric.
+        kind (string): The metric type - counter, gauge or histogram.
+        factory (callable): Creates a new child metric for an unseen label combination.
+        children (dict): A dictionary of label value tuples and their child metrics.
+        labelnames (tuple): The names of the labels, in order.
+    """
+
+    def __init__(self, name, help, kind, factory, labelnames=()):
+        """
+        The constructor for the Family class.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            kind (string): The metric type - counter, gauge or histogram.
+            factory (callable): Creates a new child metric for an unseen label combination.
+            labelnames (tuple): The names of the labels, in order.
+        """
+
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.factory = factory
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+
+        if not self.labelnames:
+            self.children[()] = factory()
+
+    def labels(self, *values):
+        """
+        This function gets the child metric for a label combination, creating it if needed.
+        Callers on the hot path should keep a reference to the child instead of calling this per event.
+
+        Parameters:
+            values (strings): The label values, in the same order as labelnames.
+
+        Returns:
+            child (Counter, Gauge or Histogram): The child metric.
+        """
+
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, self.factory())
+
+        return child
+
+    def render(self):
+        """
+        This function renders the family in Prometheus text format.
+
+        Parameters:
+            None
+
+        Returns:
+            lines (list): The lines of text describing this family.
+        """
+
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+        # Copy the children so a new label combination added mid-render can't break iteration
+        for values, child in list(self.children.items()):
+            labels = dict(zip(self.labelnames, values))
+
+            if self.kind == 'histogram':
+                counts, total, count = child.snapshot()
+
+                cumulative = 0
+                for bound, bucketCount in zip(child.buckets + (float('inf'),), counts):
+                    cumulative += bucketCount
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{self.name}_bucket{format_labels({**labels, "le": le})} {cumulative}')
+                lines.append(f'{self.name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+            else:
+                lines.append(f'{self.name}{format_labels(labels)} {child.value}')
+
+        return lines
+
+
+class Metrics:
+    """
+    This is a class which holds every metric exposed by the bot.
+
+    Attributes:
+        families (dict): A dictionary of metric names and their families.
+    """
+
+    def __init__(self):
+        """
+        The constructor for the Metrics class.
+        """
+
+        self.families = {}
+
+    def register(self, name, help, kind, factory, labelnames=()):
+        """
+        This function registers a metric family, or returns the existing one with the same name.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            kind (string): The metric type - counter, gauge or histogram.
+            factory (callable): Creates a new child metric for an unseen label combination.
+            labelnames (tuple): The names of the labels, in order.
+
+        Returns:
+            family (Family): The registered family.
+        """
+
+        if name not in self.families:
+            self.families[name] = Family(name, help, kind, factory, labelnames)
+
+        return self.families[name]
+
+    def counter(self, name, help, labelnames=()):
+        """
+        This function registers a counter.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            labelnames (tuple): The names of the labels, in order.
+
+        Returns:
+            metric (Counter or Family): The counter itself if it has no labels, otherwise its family.
+        """
+
+        family = self.register(name, help, 'counter', Counter, labelnames)
+        return family if labelnames else family.labels()
+
+    def gauge(self, name, help, labelnames=()):
+        """
+        This function registers a gauge.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            labelnames (tuple): The names of the labels, in order.
+
+        Returns:
+            metric (Gauge or Family): The gauge itself if it has no labels, otherwise its family.
+        """
+
+        family = self.register(name, help, 'gauge', Gauge, labelnames)
+        return family if labelnames else family.labels()
+
+    def gauge_callback(self, name, help, function, labelnames=(), labelvalues=()):
+        """
+        This function registers a gauge whose value is read from a function when the metrics are rendered.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            function (callable): Returns the current value.
+            labelnames (tuple): The names of the labels, in order.
+            labelvalues (tuple): The label values for this gauge, in the same order as labelnames.
+
+        Returns:
+            gauge (CallbackGauge): The registered gauge.
+        """
+
+        family = self.register(name, help, 'gauge', Gauge, labelnames)
+        family.children[tuple(labelvalues)] = CallbackGauge(function)
+
+        return family.children[tuple(labelvalues)]
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        This function registers a histogram.
+
+        Parameters:
+            name (string): The metric name.
+            help (string): A description of the metric.
+            labelnames (tuple): The names of the labels, in order.
+            buckets (tuple): The sorted upper bounds of each bucket.
+
+        Returns:
+            metric (Histogram or Family): The histogram itself if it has no labels, otherwise its family.
+        """
+
+        family = self.register(name, help, 'histogram', lambda: Histogram(buckets), labelnames)
+        return family if labelnames else family.labels()
+
+    def render(self):
+        """
+        This function renders every metric in Prometheus text format.
+
+        Parameters:
+            None
+
+        Returns:
+            text (string): The exposition text.
+        """
+
+        lines = []
+        for family in list(self.families.values()):
+            lines.extend(family.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    This is a class for serving metrics over HTTP in Prometheus text format.
+    The server runs on a daemon thread and only ever reads the metric values.
+    http.server is slow to import, so it is only imported when the server starts.
+
+    Attributes:
+        metrics (Metrics): The metrics to serve.
+        host (string): The address to listen on.
+        port (int): The port to listen on.
+        server (ThreadingHTTPServer): The underlying HTTP server, once started.
+    """
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        """
+        The constructor for the MetricsServer class.
+
+        Parameters:
+            metrics (Metrics): The metrics to serve.
+            port (string or int): The port to listen on.
+            host (string): The address to listen on - defaults to localhost only.
+        """
+
+        self.metrics = metrics
+        self.host = host
+        self.port = int(port)
+        self.server = None
+
+    def start(self):
+        """
+        This function starts serving metrics on a background thread.
+        If the port can't be listened on, such as when something else is using it, the error is logged and the bot runs without metrics.
+
+        Parameters:
+            None
+
+        Returns:
+            started (bool): True if metrics are being served.
+        """
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logging.error(f'Error serving metrics on {self.host}:{self.port}, continuing without them. ({type(e).__name__}: {e})')
+            return False
+
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        logging.info(f'Serving metrics on http://{self.host}:{self.port}/metrics')
+
+        return True
+
+    def stop(self):
+        """
+        This function stops the metrics server.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
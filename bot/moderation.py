@@ -0,0 +1,268 @@
+from collections import OrderedDict, deque
+from .clock import CLOCK
+from .emotes import Emotes
+from array import array
+import re
+
+# Settings used for anything left out of config.MODERATION
+DEFAULTS = {
+    'window': 60,               # Seconds over which copies of a message are counted
+    'buckets': 6,               # Slices of the window, each forgotten as a whole once it ages out
+    'width': 4096,              # Counters per row of the duplicate sketch
+    'depth': 4,                 # Rows of the duplicate sketch
+    'min_length': 12,           # Letters and digits a message needs before copies of it are counted
+    'flood_count': 5,           # Copies of a message across chat within the window which make a flood
+    'repeat_count': 3,          # Copies of a message from one user within the window which make a repeat
+    'history': 5,               # Recent messages remembered per user
+    'max_users': 50000,         # Users remembered at once - the least recently active are forgotten first
+    'caps_ratio': 0.7,          # Fraction of capital letters which makes a message shouting...
+    'caps_min': 15,             # ...once it has at least this many letters
+    'max_emotes': 15,           # Emotes allowed in one message
+    'links_allowed': ['vip', 'subscriber'],  # Badges which may post links
+    'timeouts': {'flood': 60, 'repeat': 60, 'caps': 10, 'emotes': 10, 'links': 10},  # Seconds per rule, 0 turns a rule off
+}
+
+# Users with these badges are never moderated
+EXEMPT = frozenset(('broadcaster', 'moderator'))
+
+# The reason given with each rule's timeout
+REASONS = {
+    'flood': 'Copy-paste flooding',
+    'repeat': 'Repeating the same message',
+    'caps': 'Excessive caps',
+    'emotes': 'Excessive emotes',
+    'links': 'Posting links',
+}
+
+# Length of the overlapping chunks a message is fingerprinted by
+SHINGLE = 8
+
+NOISE_PATTERN = re.compile(r'[\W_]+')
+RUN_PATTERN = re.compile(r'(.)\1{2,}')
+UPPER_PATTERN = re.compile(r'[A-Z]')
+LETTER_PATTERN = re.compile(r'[A-Za-z]')
+LINK_PATTERN = re.compile(r'(?:https?://|www\.)\S|\b[\w-]+\.(?:com|net|org|tv|gg|io|ly|me|co|xyz|ru)\b', re.IGNORECASE)
+
+
+def fingerprint(text):
+    """
+    This function reduces a message to a number which its near copies share.
+    Case, punctuation, spacing and stretched letters are ignored, then the smallest hash of any 8 character chunk is kept,
+    so a copy with a few characters added to or removed from either end usually still matches.
+
+    Parameters:
+        text (string): The message.
+
+    Returns:
+        length (int): The number of letters and digits in the message.
+        fingerprint (int): The message's fingerprint.
+    """
+
+    normal = RUN_PATTERN.sub(r'\1\1', NOISE_PATTERN.sub('', text.lower()))
+    if len(normal) <= SHINGLE:
+        return len(normal), hash(normal)
+
+    # Slicing and the built-in hash run in C, which beats rolling a hash along the string in Python
+    return len(normal), min([hash(normal[i:i + SHINGLE]) for i in range(len(normal) - SHINGLE + 1)])
+
+
+class DuplicateSketch:
+    """
+    This is a class for counting how often each fingerprint was seen recently, in a fixed amount of memory.
+    It is a count-min sketch split into time buckets: a count is the smallest, over the rows, of that row's counters
+    summed across the live buckets, and a bucket is zeroed when it is reused, so old messages age out without being tracked one by one.
+    Counts can only be overestimated, by hash collisions, which the width keeps rare.
+
+    Attributes:
+        width (int): Counters per row.
+        depth (int): Rows per bucket.
+        span (float): Seconds covered by each bucket.
+        counts (list): One array of depth * width counters per bucket.
+        epochs (list): The time slice each bucket currently holds.
+        empty (array): A zeroed bucket to reset others from.
+    """
+
+    def __init__(self, window, buckets, width, depth):
+        """
+        The constructor for the DuplicateSketch class.
+
+        Parameters:
+            window (float): Seconds over which fingerprints are counted.
+            buckets (int): Slices of the window.
+            width (int): Counters per row.
+            depth (int): Rows per bucket.
+        """
+
+        self.width = width
+        self.depth = depth
+        self.span = window / buckets
+        self.empty = array('I', [0]) * (width * depth)
+        self.counts = [array('I', self.empty) for _ in range(buckets)]
+        self.epochs = [-1] * buckets
+
+    def add(self, fingerprint, now):
+        """
+        This function counts a fingerprint.
+
+        Parameters:
+            fingerprint (int): The fingerprint to count.
+            now (float): The current monotonic time.
+
+        Returns:
+            count (int): How many times the fingerprint has been seen within the window, including this one.
+        """
+
+        epoch = int(now // self.span)
+        current = epoch % len(self.counts)
+        if self.epochs[current] != epoch:
+            self.counts[current][:] = self.empty
+            self.epochs[current] = epoch
+
+        # Derive one index per row from two halves of the fingerprint
+        first = fingerprint & 0xFFFFFFFF
+        second = (fingerprint >> 32) | 1
+        oldest = epoch - len(self.counts)
+
+        count = None
+        for row in range(self.depth):
+            index = row * self.width + (first + row * second) % self.width
+            self.counts[current][index] += 1
+            total = sum(counts[index] for counts, e in zip(self.counts, self.epochs) if e > oldest)
+            count = total if count is None else min(count, total)
+
+        return count
+
+
+class Moderator:
+    """
+    This is a class for spotting spam and floods in chat, so the sender can be timed out.
+    The rules are chosen once, from the settings, and each message is checked against them in turn.
+    All of its memory is fixed in size or capped, however many users are chatting.
+
+    Attributes:
+        settings (dict): DEFAULTS, updated with the configured settings.
+        sketch (DuplicateSketch): Counts copies of each message across chat.
+        recent (OrderedDict): Each user's recent (time, fingerprint) pairs, least recently active first.
+        rules (list): The (name, check) pairs of the enabled rules, in the order they are checked.
+        links_allowed (frozenset): Badges which may post links.
+        clock (Clock): The source of time.
+    """
+
+    def __init__(self, settings=None, clock=None):
+        """
+        The constructor for the Moderator class.
+
+        Parameters:
+            settings (dict): Settings to change from DEFAULTS - see config.MODERATION.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.settings = {**DEFAULTS, **(settings or {})}
+        self.settings['timeouts'] = {**DEFAULTS['timeouts'], **self.settings['timeouts']}
+        s = self.settings
+
+        self.sketch = DuplicateSketch(s['window'], s['buckets'], s['width'], s['depth'])
+        self.recent = OrderedDict()
+        self.links_allowed = frozenset(s['links_allowed'])
+
+        checks = {
+            'links': self.check_links,
+            'emotes': self.check_emotes,
+            'caps': self.check_caps,
+            'repeat': self.check_repeat,
+            'flood': self.check_flood,
+        }
+        self.rules = [(name, check) for name, check in checks.items() if s['timeouts'][name]]
+
+    def check(self, user, message, badges, emotes=None, now=None):
+        """
+        This function checks a chat message against the rules.
+        Every message from a user who isn't exempt is remembered, whether or not it breaks a rule.
+
+        Parameters:
+            user (string): The user who sent the message.
+            message (string): The message.
+            badges (dict): The user's badges.
+            emotes (Emotes): The message's emotes, or None if it has none.
+            now (float): The current monotonic time - defaults to now.
+
+        Returns:
+            action (tuple): The (rule, seconds, reason) to time the user out with, or None if the message broke no rules.
+        """
+
+        if EXEMPT.intersection(badges):
+            return None
+
+        now = self.clock.monotonic() if now is None else now
+        length, print_ = fingerprint(message)
+        context = (user, message, badges, emotes or Emotes('', message), now, length, print_)
+
+        action = None
+        for name, check in self.rules:
+            if check(*context):
+                action = (name, self.settings['timeouts'][name], REASONS[name])
+                break
+
+        self.remember(user, now, length, print_)
+        return action
+
+    def remember(self, user, now, length, print_):
+        """
+        This function adds a message to its user's ring buffer, forgetting the least recently active user if there are too many.
+
+        Parameters:
+            user (string): The user who sent the message.
+            now (float): The current monotonic time.
+            length (int): The number of letters and digits in the message.
+            print_ (int): The message's fingerprint.
+
+        Returns:
+            None
+        """
+
+        if length < self.settings['min_length']:
+            return
+
+        history = self.recent.get(user)
+        if history is None:
+            history = self.recent[user] = deque(maxlen=self.settings['history'])
+            if len(self.recent) > self.settings['max_users']:
+                self.recent.popitem(last=False)
+        else:
+            self.recent.move_to_end(user)
+
+        history.append((now, print_))
+
+    def check_links(self, user, message, badges, emotes, now, length, print_):
+        return not self.links_allowed.intersection(badges) and LINK_PATTERN.search(message) is not None
+
+    def check_emotes(self, user, message, badges, emotes, now, length, print_):
+        return len(emotes) > self.settings['max_emotes']
+
+    def check_caps(self, user, message, badges, emotes, now, length, print_):
+        upper = len(UPPER_PATTERN.findall(message))
+        if upper < self.settings['caps_min']:
+            return False
+
+        # Emotes are often capitalised, so they are only removed once the message already looks like shouting
+        if emotes:
+            message = emotes.stripped()
+            upper = len(UPPER_PATTERN.findall(message))
+
+        letters = len(LETTER_PATTERN.findall(message))
+        return letters >= self.settings['caps_min'] and upper / letters >= self.settings['caps_ratio']
+
+    def check_repeat(self, user, message, badges, emotes, now, length, print_):
+        if length < self.settings['min_length'] or user not in self.recent:
+            return False
+
+        since = now - self.settings['window']
+        copies = sum(1 for time, p in self.recent[user] if p == print_ and time >= since)
+        return copies + 1 >= self.settings['repeat_count']
+
+    def check_flood(self, user, message, badges, emotes, now, length, print_):
+        if length < self.settings['min_length']:
+            return False
+
+        return self.sketch.add(print_, now) >= self.settings['flood_count']
@@ -0,0 +1,310 @@
+from collections import deque
+from .clock import CLOCK
+import itertools
+import threading
+import heapq
+
+# Outbound message priorities - lower numbers are sent first
+MODERATION = 0
+NORMAL = 1
+BULK = 2
+
+# Seconds a channel must have been quiet before its messages move to another account,
+# as a message on another connection could otherwise reach Twitch before the one just sent
+HANDOFF_DELAY = 1
+
+
+class RateLimiter:
+    """
+    This is a class for a sliding window rate limiter, which allows no more than `capacity` messages in any `seconds` long window.
+    It keeps the times of the last `capacity` messages, and another can only be sent once the oldest of them is `seconds` old,
+    so a burst never adds to the steady rate the way a refilling bucket would.
+
+    Attributes:
+        capacity (int): The most messages allowed in a window.
+        seconds (float): The length of the window.
+        rate (float): The average number of messages allowed per second.
+        sent (deque): The monotonic times of the most recent messages, oldest first, at most capacity of them.
+        clock (Clock): The source of time.
+    """
+
+    def __init__(self, capacity, seconds, clock=None):
+        """
+        The constructor for the RateLimiter class.
+
+        Parameters:
+            capacity (int): The number of messages allowed...
+            seconds (float): ...in this many seconds.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.capacity = int(capacity)
+        self.seconds = seconds
+        self.rate = capacity / seconds
+        self.sent = deque(maxlen=self.capacity)
+
+    def available(self):
+        """
+        This function forgets messages which have left the window, and returns how many more may be sent now.
+
+        Parameters:
+            None
+
+        Returns:
+            room (int): The messages which may be sent now.
+        """
+
+        expired = self.clock.monotonic() - self.seconds
+        sent = self.sent
+        while sent and sent[0] <= expired:
+            sent.popleft()
+
+        return self.capacity - len(sent)
+
+    def wait_time(self):
+        """
+        This function determines how long until a message may be sent.
+
+        Parameters:
+            None
+
+        Returns:
+            wait (float): The seconds to wait, or 0 if a message may be sent now.
+        """
+
+        if self.available() > 0:
+            return 0
+
+        return self.sent[0] + self.seconds - self.clock.monotonic()
+
+    def take(self):
+        """
+        This function records a message being sent. Call wait_time first to make sure one may be.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.sent.append(self.clock.monotonic())
+
+
+class Outbox:
+    """
+    This is a class for the outbound message queue, which a writer thread drains within Twitch's rate limit.
+    Messages are sent in priority order, so moderation actions go out ahead of ordinary chat,
+    and in the order they were queued within a priority.
+
+    Each message is written by whichever account has the most room left in its rate limit, so several accounts multiply the rate limit.
+    A channel sticks to the account it last used, and only moves to another once it has been quiet for HANDOFF_DELAY,
+    so a channel's messages reach Twitch in the order they were queued.
+
+    Attributes:
+        accounts (list): The connections messages can be written to. Each has a limiter (RateLimiter) and a write(data, trace) function.
+        affinity (dict): The account each channel last used.
+        last_sent (dict): The monotonic time each channel's last message was written.
+        heap (list): The queued (priority, sequence, channel, data, trace) tuples.
+        condition (Condition): Guards heap and accounts, and wakes the writer when a message is queued.
+        sequence (iterator): Keeps messages of the same priority in order.
+        stalls (Counter): The number of times the writer had to wait for the rate limit.
+        running (bool): Whether the writer thread is running.
+        clock (Clock): The source of time, which the writer also waits through.
+    """
+
+    def __init__(self, accounts, metrics, clock=None):
+        """
+        The constructor for the Outbox class.
+
+        Parameters:
+            accounts (list): The connections messages can be written to, each with a limiter and a write function.
+            metrics (Metrics): The metrics to report queue depth and rate limit stalls to.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.accounts = list(accounts)
+        self.affinity = {}
+        self.last_sent = {}
+        self.heap = []
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.stalls = metrics.counter('twitchirc_rate_limit_stalls_total', 'Times a send had to wait on the rate limit.')
+        metrics.gauge_callback('twitchirc_outbound_queue_depth', 'Messages waiting to be sent.', self.__len__)
+        self.running = False
+
+    def __len__(self):
+        return len(self.heap)
+
+    def put(self, data, priority=NORMAL, trace=None):
+        """
+        This function queues a message to be sent.
+
+        Parameters:
+            data (string): The line to send.
+            priority (int): MODERATION, NORMAL, or BULK.
+            trace (Trace): The trace of the message being handled, or None.
+
+        Returns:
+            None
+        """
+
+        # Only channel messages need to stay in order, so anything else counts as its own channel
+        channel = data.split(' ', 2)[1] if data.startswith('PRIVMSG ') else None
+
+        with self.condition:
+            heapq.heappush(self.heap, (priority, next(self.sequence), channel, data, trace))
+            self.condition.notify_all()
+
+    def add(self, account):
+        """
+        This function makes an account available to write messages with.
+
+        Parameters:
+            account (object): A connection with a limiter and a write function.
+
+        Returns:
+            None
+        """
+
+        with self.condition:
+            if account not in self.accounts:
+                self.accounts.append(account)
+            self.condition.notify_all()
+
+    def remove(self, account):
+        """
+        This function stops writing messages with an account, such as while it reconnects.
+
+        Parameters:
+            account (object): The connection to stop using.
+
+        Returns:
+            None
+        """
+
+        with self.condition:
+            if account in self.accounts:
+                self.accounts.remove(account)
+
+    def choose(self, channel):
+        """
+        This function picks the account to write a channel's next message with.
+
+        Parameters:
+            channel (string): The '#' prepended channel, or None.
+
+        Returns:
+            account (object): The channel's last account if it may send now, otherwise the account with the most room,
+                or None if the message has to wait.
+            wait (float): The seconds to wait before trying again, or None to wait for an account to be added.
+        """
+
+        preferred = self.affinity.get(channel)
+        if preferred in self.accounts and channel is not None:
+            wait = preferred.limiter.wait_time()
+            if not wait:
+                return preferred, 0
+
+            quiet = self.clock.monotonic() - self.last_sent[channel]
+            if quiet < HANDOFF_DELAY:
+                return None, min(wait, HANDOFF_DELAY - quiet)
+
+        best = max(self.accounts, key=lambda account: account.limiter.available(), default=None)
+        if best is None:
+            return None, None
+
+        wait = best.limiter.wait_time()
+        if wait:
+            return None, wait
+
+        return best, 0
+
+    def start(self):
+        """
+        This function starts the writer thread.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.running = True
+        threading.Thread(target=self.run, name='writer', daemon=True).start()
+
+    def flush(self, timeout=5):
+        """
+        This function waits for the queued messages to be written, such as before disconnecting.
+
+        Parameters:
+            timeout (float): The most seconds to wait.
+
+        Returns:
+            flushed (bool): True if every queued message was taken by the writer.
+        """
+
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.heap or not self.running, timeout)
+
+    def stop(self):
+        """
+        This function stops the writer thread once it wakes up.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def run(self):
+        """
+        This function is the writer thread. It waits for a message and an account within its rate limit, then writes the message.
+        The message is only taken off the queue once an account may send it, so one which is queued
+        with a higher priority while waiting still goes first.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        stalled = False
+        while True:
+            with self.condition:
+                while self.running and not self.heap:
+                    self.clock.wait(self.condition)
+
+                if not self.running:
+                    return
+
+                account, wait = self.choose(self.heap[0][2])
+                if account is None:
+                    # New messages wake the writer too, so only count the first wait for each send
+                    if not stalled:
+                        self.stalls.inc()
+                        stalled = True
+                    self.clock.wait(self.condition, wait)
+                    continue
+
+                stalled = False
+                account.limiter.take()
+                priority, sequence, channel, data, trace = heapq.heappop(self.heap)
+                self.affinity[channel] = account
+                self.last_sent[channel] = self.clock.monotonic()
+                self.condition.notify_all()
+
+            try:
+                account.write(data, trace)
+            except OSError:
+                # The account's reader notices the lost connection and reconnects; the message is lost with it
+                pass
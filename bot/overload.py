@@ -0,0 +1,109 @@
+from .clock import CLOCK
+import logging
+
+# Settings used for anything left out of config.OVERLOAD
+DEFAULTS = {
+    'lag': (5, 15),             # Seconds behind Twitch's tmi-sent-ts which start each stage of shedding
+    'depth': (2000, 8000),      # Messages waiting in the pipeline queues which start each stage of shedding
+    'recover': 0.5,             # Fraction of a stage's watermarks the lag and depth must both fall under to leave it
+    'hold': 10,                 # Seconds a stage is kept before it can be left
+}
+
+# The stages of shedding. Each sheds everything the ones before it do
+NORMAL = 0
+EXTRAS = 1                      # Auto replies, loyalty points for chatting, and the event stream
+COMMANDS = 2                    # Commands from users who aren't moderators
+
+STAGES = ('normal', 'extras', 'commands')
+
+
+class OverloadController:
+    """
+    This is a class for shedding work when chat arrives faster than the bot can handle it, such as during a raid.
+    Load is measured by how far behind Twitch the bot is - the time since the oldest message in each batch was sent,
+    from its tmi-sent-ts tag - and how many messages are waiting in the pipeline queues.
+    Passing either of a stage's watermarks moves straight to that stage. Stages are left one at a time,
+    once the stage has been held for a while and both measures are well under its watermarks, so shedding doesn't flap.
+    Moderation, moderator commands, and answering PINGs are never shed.
+
+    Attributes:
+        settings (dict): DEFAULTS, updated with the configured settings.
+        stage (int): The current stage of shedding - NORMAL, EXTRAS or COMMANDS.
+        changed (float): The monotonic time the stage last changed.
+        lag (float): The seconds behind Twitch the last batch was.
+        depth (int): The messages waiting when the last batch was taken.
+        clock (Clock): The source of time.
+    """
+
+    def __init__(self, settings=None, clock=None):
+        """
+        The constructor for the OverloadController class.
+
+        Parameters:
+            settings (dict): Settings to change from DEFAULTS - see config.OVERLOAD.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.settings = {**DEFAULTS, **(settings or {})}
+        self.stage = NORMAL
+        self.changed = self.clock.monotonic()
+        self.lag = 0.0
+        self.depth = 0
+
+    def observe(self, batch, depth):
+        """
+        This function measures the load from a batch of messages, and changes stage if needed.
+
+        Parameters:
+            batch (list): The parsed messages about to be dispatched, oldest first.
+            depth (int): The messages still waiting in the pipeline queues.
+
+        Returns:
+            stage (int): The stage to handle the batch in.
+        """
+
+        # An empty batch means the bot has caught up
+        self.lag = 0.0
+        now = self.clock.time()
+        for msg in batch:
+            sent = msg['tags'].get('tmi-sent-ts')
+            if sent and sent.isdigit():
+                # Only the oldest message matters, and a clock slightly behind Twitch's mustn't count as negative lag
+                self.lag = max(0.0, now - int(sent) / 1000)
+                break
+        self.depth = depth
+
+        s = self.settings
+        target = NORMAL
+        for stage in (EXTRAS, COMMANDS):
+            if self.lag >= s['lag'][stage - 1] or depth >= s['depth'][stage - 1]:
+                target = stage
+
+        if target > self.stage:
+            self.change(target)
+        elif target < self.stage and self.clock.monotonic() - self.changed >= s['hold']:
+            if self.lag < s['lag'][self.stage - 1] * s['recover'] and depth < s['depth'][self.stage - 1] * s['recover']:
+                self.change(self.stage - 1)
+
+        return self.stage
+
+    def change(self, stage):
+        """
+        This function moves to another stage, and logs why.
+
+        Parameters:
+            stage (int): The new stage.
+
+        Returns:
+            None
+        """
+
+        message = f'Overload stage {STAGES[self.stage]} -> {STAGES[stage]} ({self.lag:.1f}s behind, {self.depth} messages waiting)'
+        if stage > self.stage:
+            logging.warning(message)
+        else:
+            logging.info(message)
+
+        self.stage = stage
+        self.changed = self.clock.monotonic()
@@ -0,0 +1,296 @@
+from concurrent.futures import ProcessPoolExecutor
+from traceback import format_exception_only
+from collections import deque
+from .irc import parse_batch
+import multiprocessing
+import threading
+import logging
+import queue
+
+# What a bounded queue does when it is full
+POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+# Batches each parser worker process may have queued at once
+BATCHES_PER_PROCESS = 2
+
+
+class BoundedQueue:
+    """
+    This is a class for a bounded queue between two pipeline stages.
+    When the queue is full, it either blocks the producer (backpressure) or drops a message, depending on its policy.
+
+    Attributes:
+        name (string): The name of the queue, used in metrics and logs.
+        queue (Queue): The underlying queue.
+        policy (string): 'block' to wait for space, 'drop_newest' to discard the incoming message, or 'drop_oldest' to discard the oldest queued message.
+        dropped (Counter): The number of messages discarded because the queue was full.
+    """
+
+    def __init__(self, name, maxsize, policy, metrics):
+        """
+        The constructor for the BoundedQueue class.
+
+        Parameters:
+            name (string): The name of the queue, used in metrics and logs.
+            maxsize (int): The number of messages the queue can hold.
+            policy (string): 'block', 'drop_newest', or 'drop_oldest'.
+            metrics (Metrics): The metrics to report depth and drops to.
+        """
+
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown queue policy: {policy}')
+
+        self.name = name
+        self.queue = queue.Queue(maxsize)
+        self.policy = policy
+        self.dropped = metrics.counter('twitchbot_queue_dropped_total', 'Messages dropped because a pipeline queue was full.', ('queue',)).labels(name)
+        metrics.gauge_callback('twitchbot_queue_depth', 'Messages waiting in a pipeline queue.', self.queue.qsize, ('queue',), (name,))
+
+    def put(self, item):
+        """
+        This function adds a message to the queue, applying the queue's policy if it is full.
+
+        Parameters:
+            item (any): The message to add.
+
+        Returns:
+            None
+        """
+
+        if self.policy == 'block':
+            return self.queue.put(item)
+
+        while True:
+            try:
+                return self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped.inc()
+                if self.policy == 'drop_newest':
+                    return
+
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    def get_batch(self, limit, timeout=None):
+        """
+        This function waits for at least one message, then takes any others already waiting, up to a limit.
+
+        Parameters:
+            limit (int): The largest number of messages to return.
+            timeout (float): The number of seconds to wait for the first message, or None to wait forever.
+
+        Returns:
+            batch (list): The messages taken, which is empty if the timeout passed.
+        """
+
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        try:
+            while len(batch) < limit:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return batch
+
+
+class Pipeline:
+    """
+    This is a class for running the receive side of the bot as separate stages, each on its own thread.
+        Reader: receives data, splits it into lines, and answers PING messages.
+        Parser: parses lines into messages, optionally in a pool of worker processes.
+        Dispatch: the bot's own loop, which takes parsed messages with get_batch.
+    A slow command handler then no longer holds up reading from the socket.
+
+    Attributes:
+        irc (TwitchIrc): The IRC connection to read from.
+        lines (BoundedQueue): Lines waiting to be parsed.
+        messages (BoundedQueue): Parsed messages waiting to be dispatched.
+        processes (int): The number of parser worker processes, or 0 to parse on the parser thread.
+        batch_size (int): The most lines parsed or messages dispatched at once.
+        running (bool): Whether the stages should keep running.
+        failure (BaseException): An exception which stopped a stage, to be raised on the dispatch thread.
+        processed (Family): The number of messages each stage has passed on.
+    """
+
+    def __init__(self, irc, metrics, processes=0, maxsize=10000, policy='block', batch_size=256):
+        """
+        The constructor for the Pipeline class.
+
+        Parameters:
+            irc (TwitchIrc): The IRC connection to read from.
+            metrics (Metrics): The metrics to report queue depths and throughput to.
+            processes (int): The number of parser worker processes, or 0 to parse on the parser thread.
+            maxsize (int): The number of messages each queue can hold.
+            policy (string): What a full queue does - 'block', 'drop_newest', or 'drop_oldest'.
+            batch_size (int): The most lines parsed or messages dispatched at once.
+        """
+
+        self.irc = irc
+        self.lines = BoundedQueue('lines', maxsize, policy, metrics)
+        self.messages = BoundedQueue('messages', maxsize, policy, metrics)
+        self.processes = processes
+        self.batch_size = batch_size
+        self.running = False
+        self.failure = None
+        self.processed = metrics.counter('twitchbot_stage_processed_total', 'Messages passed on by each pipeline stage.', ('stage',))
+
+    def start(self):
+        """
+        This function starts the reader and parser stages.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.running = True
+        threading.Thread(target=self.guard, args=(self.read,), name='reader', daemon=True).start()
+        threading.Thread(target=self.guard, args=(self.parse,), name='parser', daemon=True).start()
+
+    def stop(self):
+        """
+        This function stops the stages. The reader stops once its current read returns.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.running = False
+
+    def guard(self, stage):
+        """
+        This function runs a stage, restarting it if it raises an exception, just as the bot's loop carries on after one.
+        Exits, such as failing to reconnect, are handed over to the dispatch thread instead.
+
+        Parameters:
+            stage (callable): The stage to run.
+
+        Returns:
+            None
+        """
+
+        while self.running:
+            try:
+                return stage()
+            except Exception as e:
+                logging.fatal(f'Exception Caught in {threading.current_thread().name}: {" ".join(format_exception_only(type(e), e))}')
+            except BaseException as e:
+                if self.running:
+                    self.failure = e
+                    self.running = False
+
+    def read(self):
+        """
+        This function is the reader stage.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        processed = self.processed.labels('reader')
+        while self.running:
+            try:
+                pending = self.irc.read_lines()
+            except OSError as e:
+                if not self.running:
+                    return
+
+                logging.error(f'Lost connection ({type(e).__name__}), reconnecting...')
+                self.irc.reconnects.inc()
+                self.irc.connect()
+                continue
+
+            for item in pending:
+                self.lines.put(item)
+                processed.inc()
+
+    def parse(self):
+        """
+        This function is the parser stage.
+        With worker processes, several batches are parsed at once, and their messages are passed on in the order the batches were read.
+        Workers are started from a fork server rather than forked from this process, as a fork taken while
+        the reader, writer and logging threads hold locks could leave those locks held forever in the worker.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        processed = self.processed.labels('parser')
+        pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('forkserver')) if self.processes else None
+        # The (batch, future) of each batch being parsed by a worker, oldest first
+        inflight = deque()
+        limit = self.processes * BATCHES_PER_PROCESS
+
+        try:
+            while self.running:
+                # With batches in flight, only wait briefly for more lines, so finished batches aren't held back
+                batch = self.lines.get_batch(self.batch_size, timeout=0.01 if inflight else 1)
+
+                parsed = []
+                if batch and pool:
+                    inflight.append((batch, pool.submit(parse_batch, [line for line, trace, read_time in batch])))
+                elif batch:
+                    parsed.append(self.irc.parse_lines(batch))
+
+                while inflight and (len(inflight) >= limit or not batch or inflight[0][1].done()):
+                    done, future = inflight.popleft()
+                    parsed.append(self.irc.parse_lines(done, future.result()))
+
+                for messages in parsed:
+                    for message in messages:
+                        self.messages.put(message)
+                        processed.inc()
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    def depth(self):
+        """
+        This function counts the lines and messages waiting between the stages.
+
+        Parameters:
+            None
+
+        Returns:
+            depth (int): The number of lines waiting to be parsed, plus messages waiting to be dispatched.
+        """
+
+        return self.lines.queue.qsize() + self.messages.queue.qsize()
+
+    def get_batch(self, timeout=1):
+        """
+        This function takes parsed messages for the dispatch stage.
+        If another stage has stopped with an exception, it is raised here instead.
+
+        Parameters:
+            timeout (float): The number of seconds to wait for a message.
+
+        Returns:
+            batch (list): The messages taken, which is empty if the timeout passed.
+        """
+
+        if self.failure:
+            failure, self.failure = self.failure, None
+            raise failure
+
+        batch = self.messages.get_batch(self.batch_size, timeout)
+        self.processed.labels('dispatch').inc(len(batch))
+
+        return batch
@@ -0,0 +1,108 @@
+"""
+Plugins add commands to the bot without touching the TwitchBot class. A plugin is a module in this package, such as:
+
+    from bot.plugins import command, event
+
+    @command('roll', aliases=('dice',), permission=None, cooldown=5)
+    def roll(bot, user, badges, args):
+        bot.irc.send_channel(f'{user} rolled a {randint(1, 6)}')
+
+    @event('CLEARCHAT')
+    def cleared(bot, event):
+        ...
+
+Decorator arguments must be literals, as they are read from the source when the bot starts, without importing the module.
+The module is only imported the first time one of its commands is used, or one of its events arrives,
+so its own imports and set up cost nothing until then. A module may also define close(bot), which is called when the bot disconnects.
+"""
+
+import logging
+
+
+class Command:
+    """
+    This is a class for a plugin command, which checks its permission and cooldown before running.
+
+    Attributes:
+        __name__ (string): The command's name, which its metrics are labelled with.
+        function (callable): Runs the command, given the bot, user, badges and args.
+        aliases (tuple): The names the command can be used by, including its own name.
+        permission (string): The badge needed to use the command - see TwitchBot.permission_values - or None for anyone.
+        cooldown (float): The seconds between uses of the command in a channel. Moderators ignore it.
+        ready (dict): The monotonic time each channel's cooldown ends, from the bot's clock.
+        bot (TwitchBot): The bot the command runs in, set once its module is loaded.
+    """
+
+    def __init__(self, function, name, aliases, permission, cooldown):
+        """
+        The constructor for the Command class.
+
+        Parameters:
+            function (callable): Runs the command, given the bot, user, badges and args.
+            name (string): The command's name.
+            aliases (iterable): Other names the command can be used by.
+            permission (string): The badge needed to use the command, or None for anyone.
+            cooldown (float): The seconds between uses of the command in a channel.
+        """
+
+        self.__name__ = name
+        self.function = function
+        self.aliases = (name, *aliases)
+        self.permission = permission
+        self.cooldown = cooldown
+        self.ready = {}
+        self.bot = None
+
+    def __call__(self, user, badges, args):
+        bot = self.bot
+
+        if self.permission and not bot.has_permission(user, badges, self.permission):
+            return bot.permission_error(user, self.__name__.upper(), self.permission.upper())
+
+        if self.cooldown and not bot.has_permission(user, badges):
+            now = bot.clock.monotonic()
+            if now < self.ready.get(bot.irc.channel, 0):
+                return logging.debug(f'Ignored command {self.__name__} from {user} during its cooldown.')
+            self.ready[bot.irc.channel] = now + self.cooldown
+
+        return self.function(bot, user, badges, args)
+
+
+def command(name, aliases=(), permission=None, cooldown=0):
+    """
+    This function makes a decorator which registers a plugin function as a command.
+
+    Parameters:
+        name (string): The command's name.
+        aliases (iterable): Other names the command can be used by.
+        permission (string): The badge needed to use the command, such as 'moderator', or None for anyone.
+        cooldown (float): The seconds between uses of the command in a channel, or 0 for none. Moderators ignore it.
+
+    Returns:
+        decorator (callable): Marks the function as a command, and returns it unchanged.
+    """
+
+    def decorator(function):
+        function.command = Command(function, name, aliases, permission, cooldown)
+        return function
+
+    return decorator
+
+
+def event(*commands):
+    """
+    This function makes a decorator which subscribes a plugin function to Twitch events other than chat messages.
+
+    Parameters:
+        commands (strings): The events to receive, such as 'CLEARCHAT', 'CLEARMSG' or 'MEMBERSHIP' - see TwitchIrc.parse_event.
+
+    Returns:
+        decorator (callable): Marks the function as an event handler, and returns it unchanged.
+            The function is called with the bot and the parsed event.
+    """
+
+    def decorator(function):
+        function.events = commands
+        return function
+
+    return decorator
@@ -0,0 +1,277 @@
+from collections import deque
+from . import command, event
+import logging
+import re
+
+FEED_INTERVAL = 1       # Seconds between topping up the outbound queue with a job's actions
+PROGRESS_INTERVAL = 5   # Seconds between progress reports
+GIVE_UP = 30            # Seconds without a confirmation, once every action is sent, before a job is finished anyway
+MATCH_WINDOW = 300      # Seconds of recent chat a pattern is matched against
+REASON = 'Mass moderation'
+
+USERNAME_PATTERN = re.compile(r'^\w+$')
+
+# Users with any of these badges are never removed, even if a pattern matches them
+PROTECTED_BADGES = ('broadcaster', 'moderator', 'vip', 'staff', 'admin', 'global_mod')
+
+# The running jobs, oldest first
+jobs = []
+
+
+class MassAction:
+    """
+    This is a class for timing out or banning many users at once, such as the accounts in a bot raid.
+    Actions are queued at moderation priority a second's worth at a time, so they are written back to back without waiting on Twitch,
+    while other moderation and the progress reports never wait behind hundreds of them.
+    Each action is confirmed by the CLEARCHAT event Twitch sends for it, and the job finishes once every action is confirmed,
+    or when confirmations stop arriving.
+
+    Attributes:
+        bot (TwitchBot): The bot the job runs in.
+        moderator (string): The user who started the job, who progress is reported to.
+        channel (string): The '#' prepended channel the users are removed from.
+        seconds (int): The length of each timeout, or None to ban.
+        total (int): The number of users in the job.
+        waiting (deque): The users not yet queued.
+        pending (set): The users queued, but not yet confirmed.
+        confirmed (int): The number of users confirmed.
+        started (float): The monotonic time the job started.
+        active (float): The monotonic time an action was last queued or confirmed.
+        reported (float): The monotonic time progress was last reported.
+        timer (Timer): Runs feed every FEED_INTERVAL.
+    """
+
+    def __init__(self, bot, moderator, channel, seconds, users):
+        """
+        The constructor for the MassAction class. The job starts straight away.
+
+        Parameters:
+            bot (TwitchBot): The bot the job runs in.
+            moderator (string): The user who started the job.
+            channel (string): The '#' prepended channel.
+            seconds (int): The length of each timeout, or None to ban.
+            users (list): The lowercase usernames to remove.
+        """
+
+        self.bot = bot
+        self.moderator = moderator
+        self.channel = channel
+        self.seconds = seconds
+        self.total = len(users)
+        self.waiting = deque(users)
+        self.pending = set()
+        self.confirmed = 0
+        self.started = self.active = self.reported = bot.clock.monotonic()
+
+        jobs.append(self)
+        self.feed()
+        self.timer = bot.clock.call_every(FEED_INTERVAL, self.feed)
+
+    @property
+    def action(self):
+        return 'ban' if self.seconds is None else 'timeout'
+
+    def feed(self):
+        """
+        This function queues as many actions as every sending account can write before it is next called,
+        less whatever is already waiting in the outbound queue, then reports progress or finishes the job if it is time to.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        irc = self.bot.irc
+        now = self.bot.clock.monotonic()
+
+        room = max(1, int(irc.limiter.rate * len(irc.outbox.accounts) * FEED_INTERVAL)) - len(irc.outbox)
+        while self.waiting and room > 0:
+            user = self.waiting.popleft()
+            self.pending.add(user)
+            if self.seconds is None:
+                irc.ban(user, REASON, self.channel)
+            else:
+                irc.timeout(user, self.seconds, REASON, self.channel)
+
+            self.active = now
+            room -= 1
+
+        if not self.waiting and (not self.pending or now - self.active >= GIVE_UP):
+            self.finish()
+        elif now - self.reported >= PROGRESS_INTERVAL:
+            self.reported = now
+            self.bot.irc.send_private(self.moderator, f'Mass {self.action} in {self.channel}: {self.total - len(self.waiting)}/{self.total} sent, {self.confirmed} confirmed.')
+
+    def confirm(self, event):
+        """
+        This function confirms the action on a user from the CLEARCHAT event Twitch sent for it.
+
+        Parameters:
+            event (dict): The parsed CLEARCHAT event.
+
+        Returns:
+            None
+        """
+
+        if event['channel'] != self.channel or event['target'] not in self.pending:
+            return
+
+        self.pending.discard(event['target'])
+        self.confirmed += 1
+        self.active = self.bot.clock.monotonic()
+
+        if not self.waiting and not self.pending:
+            self.finish()
+
+    def finish(self):
+        """
+        This function stops the job, and reports how it went. Users not yet queued are never sent.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.timer.cancel()
+        if self in jobs:
+            jobs.remove(self)
+
+        seconds = self.bot.clock.monotonic() - self.started
+        message = f'Mass {self.action} in {self.channel} finished in {seconds:.1f}s: {self.confirmed}/{self.total} confirmed.'
+        if self.waiting:
+            message += f' {len(self.waiting)} were not sent.'
+        if self.pending:
+            message += f' Unconfirmed: {", ".join(sorted(self.pending))}'
+            if len(message) > 400:
+                message = message[:397] + '...'
+
+        logging.info(f'{message} (started by {self.moderator})')
+        self.bot.irc.send_private(self.moderator, message)
+
+
+def read_targets(bot, user, channel, args):
+    """
+    This function reads the users a job should remove, either listed or found by a pattern matched against recent chat.
+    The bot, the moderator, the broadcaster and the bot's admins are never included,
+    nor is anyone whose last remembered message carried a moderator, VIP, broadcaster or Twitch staff badge.
+
+    Parameters:
+        bot (TwitchBot): The bot the command was used in.
+        user (string): The moderator who used the command.
+        channel (string): The '#' prepended channel.
+        args (list): Usernames, or 'match' followed by a regular expression.
+
+    Returns:
+        users (list): The lowercase usernames, without duplicates, or None if the pattern is invalid.
+        skipped (int): The number of users left out for their badges.
+    """
+
+    if args[0].lower() == 'match':
+        try:
+            pattern = re.compile(' '.join(args[1:]), re.IGNORECASE)
+        except re.error as e:
+            bot.irc.send_private(user, f'Error - Invalid pattern: {e}')
+            return None, 0
+
+        since = int((bot.clock.time() - MATCH_WINDOW) * 1000)
+        users = bot.chat_history.search(channel, pattern, since)
+    else:
+        users = [name.lstrip('@').lower() for name in args]
+        users = [name for name in users if USERNAME_PATTERN.match(name)]
+
+    protected = {bot.irc.user, user, channel[1:], *bot.admins}
+    users = [name for name in dict.fromkeys(users) if name not in protected]
+
+    targets = []
+    for name in users:
+        badges = bot.chat_history.badges(channel, name)
+        if not badges or not any(badge in badges for badge in PROTECTED_BADGES):
+            targets.append(name)
+
+    return targets, len(users) - len(targets)
+
+
+@command('mass', permission='moderator')
+def mass(bot, user, badges, args):
+    """
+    This function times out or bans many users at once, reporting its progress privately.
+        timeout {SECONDS} {USERS}: Times out each of the listed users.
+        timeout {SECONDS} match {PATTERN}: Times out everyone whose chat in the last few minutes matches a regular expression.
+        ban {USERS}: Bans each of the listed users.
+        ban match {PATTERN}: Bans everyone whose chat in the last few minutes matches a regular expression.
+        status: Reports the progress of the running jobs.
+        stop: Stops the running jobs in the channel.
+
+    Parameters:
+        bot (TwitchBot): The bot the command was used in.
+        user (string): The user who called the command.
+        badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+        args (list): A list of strings sent by the user along with their command.
+
+    Returns:
+        None
+    """
+
+    channel = bot.irc.channel
+    function = args.pop(0).lower() if args else ''
+
+    if function == 'status':
+        running = [job for job in jobs if job.channel == channel]
+        if not running:
+            return bot.irc.send_private(user, f'There are no mass timeouts or bans running in {channel}.')
+
+        bot.irc.send_private(user, ' | '.join(f'{job.action} by {job.moderator}: {job.total - len(job.waiting)}/{job.total} sent, {job.confirmed} confirmed' for job in running))
+    elif function == 'stop':
+        running = [job for job in jobs if job.channel == channel]
+        if not running:
+            return bot.irc.send_private(user, f'There are no mass timeouts or bans running in {channel}.')
+
+        logging.info(f'Received command MASS STOP from {user}')
+        for job in running:
+            job.waiting.clear()
+            job.finish()
+    elif function in ('timeout', 'ban'):
+        seconds = None
+        if function == 'timeout':
+            if not args or not args[0].isdigit():
+                return bot.arg_missing_error(user, 'MASS TIMEOUT', '{SECONDS} [{USERS} | match {PATTERN}]')
+            seconds = int(args.pop(0))
+
+        if not args or (args[0].lower() == 'match' and len(args) < 2):
+            return bot.arg_missing_error(user, f'MASS {function.upper()}', '{USERS} | match {PATTERN}')
+
+        users, skipped = read_targets(bot, user, channel, args)
+        if users is None:
+            return
+
+        note = f' {skipped} moderators, VIPs or staff were skipped.' if skipped else ''
+        if not users:
+            return bot.irc.send_private(user, f'Error - No users to remove were found.{note}')
+
+        logging.info(f'Received command MASS {function.upper()} from {user}: {len(users)} users in {channel}, {skipped} skipped')
+        bot.irc.send_private(user, f'Mass {function} of {len(users)} users in {channel} started.{note}')
+        MassAction(bot, user, channel, seconds, users)
+    else:
+        bot.irc.send_private(user, f'Error - unknown argument {function}. Try [timeout | ban | status | stop] instead.')
+
+
+@event('CLEARCHAT')
+def confirm(bot, event):
+    """
+    This function confirms running jobs' actions from Twitch's CLEARCHAT events.
+
+    Parameters:
+        bot (TwitchBot): The bot the event arrived in.
+        event (dict): The parsed CLEARCHAT event.
+
+    Returns:
+        None
+    """
+
+    if event['target']:
+        for job in list(jobs):
+            job.confirm(event)
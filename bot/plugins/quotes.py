@@ -0,0 +1,92 @@
+from ..quotes import Quotes
+from ..bot import DATA_DIR
+from . import command
+import logging
+import os
+
+store = Quotes(os.path.join(DATA_DIR, 'quotes.db'))
+
+
+@command('quote', aliases=('quotes',))
+def quote(bot, user, badges, args):
+    """
+    This function handles all functions related to quotes, which are kept separately for each channel.
+        (none): Displays a random quote.
+        {NUMBER}: Displays a quote by its number.
+        search {WORDS}: Displays the quotes which best match the words.
+        add {QUOTE}: Adds a quote. Requires moderator permissions.
+        delete {NUMBER}: Deletes a quote. Requires moderator permissions.
+
+    Parameters:
+        bot (TwitchBot): The bot the command was used in.
+        user (string): The user who called the command.
+        badges (dict): A dictionary of badges and their corresponding level (or 1 if it has no levels).
+        args (list): A list of strings sent by the user along with their command.
+
+    Returns:
+        None
+    """
+
+    channel = bot.irc.channel
+    function = args.pop(0).lower() if args else 'random'
+
+    if function == 'random':
+        quote = store.random(channel)
+        if not quote:
+            return bot.irc.send_private(user, 'Error - There are no quotes yet!')
+
+        bot.irc.send_channel(f'#{quote[0]}: {quote[1]}')
+    elif function.isdigit():
+        quote = store.get(channel, int(function))
+        if not quote:
+            return bot.irc.send_private(user, f'Error - There is no quote #{function}!')
+
+        bot.irc.send_channel(f'#{quote[0]}: {quote[1]}')
+    elif function == 'search':
+        if not args:
+            return bot.arg_missing_error(user, 'QUOTE SEARCH', '{WORDS}')
+
+        matches, results = store.search(channel, ' '.join(args))
+        if not results:
+            return bot.irc.send_private(user, 'Error - No quotes match your search.')
+
+        bot.irc.send_channel(f'{matches} quotes found. ' + ' | '.join(f'#{id}: {text}' for id, text in results)[:400])
+    elif function == 'add':
+        if not bot.has_permission(user, badges):
+            return bot.permission_error(user, 'QUOTE ADD')
+
+        if not args:
+            return bot.arg_missing_error(user, 'QUOTE ADD', '{QUOTE}')
+
+        id = store.add(channel, ' '.join(args), user)
+        logging.info(f'Received command QUOTE ADD from {user}: #{id}')
+
+        bot.irc.send_channel(f'Added quote #{id}.')
+    elif function == 'delete':
+        if not bot.has_permission(user, badges):
+            return bot.permission_error(user, 'QUOTE DELETE')
+
+        if not args or not args[0].isdigit():
+            return bot.arg_missing_error(user, 'QUOTE DELETE', '{NUMBER}')
+
+        if not store.delete(channel, int(args[0])):
+            return bot.irc.send_private(user, f'Error - There is no quote #{args[0]}!')
+
+        logging.info(f'Received command QUOTE DELETE from {user}: #{args[0]}')
+        bot.irc.send_private(user, f'Deleted quote #{args[0]}.')
+    else:
+        bot.irc.send_private(user, f'Error - unknown argument {function}. Try [{{NUMBER}} | search | add | delete] instead.')
+
+
+def close(bot):
+    """
+    This function closes the quote database, if it was opened.
+
+    Parameters:
+        bot (TwitchBot): The bot which is disconnecting.
+
+    Returns:
+        None
+    """
+
+    store.close()
@@ -0,0 +1,155 @@
+from collections import deque
+from .clock import CLOCK
+import bisect
+import sys
+
+
+class Presence:
+    """
+    This is a class for tracking which users are in each channel, from JOIN, PART and NAMES events.
+    Names are interned, so the live sets and every snapshot share one copy of each name.
+    Snapshots are frozensets, which the bot takes on a timer, and one is only copied if the channel changed since the last.
+
+    Attributes:
+        channels (dict): The set of users present in each channel.
+        changed (set): Channels which changed since the last snapshot.
+        snapshots (dict): For each channel, a deque of (time, frozenset) snapshots, oldest first.
+        keep (int): The number of snapshots kept per channel.
+        clock (Clock): The source of time, for the snapshots' timestamps.
+    """
+
+    def __init__(self, keep=12, clock=None):
+        """
+        The constructor for the Presence class.
+
+        Parameters:
+            keep (int): The number of snapshots kept per channel.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.keep = keep
+        self.channels = {}
+        self.changed = set()
+        self.snapshots = {}
+
+    def apply(self, event):
+        """
+        This function applies a MEMBERSHIP event, from TwitchIrc.merge_membership.
+
+        Parameters:
+            event (dict): The MEMBERSHIP event.
+
+        Returns:
+            None
+        """
+
+        channel = event['channel']
+        present = self.channels.get(channel)
+        if present is None or event['reset']:
+            present = self.channels[channel] = set()
+
+        present.difference_update(event['parted'])
+        present.update(map(sys.intern, event['joined']))
+        self.changed.add(channel)
+
+    def count(self, channel):
+        """
+        This function counts the users present in a channel.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+
+        Returns:
+            count (int): The number of users present.
+        """
+
+        return len(self.channels.get(channel, ()))
+
+    def is_present(self, channel, user):
+        """
+        This function determines whether a user is present in a channel.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            present (bool): True if the user is present.
+        """
+
+        return user in self.channels.get(channel, ())
+
+    def snapshot(self):
+        """
+        This function records who is present in every channel.
+        A channel which hasn't changed reuses its last snapshot's set instead of copying it again.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        now = self.clock.time()
+        for channel, present in self.channels.items():
+            history = self.snapshots.get(channel)
+            if history is None:
+                history = self.snapshots[channel] = deque(maxlen=self.keep)
+
+            if channel in self.changed or not history:
+                history.append((now, frozenset(present)))
+            else:
+                history.append((now, history[-1][1]))
+
+        self.changed.clear()
+
+    def present_at(self, channel, when):
+        """
+        This function returns who was present in a channel at a point in time, from the latest snapshot taken by then.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            when (float): The time, in seconds since the epoch.
+
+        Returns:
+            present (frozenset): The users present, or None if there is no snapshot from that far back.
+        """
+
+        history = self.snapshots.get(channel, ())
+        index = bisect.bisect_right([taken for taken, present in history], when)
+
+        return history[index - 1][1] if index else None
+
+    def last_seen(self, channel, user):
+        """
+        This function finds the most recent snapshot a user appears in.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+            user (string): The lowercase username.
+
+        Returns:
+            taken (float): The time of the snapshot, or None if the user isn't in any.
+        """
+
+        for taken, present in reversed(self.snapshots.get(channel, ())):
+            if user in present:
+                return taken
+
+        return None
+
+    def oldest(self, channel):
+        """
+        This function returns the oldest snapshot kept for a channel.
+
+        Parameters:
+            channel (string): The '#' prepended channel.
+
+        Returns:
+            snapshot (tuple): The (time, frozenset) snapshot, or None if none have been taken.
+        """
+
+        history = self.snapshots.get(channel)
+        return history[0] if history else None
@@ -0,0 +1,302 @@
+from collections import Counter
+from time import perf_counter, time
+import threading
+import tracemalloc
+import logging
+import sys
+import os
+
+# The kinds of profile which can be taken
+KINDS = ('cpu', 'sample', 'memory')
+
+# Results are written next to the package rather than the working directory, like the bot's data files
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles')
+
+
+def describe(filename, line, function):
+    """
+    This function formats a code location compactly for chat.
+
+    Parameters:
+        filename (string): The source file of the code.
+        line (int): The line number of the code.
+        function (string): The name of the function.
+
+    Returns:
+        description (string): The location in the form function (file:line).
+    """
+
+    return f'{function} ({os.path.basename(filename)}:{line})'
+
+
+class Sampler:
+    """
+    This is a class for a statistical profiler which periodically samples another thread's stack.
+    It runs on its own thread, so the profiled thread pays nothing beyond the GIL switches.
+
+    Attributes:
+        ident (int): The identifier of the thread to sample.
+        interval (float): The time between samples, in seconds.
+        stacks (Counter): The number of times each stack was seen, keyed by a tuple of frame descriptions (outermost first).
+        stopped (Event): Set to stop sampling.
+        thread (Thread): The sampling thread.
+    """
+
+    def __init__(self, ident, interval=0.005):
+        """
+        The constructor for the Sampler class.
+
+        Parameters:
+            ident (int): The identifier of the thread to sample.
+            interval (float): The time between samples, in seconds.
+        """
+
+        self.ident = ident
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='sampler', daemon=True)
+
+    def run(self):
+        """
+        This function takes samples until stopped.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.ident)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(describe(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        """
+        This function stops sampling and waits for the sampling thread to finish.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        self.stopped.set()
+        self.thread.join()
+
+
+class Profiler:
+    """
+    This is a class for profiling the running bot on demand.
+    Only one profile runs at a time, and nothing is hooked into the interpreter while inactive.
+
+    Attributes:
+        directory (string): The directory results are written to.
+        active (string): The kind of profile currently running, or None.
+        deadline (float): The perf_counter time at which the running profile should stop.
+        requester (string): The user who started the running profile, or None if it was started by a signal.
+        profile (Profile): The running cProfile profiler, for cpu profiles.
+        sampler (Sampler): The running sampler, for sample profiles.
+    """
+
+    def __init__(self, directory=PROFILE_DIR):
+        """
+        The constructor for the Profiler class.
+
+        Parameters:
+            directory (string): The directory results are written to.
+        """
+
+        self.directory = directory
+        self.active = None
+        self.deadline = 0
+        self.requester = None
+        self.profile = None
+        self.sampler = None
+
+    def start(self, kind, seconds, requester=None):
+        """
+        This function starts a profile.
+        It must be called from the thread to be profiled, which is the thread running the bot.
+
+        Parameters:
+            kind (string): One of 'cpu' (cProfile), 'sample' (statistical sampling), or 'memory' (tracemalloc).
+            seconds (float): How long to profile for.
+            requester (string): The user who asked for the profile, or None.
+
+        Returns:
+            started (bool): False if a profile was already running, true otherwise.
+        """
+
+        if self.active:
+            return False
+
+        if kind == 'cpu':
+            # cProfile and pstats are slow to import, and most runs never profile
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif kind == 'sample':
+            self.sampler = Sampler(threading.get_ident())
+            self.sampler.thread.start()
+        elif kind == 'memory':
+            tracemalloc.start(10)
+        else:
+            raise ValueError(f'Unknown profile kind: {kind}')
+
+        self.active = kind
+        self.deadline = perf_counter() + seconds
+        self.requester = requester
+
+        logging.info(f'Started {kind} profile for {seconds} seconds.')
+
+        return True
+
+    def due(self):
+        """
+        This function determines whether the running profile has reached its deadline.
+
+        Parameters:
+            None
+
+        Returns:
+            due (bool): True if a profile is running and its time is up.
+        """
+
+        return self.active is not None and perf_counter() >= self.deadline
+
+    def stop(self, top=5):
+        """
+        This function stops the running profile and writes its results to disk.
+
+        Parameters:
+            top (int): The number of top offenders to include in the summary.
+
+        Returns:
+            path (string): The path of the written results.
+            summary (string): A one-line summary of the top offenders, short enough to whisper.
+        """
+
+        kind = self.active
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f'{kind}-{int(time())}')
+
+        if kind == 'cpu':
+            path, offenders = self.stop_cpu(base, top)
+        elif kind == 'sample':
+            path, offenders = self.stop_sample(base, top)
+        else:
+            path, offenders = self.stop_memory(base, top)
+
+        self.active = None
+        self.requester = None
+
+        summary = f'{kind} profile top {len(offenders)}: ' + ' | '.join(offenders)
+        logging.info(f'Finished {kind} profile, written to {path}. {summary}')
+
+        return path, summary
+
+    def stop_cpu(self, base, top):
+        """
+        This function stops a cProfile profile.
+        The raw stats are written for use with pstats or snakeviz, along with a text report.
+
+        Parameters:
+            base (string): The path to write results to, without an extension.
+            top (int): The number of top offenders to return.
+
+        Returns:
+            path (string): The path of the raw stats.
+            offenders (list): The functions with the most time spent in themselves.
+        """
+
+        import pstats
+
+        self.profile.disable()
+        path = base + '.prof'
+        self.profile.dump_stats(path)
+
+        with open(base + '.txt', 'w') as f:
+            stats = pstats.Stats(self.profile, stream=f)
+            stats.sort_stats('tottime').print_stats(50)
+
+        ranked = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        offenders = [f'{describe(*location)} {timing[2] * 1000:.1f}ms' for location, timing in ranked]
+
+        self.profile = None
+
+        return path, offenders
+
+    def stop_sample(self, base, top):
+        """
+        This function stops a sampling profile.
+        Stacks are written in the collapsed format used by flamegraph tools.
+
+        Parameters:
+            base (string): The path to write results to, without an extension.
+            top (int): The number of top offenders to return.
+
+        Returns:
+            path (string): The path of the collapsed stacks.
+            offenders (list): The functions most often seen at the top of the stack.
+        """
+
+        self.sampler.stop()
+        stacks = self.sampler.stacks
+        path = base + '.collapsed'
+
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(';'.join(stack) + f' {count}\n')
+
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack[-1]] += count
+
+        total = sum(leaves.values()) or 1
+        offenders = [f'{leaf} {count * 100 / total:.0f}%' for leaf, count in leaves.most_common(top)]
+
+        self.sampler = None
+
+        return path, offenders
+
+    def stop_memory(self, base, top):
+        """
+        This function stops a tracemalloc profile, keeping a snapshot of memory allocated while it ran.
+
+        Parameters:
+            base (string): The path to write results to, without an extension.
+            top (int): The number of top offenders to return.
+
+        Returns:
+            path (string): The path of the snapshot, which can be loaded with tracemalloc.Snapshot.load.
+            offenders (list): The source lines holding the most allocated memory.
+        """
+
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        path = base + '.snapshot'
+        snapshot.dump(path)
+
+        statistics = snapshot.statistics('lineno')
+        with open(base + '.txt', 'w') as f:
+            for stat in statistics[:50]:
+                f.write(f'{stat}\n')
+
+        offenders = []
+        for stat in statistics[:top]:
+            frame = stat.traceback[0]
+            offenders.append(f'{os.path.basename(frame.filename)}:{frame.lineno} {stat.size / 1024:.1f}KiB')
+
+        return path, offenders
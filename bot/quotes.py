@@ -0,0 +1,220 @@
+from collections import Counter
+from random import randint
+from time import time
+import heapq
+import math
+import re
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    text TEXT NOT NULL,
+    user TEXT NOT NULL,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_channel ON quotes (channel, id);
+CREATE TABLE IF NOT EXISTS postings (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    quote INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (channel, term, quote)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    quotes INTEGER NOT NULL,
+    PRIMARY KEY (channel, term)
+) WITHOUT ROWID;
+'''
+
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    This function splits text into search terms, ignoring case and punctuation.
+
+    Parameters:
+        text (string): The text to split.
+
+    Returns:
+        terms (Counter): The number of times each term appears.
+    """
+
+    return Counter(TERM_PATTERN.findall(text.casefold()))
+
+
+class Quotes:
+    """
+    This is a class for a database of quotes, with full-text search.
+    Quotes are indexed as they are added, in an inverted index of posting lists - for each term, the quotes it appears in and how often.
+    The index is stored alongside the quotes in SQLite, so it is never rebuilt, and a search only reads the posting lists of its own terms.
+    Results are ranked by tf-idf, so rarer words and quotes matching more of the search come first.
+    The database is only opened when a quote command is first used, to keep startup quick.
+
+    Attributes:
+        path (string): The database file.
+        connection (Connection): The database connection, or None until it is first needed.
+    """
+
+    def __init__(self, path):
+        """
+        The constructor for the Quotes class.
+
+        Parameters:
+            path (string): The database file, which is created if it doesn't exist.
+        """
+
+        self.path = path
+        self.connection = None
+
+    def connect(self):
+        """
+        This function opens the database, creating its tables if needed.
+
+        Parameters:
+            None
+
+        Returns:
+            connection (Connection): The database connection.
+        """
+
+        if self.connection is None:
+            import sqlite3
+
+            # The connection is opened on the dispatch thread, but closed from whichever thread shuts the bot down
+            self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+
+        return self.connection
+
+    def add(self, channel, text, user):
+        """
+        This function adds a quote, and indexes its terms in the same transaction.
+
+        Parameters:
+            channel (string): The '#' prepended channel the quote belongs to.
+            text (string): The quote.
+            user (string): The user who added it.
+
+        Returns:
+            id (int): The quote's number.
+        """
+
+        connection = self.connect()
+        terms = tokenize(text)
+
+        with connection:
+            id = connection.execute('INSERT INTO quotes (channel, text, user, added) VALUES (?, ?, ?, ?)', (channel, text, user, time())).lastrowid
+            connection.executemany('INSERT INTO postings (channel, term, quote, count) VALUES (?, ?, ?, ?)', [(channel, term, id, count) for term, count in terms.items()])
+            connection.executemany('INSERT INTO terms (channel, term, quotes) VALUES (?, ?, 1) ON CONFLICT (channel, term) DO UPDATE SET quotes = quotes + 1', [(channel, term) for term in terms])
+
+        return id
+
+    def delete(self, channel, id):
+        """
+        This function deletes a quote, and removes it from the index.
+
+        Parameters:
+            channel (string): The '#' prepended channel the quote belongs to.
+            id (int): The quote's number.
+
+        Returns:
+            deleted (bool): True if the quote existed.
+        """
+
+        quote = self.get(channel, id)
+        if quote is None:
+            return False
+
+        terms = list(tokenize(quote[1]))
+        with self.connection:
+            self.connection.execute('DELETE FROM quotes WHERE id = ?', (id,))
+            self.connection.executemany('DELETE FROM postings WHERE channel = ? AND term = ? AND quote = ?', [(channel, term, id) for term in terms])
+            self.connection.executemany('UPDATE terms SET quotes = quotes - 1 WHERE channel = ? AND term = ?', [(channel, term) for term in terms])
+
+        return True
+
+    def get(self, channel, id):
+        """
+        This function looks up a quote by its number.
+
+        Parameters:
+            channel (string): The '#' prepended channel the quote belongs to.
+            id (int): The quote's number.
+
+        Returns:
+            quote (tuple): The quote's (id, text), or None if there is no such quote in the channel.
+        """
+
+        return self.connect().execute('SELECT id, text FROM quotes WHERE id = ? AND channel = ?', (id, channel)).fetchone()
+
+    def random(self, channel):
+        """
+        This function picks a random quote, by jumping to a random number rather than scanning the table.
+        Numbers after a deleted quote are slightly more likely to be picked.
+
+        Parameters:
+            channel (string): The '#' prepended channel the quote belongs to.
+
+        Returns:
+            quote (tuple): The quote's (id, text), or None if the channel has no quotes.
+        """
+
+        connection = self.connect()
+        low, high = connection.execute('SELECT MIN(id), MAX(id) FROM quotes WHERE channel = ?', (channel,)).fetchone()
+        if low is None:
+            return None
+
+        return connection.execute('SELECT id, text FROM quotes WHERE channel = ? AND id >= ? ORDER BY id LIMIT 1', (channel, randint(low, high))).fetchone()
+
+    def search(self, channel, query, limit=3):
+        """
+        This function finds the quotes which best match a search.
+        Each matching term adds (1 + log(count in quote)) * log(1 + quotes / quotes containing the term) to a quote's score.
+
+        Parameters:
+            channel (string): The '#' prepended channel the quotes belong to.
+            query (string): The words to search for.
+            limit (int): The most quotes to return.
+
+        Returns:
+            matches (int): The number of quotes matching at least one term.
+            results (list): The (id, text) of the best matches, best first.
+        """
+
+        connection = self.connect()
+        total = connection.execute('SELECT COUNT(*) FROM quotes WHERE channel = ?', (channel,)).fetchone()[0]
+
+        scores = {}
+        for term in tokenize(query):
+            row = connection.execute('SELECT quotes FROM terms WHERE channel = ? AND term = ?', (channel, term)).fetchone()
+            if not row or not row[0]:
+                continue
+
+            idf = math.log(1 + total / row[0])
+            for quote, count in connection.execute('SELECT quote, count FROM postings WHERE channel = ? AND term = ?', (channel, term)):
+                scores[quote] = scores.get(quote, 0) + (1 + math.log(count)) * idf
+
+        # Scores are compared first, and newer quotes win ties
+        best = heapq.nlargest(limit, ((score, id) for id, score in scores.items()))
+
+        return len(scores), [self.get(channel, id) for score, id in best]
+
+    def close(self):
+        """
+        This function closes the database, if it was opened.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        if self.connection is not None:
+            self.connection.close()
@@ -0,0 +1,122 @@
+from random import randrange
+from array import array
+import sys
+
+
+class Raffle:
+    """
+    This is a class for a weighted raffle, which can have tens of thousands of entrants.
+    Entrants are kept in parallel arrays, and their weights in a Fenwick tree, so entering and drawing are both O(log n).
+    A drawn winner's weight is set to 0, so they can't be drawn again and nothing needs to be rebuilt between draws.
+
+    Attributes:
+        open (bool): Whether the raffle is taking entries.
+        positions (dict): Maps each entrant's user-id to their position, starting at 1.
+        names (list): The entrants' usernames, by position.
+        weights (array): The entrants' weights, by position. Winners have a weight of 0.
+        tree (array): The Fenwick tree of weights. tree[i] holds the sum of weights for positions (i - lowbit(i), i].
+        total (int): The sum of the weights of everyone who can still win.
+        winners (list): The usernames drawn so far, in order.
+    """
+
+    def __init__(self):
+        """
+        The constructor for the Raffle class.
+
+        Parameters:
+            None
+        """
+
+        self.open = True
+        self.positions = {}
+        self.names = []
+        self.weights = array('I')
+        self.tree = array('q', [0])
+        self.total = 0
+        self.winners = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix(self, position):
+        """
+        This function sums the weights of the entrants up to and including a position.
+
+        Parameters:
+            position (int): The position, starting at 1, or 0 for an empty sum.
+
+        Returns:
+            total (int): The sum of the weights.
+        """
+
+        total = 0
+        while position:
+            total += self.tree[position]
+            position &= position - 1
+
+        return total
+
+    def enter(self, userId, user, weight):
+        """
+        This function enters a user into the raffle. A user who has already entered is ignored.
+
+        Parameters:
+            userId (string): The user's Twitch user-id, which stays the same if they change their name.
+            user (string): The user's username.
+            weight (int): The user's number of tickets.
+
+        Returns:
+            entered (bool): True if the user was entered, False if they already were.
+        """
+
+        if userId in self.positions:
+            return False
+
+        position = len(self.tree)
+        self.positions[userId] = position
+        self.names.append(sys.intern(user))
+        self.weights.append(weight)
+
+        # The new node covers the positions after its lowest set bit is cleared, including its own
+        self.tree.append(weight + self.prefix(position - 1) - self.prefix(position & (position - 1)))
+        self.total += weight
+
+        return True
+
+    def draw(self):
+        """
+        This function draws a winner, weighted by their tickets, and removes them from later draws.
+
+        Parameters:
+            None
+
+        Returns:
+            winner (string): The username of the winner, or None if nobody is left to win.
+        """
+
+        if self.total <= 0:
+            return None
+
+        # Walk down the tree to the first position whose running total passes the ticket drawn
+        ticket = randrange(self.total)
+        position = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            following = position + step
+            if following < len(self.tree) and self.tree[following] <= ticket:
+                position = following
+                ticket -= self.tree[following]
+            step >>= 1
+
+        winner = position + 1
+        weight = self.weights[winner - 1]
+        self.weights[winner - 1] = 0
+        self.total -= weight
+
+        position = winner
+        while position < len(self.tree):
+            self.tree[position] -= weight
+            position += position & -position
+
+        self.winners.append(self.names[winner - 1])
+        return self.names[winner - 1]
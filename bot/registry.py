@@ -0,0 +1,223 @@
+from importlib.util import find_spec
+from importlib import import_module
+import pkgutil
+import logging
+import ast
+
+PLUGIN_PACKAGE = 'bot.plugins'
+
+
+def read_decorators(path):
+    """
+    This function reads the command and event decorators from a plugin's source, without importing it.
+
+    Parameters:
+        path (string): The plugin's source file.
+
+    Returns:
+        commands (dict): The aliases of each command the plugin registers, by the command's name.
+        events (set): The events the plugin subscribes to.
+    """
+
+    with open(path, encoding='utf8') as f:
+        tree = ast.parse(f.read(), path)
+
+    commands = {}
+    events = set()
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+
+        for decorator in node.decorator_list:
+            if not isinstance(decorator, ast.Call):
+                continue
+
+            kind = getattr(decorator.func, 'id', getattr(decorator.func, 'attr', None))
+            args = [ast.literal_eval(arg) for arg in decorator.args]
+            if kind == 'command':
+                call = dict(zip(('name', 'aliases'), args))
+                call.update((keyword.arg, ast.literal_eval(keyword.value)) for keyword in decorator.keywords)
+                commands[call['name']] = (call['name'], *call.get('aliases', ()))
+            elif kind == 'event':
+                events.update(args)
+
+    return commands, events
+
+
+class Registry:
+    """
+    This is a class for finding plugins, and loading each one the first time it is needed.
+    When the bot starts, every plugin's commands are added to the command map as stubs, read from the plugin's source.
+    The first stub used imports its plugin, and swaps every one of the plugin's stubs for its real commands,
+    so dispatching a command stays a single lookup in the command map however many plugins there are.
+
+    Attributes:
+        bot (TwitchBot): The bot the plugins run in.
+        modules (dict): Each plugin's module once it is loaded, or None until then, by module name.
+        aliases (dict): The aliases each plugin registers, by module name.
+        subscribers (dict): The handlers for each event, as tuples. A tuple is replaced rather than changed, so handlers can be loaded while it is being called.
+    """
+
+    def __init__(self, bot, modules=None):
+        """
+        The constructor for the Registry class.
+
+        Parameters:
+            bot (TwitchBot): The bot the plugins run in.
+            modules (list): The names of the plugin modules to use, or None for every module in bot/plugins.
+        """
+
+        self.bot = bot
+        if modules is None:
+            modules = [f'{PLUGIN_PACKAGE}.{info.name}' for info in pkgutil.iter_modules(find_spec(PLUGIN_PACKAGE).submodule_search_locations)]
+
+        self.modules = dict.fromkeys(modules)
+        self.aliases = {}
+        self.subscribers = {}
+
+    def install(self, command_map):
+        """
+        This function adds a stub for every plugin command to the command map, and subscribes a stub to each plugin event.
+        An alias which is already in the command map is replaced, with a warning, just like an alias listed twice in commands.json.
+
+        Parameters:
+            command_map (dict): The aliases and functions commands are dispatched with.
+
+        Returns:
+            None
+        """
+
+        self.command_map = command_map
+        for module in self.modules:
+            commands, events = read_decorators(find_spec(module).origin)
+            self.aliases[module] = []
+
+            for name, aliases in commands.items():
+                stub = self.command_stub(module, name)
+                for alias in aliases:
+                    if alias in command_map:
+                        logging.warning(f'Command alias "{alias}" is used by both {command_map[alias].__name__} and plugin {module}, using {module}.')
+                    command_map[alias] = stub
+                    self.aliases[module].append(alias)
+
+            for event in events:
+                self.subscribers[event] = self.subscribers.get(event, ()) + (self.event_stub(module, event),)
+
+            logging.debug(f'Found plugin {module}: {len(commands)} commands, {len(events)} events.')
+
+    def command_stub(self, module, name):
+        """
+        This function makes the stub which stands in for a plugin command until its plugin is loaded.
+
+        Parameters:
+            module (string): The plugin's module name.
+            name (string): The command's name.
+
+        Returns:
+            stub (callable): Loads the plugin, then runs the real command.
+        """
+
+        def stub(user, badges, args):
+            return self.load(module)[name](user, badges, args)
+
+        stub.__name__ = name
+        stub.module = module
+        return stub
+
+    def event_stub(self, module, event):
+        """
+        This function makes the stub which stands in for a plugin's event handlers until the plugin is loaded.
+
+        Parameters:
+            module (string): The plugin's module name.
+            event (string): The event.
+
+        Returns:
+            stub (callable): Loads the plugin, then passes the event to its real handlers.
+        """
+
+        def stub(data):
+            self.load(module)
+            for handler in self.handlers(module, event):
+                handler(data)
+
+        stub.module = module
+        return stub
+
+    def handlers(self, module, event):
+        """
+        This function returns a loaded plugin's handlers for an event.
+
+        Parameters:
+            module (string): The plugin's module name.
+            event (string): The event.
+
+        Returns:
+            handlers (list): Functions which take the event.
+        """
+
+        bot = self.bot
+        return [lambda data, function=function: function(bot, data) for function in vars(self.modules[module]).values() if callable(function) and event in getattr(function, 'events', ())]
+
+    def load(self, module):
+        """
+        This function imports a plugin, and swaps its stubs for its real commands and event handlers.
+
+        Parameters:
+            module (string): The plugin's module name.
+
+        Returns:
+            commands (dict): The plugin's commands, by name.
+        """
+
+        plugin = self.modules[module] = self.modules[module] or import_module(module)
+
+        commands = {}
+        for value in vars(plugin).values():
+            command = getattr(value, 'command', None)
+            if command is not None and getattr(command, 'function', None) is value:
+                command.bot = self.bot
+                commands[command.__name__] = command
+
+        for alias in self.aliases[module]:
+            stub = self.command_map.get(alias)
+            if getattr(stub, 'module', None) == module:
+                self.command_map[alias] = commands[stub.__name__]
+
+        for event, handlers in self.subscribers.items():
+            replaced = ()
+            for handler in handlers:
+                replaced += tuple(self.handlers(module, event)) if getattr(handler, 'module', None) == module else (handler,)
+            self.subscribers[event] = replaced
+
+        logging.info(f'Loaded plugin {module}.')
+        return commands
+
+    def publish(self, event):
+        """
+        This function passes an event to every plugin subscribed to it.
+
+        Parameters:
+            event (dict): The parsed event.
+
+        Returns:
+            None
+        """
+
+        for handler in self.subscribers.get(event['command'], ()):
+            handler(event)
+
+    def close(self):
+        """
+        This function calls close(bot) in every loaded plugin which defines it.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+
+        for plugin in self.modules.values():
+            if plugin is not None and hasattr(plugin, 'close'):
+                plugin.close(self.bot)
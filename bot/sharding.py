@@ -0,0 +1,131 @@
+import multiprocessing
+import json
+
+# The most choices a poll shared between shards can have
+MAX_CHOICES = 32
+
+# The most bytes the JSON description of a shared poll can take
+POLL_BYTES = 4096
+
+
+class SharedPoll:
+    """
+    This is a class for one poll which spans the channels of several worker processes.
+    It lives in shared memory created by the supervisor before the workers start.
+
+    Each shard counts its own votes in its own row of the tally array, so voting never takes a lock.
+    Shards only know the users who voted in their own channels, so votes are counted per channel:
+    a user who votes in channels on two shards is counted once on each.
+    Ending the poll sums the columns, which costs one pass over shards * choices integers.
+    Creating or closing the poll publishes its description and bumps the generation,
+    which every shard checks once per loop to pick up the change.
+
+    Attributes:
+        shards (int): The number of worker processes sharing the poll.
+        lock (Lock): Held while publishing or reading the poll description.
+        generation (Value): Incremented each time the poll is created or closed.
+        data (Array): The JSON description of the poll - its title, choices, random flag, and whether it is open.
+        tallies (Array): The vote counts, in rows of MAX_CHOICES per shard.
+    """
+
+    def __init__(self, shards, context=multiprocessing):
+        """
+        The constructor for the SharedPoll class.
+
+        Parameters:
+            shards (int): The number of worker processes sharing the poll.
+            context (module or context): The multiprocessing context to allocate shared memory with.
+        """
+
+        self.shards = shards
+        self.lock = context.Lock()
+        self.generation = context.Value('L', 0, lock=False)
+        self.data = context.Array('c', POLL_BYTES, lock=False)
+        self.tallies = context.Array('q', shards * MAX_CHOICES, lock=False)
+
+    def publish(self, poll):
+        """
+        This function shares a newly created or closed poll with every shard.
+
+        Parameters:
+            poll (dict): The poll, with at least its title, choices, random flag, and whether it is open.
+
+        Returns:
+            generation (int): The generation of the published poll.
+        """
+
+        if len(poll['choices']) > MAX_CHOICES:
+            raise ValueError(f'A shared poll can have at most {MAX_CHOICES} choices.')
+
+        encoded = json.dumps({key: poll[key] for key in ('title', 'choices', 'random', 'open')}).encode()
+        if len(encoded) >= POLL_BYTES:
+            raise ValueError(f'A shared poll must fit in {POLL_BYTES} bytes.')
+
+        with self.lock:
+            self.data.value = encoded
+            self.generation.value += 1
+            return self.generation.value
+
+    def read(self):
+        """
+        This function reads the currently published poll.
+
+        Parameters:
+            None
+
+        Returns:
+            generation (int): The generation of the poll.
+            poll (dict): The poll's title, choices, random flag, and whether it is open, or None if nothing has been published.
+        """
+
+        with self.lock:
+            generation = self.generation.value
+            data = self.data.value
+
+        return generation, (json.loads(data) if data else None)
+
+    def reset(self, shard):
+        """
+        This function clears a shard's votes, when it picks up a new poll.
+
+        Parameters:
+            shard (int): The shard whose row to clear.
+
+        Returns:
+            None
+        """
+
+        start = shard * MAX_CHOICES
+        self.tallies[start:start + MAX_CHOICES] = [0] * MAX_CHOICES
+
+    def vote(self, shard, old, new):
+        """
+        This function records a vote, or a user changing their vote.
+
+        Parameters:
+            shard (int): The shard which received the vote.
+            old (int): The user's previous choice, starting at 1, or None if this is their first vote.
+            new (int): The user's choice, starting at 1.
+
+        Returns:
+            None
+        """
+
+        row = shard * MAX_CHOICES - 1
+        if old:
+            self.tallies[row + old] -= 1
+        self.tallies[row + new] += 1
+
+    def totals(self, choices):
+        """
+        This function adds up the votes from every shard.
+
+        Parameters:
+            choices (int): The number of choices on the poll.
+
+        Returns:
+            totals (list): The number of votes for each choice.
+        """
+
+        tallies = self.tallies[:]
+        return [sum(tallies[shard * MAX_CHOICES + choice] for shard in range(self.shards)) for choice in range(choices)]
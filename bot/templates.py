@@ -0,0 +1,206 @@
+from random import choice
+from .clock import CLOCK
+import re
+
+# A variable, such as {user} or {random:a|b|c}
+VARIABLE_PATTERN = re.compile(r'\{(\w+)(?::([^{}]*))?\}')
+
+# Twitch runs a message starting with / or . as a chat command, such as /ban
+COMMAND_CHARACTERS = '/. '
+
+
+def format_duration(seconds):
+    """
+    This function formats a number of seconds as days, hours and minutes, such as '2h 5m'.
+
+    Parameters:
+        seconds (float): The number of seconds.
+
+    Returns:
+        duration (string): The formatted duration.
+    """
+
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    parts = [f'{value}{unit}' for value, unit in ((days, 'd'), (hours, 'h')) if value]
+    parts.append(f'{minutes}m')
+
+    return ' '.join(parts)
+
+
+def compile_template(template):
+    """
+    This function compiles a custom command's response into a render plan.
+    The variables are:
+        {user}: The user who used the command.
+        {args}: Anything they wrote after the command. If it would start the response, any leading / or . is removed,
+            so a user can't make the bot run a chat command.
+        {count}: The number of times the command has been used, including this time.
+        {uptime}: How long the bot has been running.
+        {random:a|b|c}: One of the | separated choices, picked at random.
+    Anything else in braces is left as it is.
+
+    Parameters:
+        template (string): The response.
+
+    Returns:
+        plan (string or tuple): The response itself if it has no variables, otherwise a tuple of its parts.
+            Each part is either a string, or a function which takes a Context and returns a string.
+    """
+
+    parts = []
+    position = 0
+    for variable in VARIABLE_PATTERN.finditer(template):
+        name, argument = variable.groups()
+        if name == 'random' and argument:
+            options = tuple(argument.split('|'))
+            part = lambda context, options=options: choice(options)
+        elif name in RENDERERS and argument is None:
+            part = RENDERERS[name]
+        else:
+            continue
+
+        if variable.start() > position:
+            parts.append(template[position:variable.start()])
+        parts.append(part)
+        position = variable.end()
+
+    if not parts:
+        return template
+
+    if position < len(template):
+        parts.append(template[position:])
+
+    return tuple(parts)
+
+
+class Context:
+    """
+    This is a class for the values a render plan's variables are filled in from.
+
+    Attributes:
+        user (string): The user who used the command.
+        args (list): Anything they wrote after the command, split on spaces.
+        count (int): The number of times the command has been used.
+        started (float): The time the bot started.
+        clock (Clock): The source of time.
+    """
+
+    __slots__ = ('user', 'args', 'count', 'started', 'clock')
+
+    def __init__(self, user, args, count, started, clock):
+        self.user = user
+        self.args = args
+        self.count = count
+        self.started = started
+        self.clock = clock
+
+
+def render_args(context):
+    return ' '.join(context.args)
+
+
+RENDERERS = {
+    'user': lambda context: context.user,
+    'args': render_args,
+    'count': lambda context: str(context.count),
+    'uptime': lambda context: format_duration(context.clock.time() - context.started),
+}
+
+
+class Templates:
+    """
+    This is a class for rendering custom command responses, and counting how often each command is used.
+    Each response is compiled into a render plan the first time it is used, and the plan is reused until the command changes.
+    Counts are kept in memory, and written to a checkpoint at most once per interval rather than on every use.
+
+    Attributes:
+        plans (dict): The render plan of each command used since it last changed.
+        counts (dict): The number of times each command has been used.
+        checkpoint (Checkpoint): Where the counts are saved.
+        clock (Clock): The source of time.
+    """
+
+    def __init__(self, checkpoint, clock=None):
+        """
+        The constructor for the Templates class.
+
+        Parameters:
+            checkpoint (Checkpoint): Where the counts are saved, and loaded from.
+            clock (Clock): The source of time - see bot/clock.py.
+        """
+
+        self.clock = clock or CLOCK
+        self.plans = {}
+        self.checkpoint = checkpoint
+        self.counts = checkpoint.load() or {}
+
+    def render(self, command, template, user, args, started):
+        """
+        This function counts a use of a custom command, and renders its response.
+
+        Parameters:
+            command (string): The name of the command.
+            template (string): The command's response, which is only compiled if it has no plan yet.
+            user (string): The user who used the command.
+            args (list): Anything they wrote after the command, split on spaces.
+            started (float): The time this run of the bot started, in seconds since the epoch, for {uptime}.
+
+        Returns:
+            response (string): The rendered response.
+        """
+
+        count = self.counts[command] = self.counts.get(command, 0) + 1
+        self.checkpoint.mark()
+
+        plan = self.plans.get(command)
+        if plan is None:
+            plan = self.plans[command] = compile_template(template)
+
+        if plan.__class__ is str:
+            return plan
+
+        context = Context(user, args, count, started, self.clock)
+        parts = []
+        for part in plan:
+            if part.__class__ is not str:
+                value = part(context)
+                # Only the moderator who wrote the response may start it with a chat command, never the user's arguments
+                if part is render_args and not ''.join(parts).strip():
+                    value = value.lstrip(COMMAND_CHARACTERS)
+                part = value
+            parts.append(part)
+
+        return ''.join(parts)
+
+    def invalidate(self, command, forget=False):
+        """
+        This function drops a command's render plan, after it has changed or been deleted.
+
+        Parameters:
+            command (string): The name of the command.
+            forget (bool): Whether to also forget how often it was used.
+
+        Returns:
+            None
+        """
+
+        self.plans.pop(command, None)
+        if forget and self.counts.pop(command, None) is not None:
+            self.checkpoint.mark()
+
+    def flush(self, force=False):
+        """
+        This function writes the counts, if they have changed and the interval has passed.
+
+        Parameters:
+            force (bool): Whether to write any changes without waiting for the interval, such as when shutting down.
+
+        Returns:
+            None
+        """
+
+        if self.checkpoint.due() or (force and self.checkpoint.dirty):
+            self.checkpoint.save(self.counts)
@@ -0,0 +1,195 @@
+from time import perf_counter_ns, time
+from collections import deque
+from random import random
+import itertools
+import json
+import os
+
+# Traces are written next to the package rather than the working directory, like the bot's data files
+TRACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'traces')
+
+
+class Trace:
+    """
+    This is a class for the timeline of a single message, from the socket read to the reply being written.
+
+    Attributes:
+        id (int): The sequence number of the trace.
+        spans (list): A list of (name, perf_counter_ns) tuples, in the order they were recorded.
+        label (string): The command or event the message turned out to be, once known.
+        lag_ms (int): The milliseconds between Twitch sending the message (tmi-sent-ts) and us reading it, or None if unknown.
+    """
+
+    __slots__ = ('id', 'spans', 'label', 'lag_ms')
+
+    def __init__(self, id, spans):
+        """
+        The constructor for the Trace class.
+
+        Parameters:
+            id (int): The sequence number of the trace.
+            spans (list): Any spans recorded before the trace was created, such as the socket read.
+        """
+
+        self.id = id
+        self.spans = spans
+        self.label = None
+        self.lag_ms = None
+
+    def mark(self, name):
+        """
+        This function records the end of a stage.
+
+        Parameters:
+            name (string): The name of the stage which just finished.
+
+        Returns:
+            None
+        """
+
+        self.spans.append((name, perf_counter_ns()))
+
+    def to_dict(self):
+        """
+        This function converts the trace into a JSON friendly dictionary.
+        Span times are given in microseconds since the first span, along with the time spent in each stage.
+
+        Parameters:
+            None
+
+        Returns:
+            data (dict): The trace data.
+        """
+
+        # The reply may be written after the trace is finished, so order the spans by time
+        ordered = sorted(self.spans, key=lambda span: span[1])
+        origin = ordered[0][1] if ordered else 0
+        spans = []
+        previous = origin
+        for name, ns in ordered:
+            spans.append({'stage': name, 'at_us': (ns - origin) // 1000, 'took_us': (ns - previous) // 1000})
+            previous = ns
+
+        return {'id': self.id, 'label': self.label, 'lag_ms': self.lag_ms, 'spans': spans}
+
+
+class Tracer:
+    """
+    This is a class for sampling per-message traces and keeping the most recent ones.
+    When a message isn't sampled, the only cost is one random number.
+
+    Attributes:
+        sample_rate (float): The fraction of messages to trace, from 0 to 1.
+        traces (deque): A fixed-size ring buffer of the most recently finished traces.
+        current (Trace): The trace of the message being handled right now, or None.
+        ids (iterator): Generates trace sequence numbers.
+    """
+
+    def __init__(self, sample_rate=0.0, capacity=512):
+        """
+        The constructor for the Tracer class.
+
+        Parameters:
+            sample_rate (float): The fraction of messages to trace, from 0 to 1.
+            capacity (int): The number of finished traces to keep.
+        """
+
+        self.sample_rate = float(sample_rate)
+        self.traces = deque(maxlen=capacity)
+        self.current = None
+        self.ids = itertools.count(1)
+
+    def sample(self, spans):
+        """
+        This function decides whether to trace a message, and starts the trace if so.
+
+        Parameters:
+            spans (list): Spans which were recorded before the message was known, such as the socket read.
+                These are copied, as they are shared by every message in the same read.
+
+        Returns:
+            trace (Trace): The new trace, or None if the message wasn't sampled.
+        """
+
+        if self.sample_rate and random() < self.sample_rate:
+            return Trace(next(self.ids), list(spans))
+
+    def ingress(self, trace, tags, read_time):
+        """
+        This function records how long Twitch's message took to reach us, using its tmi-sent-ts tag.
+
+        Parameters:
+            trace (Trace): The trace of the message.
+            tags (dict): The message's IRC tags.
+            read_time (float): The wall clock time at which the message was read, in seconds.
+
+        Returns:
+            None
+        """
+
+        sent = tags.get('tmi-sent-ts')
+        if sent and sent.isdigit():
+            trace.lag_ms = int(read_time * 1000) - int(sent)
+
+    def finish(self, trace):
+        """
+        This function stores a finished trace in the ring buffer.
+
+        Parameters:
+            trace (Trace): The finished trace.
+
+        Returns:
+            None
+        """
+
+        self.traces.append(trace)
+        if self.current is trace:
+            self.current = None
+
+    def dump(self, directory=TRACE_DIR):
+        """
+        This function writes every stored trace to a JSON file.
+
+        Parameters:
+            directory (string): The directory to write the file into.
+
+        Returns:
+            path (string): The path of the written file.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'traces-{int(time())}.json')
+
+        with open(path, 'w') as f:
+            json.dump([trace.to_dict() for trace in list(self.traces)], f, indent=1)
+
+        return path
+
+    def summary(self):
+        """
+        This function summarizes the stored traces as the median time spent in each stage.
+
+        Parameters:
+            None
+
+        Returns:
+            summary (string): A short, human readable breakdown, or an empty string if there are no traces.
+        """
+
+        stages = {}
+        lags = []
+        for trace in list(self.traces):
+            data = trace.to_dict()
+            for span in data['spans'][1:]:
+                stages.setdefault(span['stage'], []).append(span['took_us'])
+            if trace.lag_ms is not None:
+                lags.append(trace.lag_ms)
+
+        if not stages:
+            return ''
+
+        parts = [f'{stage}: {sorted(took)[len(took) // 2]}us' for stage, took in stages.items()]
+        if lags:
+            parts.append(f'ingress lag: {sorted(lags)[len(lags) // 2]}ms')
+
+        return f'{len(self.traces)} traces, medians - ' + ' | '.join(parts)
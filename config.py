@@ -34,5 +34,85 @@ LOGLEVEL = "INFO"
 # File which holds the bot logs
 LOGFILE ='TwitchBotLogs.log'
 
+# Size in bytes at which the log file is rotated, and the number of old log files to keep
+# Each run also starts a fresh log file, keeping the previous run's log as a backup
+LOGMAXBYTES = 10 * 1024 * 1024
+LOGBACKUPS = 5
+
+# Local port to serve Prometheus metrics on (http://127.0.0.1:PORT/metrics)
+# Set to None to disable the endpoint
+METRICS_PORT = 9100
+
+# Fraction of chat messages to trace from socket read to reply, between 0 and 1
+# Recent traces can be written to the traces directory with the trace command
+TRACE_SAMPLE_RATE = 0.01
+
+# Minimum seconds between writes of the bot's state (running poll, votes, scheduled message timers)
+# 0 writes after every change, so a crash or restart never loses a vote
+CHECKPOINT_INTERVAL = 0
+
+# Number of worker processes to parse chat in - 0 parses on a thread, which is plenty unless chat is very busy
+PARSE_PROCESSES = 0
+
+# Number of messages each stage of the receive pipeline can queue, and what happens when a queue is full:
+# 'block' stops reading until there is room, 'drop_newest' discards new messages, 'drop_oldest' discards the oldest queued ones
+QUEUE_SIZE = 10000
+QUEUE_POLICY = 'block'
+
+# Channels for supervisor.py to split between its worker processes (main.py only uses CHAN)
+CHANNELS = [CHAN]
+
+# Number of worker processes supervisor.py starts - each serves metrics on METRICS_PORT + its number
+SHARDS = 2
+
+# Whether a poll created in any channel run by supervisor.py spans all of them
+SHARED_POLL = False
+
+# Number of messages the bot may send, and in how many seconds - Twitch allows 20 per 30 seconds,
+# or 100 per 30 seconds if the bot is a moderator in every channel it joins
+RATE_LIMIT = (20, 30)
+
+# Spam and flood moderation, which times out users who break a rule - set to None to turn it off
+# Leave this empty to use the defaults, or change any of the settings listed in bot/moderation.py, for example:
+# MODERATION = {'max_emotes': 10, 'timeouts': {'links': 0}}
+MODERATION = None
+
+# Number of recent messages remembered per user for the history command, and the number of users remembered at once
+HISTORY_SIZE = 20
+HISTORY_USERS = 10000
+
+# Seconds between snapshots of who is in each channel, and the number of snapshots kept for the chatters command
+PRESENCE_INTERVAL = 300
+PRESENCE_SNAPSHOTS = 12
+
+# Seconds between rounds of loyalty points, or 0 to turn them off
+# Each round, everyone in the channel earns the first number of points, and anyone who chatted since the last round also earns the second
+LOYALTY_INTERVAL = 300
+LOYALTY_POINTS = (10, 5)
+
+# Raffle tickets for users who aren't subscribed, then for tier 1, 2 and 3 subscribers
+RAFFLE_WEIGHTS = (1, 2, 3, 4)
+
+# Minimum seconds between writes of how often each custom command was used, for the {count} variable
+COUNT_INTERVAL = 60
+
+# Unix domain socket file to publish parsed chat messages and events on, for overlays, dashboards and so on - see bot/events.py
+# Set to None to turn it off. Not available on Windows
+EVENT_SOCKET = None
+
+# Extra accounts to send messages with, each with its own rate limit, as (username, token) pairs, for example:
+# SENDERS = [('mybot_sender1', 'oauth:...'), ('mybot_sender2', 'oauth:...')]
+# They only send - everything is still received on the USER account. To send timeouts they must be moderators too
+SENDERS = []
+
+# Shedding work when chat arrives faster than the bot can handle it, such as during a raid - set to None to turn it off
+# Past the first watermark, auto replies, loyalty points for chatting and the event stream are skipped; past the second, so are commands from non-moderators
+# Leave this empty to use the defaults, or change any of the settings listed in bot/overload.py, for example:
+# OVERLOAD = {'lag': (10, 30)}
+OVERLOAD = {}
+
+# Plugin modules to add commands from - see bot/plugins - or None to use every module in bot/plugins
+PLUGINS = None
+
 # Tuple holding bot info (just a shortcut)
-DATA = LOGFILE, LOGLEVEL, URL, PORT, USER, PASS, CHAN, PREFIX
\ No newline at end of file
+DATA = LOGFILE, LOGLEVEL, LOGMAXBYTES, LOGBACKUPS, URL, PORT, USER, PASS, CHAN, PREFIX, METRICS_PORT, TRACE_SAMPLE_RATE, CHECKPOINT_INTERVAL, PARSE_PROCESSES, QUEUE_SIZE, QUEUE_POLICY, RATE_LIMIT, MODERATION, HISTORY_SIZE, HISTORY_USERS, PRESENCE_INTERVAL, PRESENCE_SNAPSHOTS, LOYALTY_INTERVAL, LOYALTY_POINTS, RAFFLE_WEIGHTS, COUNT_INTERVAL, EVENT_SOCKET, SENDERS, OVERLOAD, PLUGINS
\ No newline at end of file
@@ -1,21 +1,24 @@
 from traceback import format_exception_only
 from bot import TwitchBot
+from bot.logs import setup_logging
 from config import DATA
 from sys import exit
 import logging
 
-logFile, logLevel, *botData = DATA
-logging.basicConfig(filename=logFile, filemode='w', level=logLevel, format='%(asctime)s %(levelname)s: %(message)s')
+# Parser worker processes may import this module, and must not start a bot of their own
+if __name__ == '__main__':
+    logFile, logLevel, logMaxBytes, logBackups, *botData = DATA
+    setup_logging(logFile, logLevel, logMaxBytes, logBackups)
 
-myBot = TwitchBot(*botData)
+    myBot = TwitchBot(*botData)
 
-try:
-    logging.debug('Starting bot...')
-    myBot.run()
-except(KeyboardInterrupt, SystemExit):
-    logging.info('Received EXIT signal, exiting program...')
-except Exception as e:
-    logging.fatal(f'Program crashed: {" ".join(format_exception_only(type(e), e))}')
-finally:
-    logging.debug('Stopping bot...')
-    exit()
\ No newline at end of file
+    try:
+        logging.debug('Starting bot...')
+        myBot.run()
+    except(KeyboardInterrupt, SystemExit):
+        logging.info('Received EXIT signal, exiting program...')
+    except Exception as e:
+        logging.fatal(f'Program crashed: {" ".join(format_exception_only(type(e), e))}')
+    finally:
+        logging.debug('Stopping bot...')
+        exit()
\ No newline at end of file
@@ -0,0 +1,149 @@
+from traceback import format_exception_only
+from multiprocessing.connection import wait
+from multiprocessing import Process
+from bot import TwitchBot
+from bot.logs import setup_logging
+from bot.sharding import SharedPoll
+from config import DATA, CHANNELS, SHARDS, SHARED_POLL
+from time import sleep, monotonic
+from sys import exit
+import logging
+import os
+
+logFile, logLevel, logMaxBytes, logBackups, url, port, user, token, chan, prefix, metricsPort, *options = DATA
+
+# The longest wait before restarting a crashed worker, in seconds
+MAX_BACKOFF = 60
+
+
+def work(shard, channels, sharedPoll):
+    """
+    This function runs one worker process, which serves a subset of the channels.
+
+    Parameters:
+        shard (int): The number of the worker.
+        channels (list): The channels the worker serves.
+        sharedPoll (SharedPoll): The poll shared between workers, or None.
+
+    Returns:
+        None
+    """
+
+    # The forked worker inherits the supervisor's log handler, whose queue has no listener in this process,
+    # so it would hold on to every record logged
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    name, ext = os.path.splitext(logFile)
+    # Forked processes skip atexit, so the worker's own listener is stopped here
+    listener = setup_logging(f'{name}-{shard}{ext}', logLevel, logMaxBytes, logBackups)
+
+    myBot = TwitchBot(url, port, user, token, channels, prefix, metricsPort and int(metricsPort) + shard, *options, shard=shard, shared_poll=sharedPoll)
+
+    try:
+        logging.debug(f'Starting worker {shard} for {", ".join(channels)}...')
+        myBot.run()
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except Exception as e:
+        logging.fatal(f'Worker crashed: {" ".join(format_exception_only(type(e), e))}')
+        exit(1)
+    finally:
+        listener.stop()
+
+
+def start(shard, channels, sharedPoll):
+    """
+    This function starts a worker process.
+
+    Parameters:
+        shard (int): The number of the worker.
+        channels (list): The channels the worker serves.
+        sharedPoll (SharedPoll): The poll shared between workers, or None.
+
+    Returns:
+        process (Process): The started worker.
+    """
+
+    process = Process(target=work, args=(shard, channels, sharedPoll), name=f'worker-{shard}')
+    process.start()
+    logging.info(f'Started worker {shard} (pid {process.pid}) for {", ".join(channels)}')
+
+    return process
+
+
+def supervise():
+    """
+    This function splits the channels between worker processes, and restarts any worker which crashes.
+    Crashing workers are restarted with an exponential backoff. Each worker waits out its own backoff,
+    so the others are still watched and restarted in the meantime. A worker which exits cleanly, such as
+    after the disconnect command, is not restarted, and the supervisor exits once every worker has.
+
+    Parameters:
+        None
+
+    Returns:
+        None
+    """
+
+    shards = [CHANNELS[i::SHARDS] for i in range(SHARDS) if CHANNELS[i::SHARDS]]
+    sharedPoll = SharedPoll(len(shards)) if SHARED_POLL else None
+
+    workers = {shard: start(shard, channels, sharedPoll) for shard, channels in enumerate(shards)}
+    started = {shard: monotonic() for shard in workers}
+    failures = {shard: 0 for shard in workers}
+    # The monotonic time each crashed worker is due to be restarted
+    restarts = {}
+
+    try:
+        while workers or restarts:
+            for shard, deadline in list(restarts.items()):
+                if deadline <= monotonic():
+                    del restarts[shard]
+                    workers[shard] = start(shard, shards[shard], sharedPoll)
+                    started[shard] = monotonic()
+
+            timeout = max(0, min(restarts.values()) - monotonic()) if restarts else None
+            if workers:
+                wait([process.sentinel for process in workers.values()], timeout)
+            else:
+                sleep(timeout)
+
+            for shard, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+
+                process.join()
+                if process.exitcode == 0:
+                    logging.info(f'Worker {shard} exited.')
+                    del workers[shard]
+                    continue
+
+                # Reset the backoff once a worker has stayed up for a while
+                if monotonic() - started[shard] > MAX_BACKOFF:
+                    failures[shard] = 0
+                delay = min(MAX_BACKOFF, 2 ** failures[shard])
+                failures[shard] += 1
+
+                logging.error(f'Worker {shard} crashed (exit code {process.exitcode}), restarting in {delay} seconds...')
+                del workers[shard]
+                restarts[shard] = monotonic() + delay
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join()
+
+
+if __name__ == '__main__':
+    setup_logging(logFile, logLevel, logMaxBytes, logBackups)
+
+    try:
+        logging.debug('Starting supervisor...')
+        supervise()
+    except (KeyboardInterrupt, SystemExit):
+        logging.info('Received EXIT signal, exiting program...')
+    finally:
+        logging.debug('Stopping supervisor...')
+        exit()
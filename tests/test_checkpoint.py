@@ -0,0 +1,128 @@
+import marshal
+
+from bot.checkpoint import Checkpoint, COMPACT_RECORDS, MAGIC
+from bot.clock import SimulatedClock
+
+
+def reopen(checkpoint):
+    """
+    This function opens a checkpoint's file again, as a restarted bot would.
+    """
+
+    restarted = Checkpoint(checkpoint.path, checkpoint.interval, checkpoint.clock)
+    return restarted, restarted.load()
+
+
+def test_journal_replays_votes_after_restart(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'))
+    checkpoint.save({'poll': 'open'})
+    checkpoint.append(('vote', 'alice', 1))
+    checkpoint.append(('vote', 'bob', 2))
+    checkpoint.close()
+
+    restarted, state = reopen(checkpoint)
+
+    assert state == {'poll': 'open'}
+    assert restarted.replay() == [('vote', 'alice', 1), ('vote', 'bob', 2)]
+    assert restarted.records == 2
+
+
+def test_records_before_a_snapshot_are_not_replayed(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'))
+    checkpoint.save({'votes': {}})
+    checkpoint.append(('vote', 'alice', 1))
+    checkpoint.sync()
+
+    # The snapshot now includes alice's vote, so her record must not be applied on top of it
+    checkpoint.save({'votes': {'alice': 1}})
+    checkpoint.append(('vote', 'bob', 2))
+    checkpoint.close()
+
+    restarted, state = reopen(checkpoint)
+
+    assert state == {'votes': {'alice': 1}}
+    assert restarted.replay() == [('vote', 'bob', 2)]
+
+
+def test_stale_journal_left_by_a_crash_is_ignored(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'))
+    checkpoint.save({'votes': {}})
+    checkpoint.append(('vote', 'alice', 1))
+    checkpoint.close()
+    journal = open(checkpoint.path + '.journal', 'rb').read()
+
+    checkpoint.save({'votes': {'alice': 1}})
+    # A crash after the snapshot was replaced, but before the journal was emptied
+    with open(checkpoint.path + '.journal', 'wb') as f:
+        f.write(journal)
+
+    restarted, state = reopen(checkpoint)
+
+    assert state == {'votes': {'alice': 1}}
+    assert restarted.replay() == []
+
+
+def test_torn_record_ends_the_journal(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'))
+    checkpoint.save({})
+    checkpoint.append(('vote', 'alice', 1))
+    checkpoint.append(('vote', 'bob', 2))
+    checkpoint.close()
+
+    with open(checkpoint.path + '.journal', 'r+b') as f:
+        f.truncate(len(f.read()) - 3)
+
+    restarted, _ = reopen(checkpoint)
+
+    assert restarted.replay() == [('vote', 'alice', 1)]
+
+
+def test_version_one_checkpoint_loads_without_replaying(tmp_path):
+    path = str(tmp_path / 'state.checkpoint')
+    with open(path, 'wb') as f:
+        f.write(MAGIC + bytes([1]))
+        marshal.dump({'poll': 'old'}, f)
+
+    checkpoint = Checkpoint(path)
+
+    assert checkpoint.load() == {'poll': 'old'}
+    assert checkpoint.replay() == []
+
+
+def test_unreadable_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / 'state.checkpoint'
+    path.write_bytes(MAGIC + bytes([2]) + b'\x00')
+
+    assert Checkpoint(str(path)).load() is None
+
+
+def test_due_waits_for_the_interval(tmp_path):
+    clock = SimulatedClock()
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'), interval=60, clock=clock)
+    checkpoint.save({})
+    checkpoint.mark()
+
+    clock.advance(59)
+    assert not checkpoint.due()
+
+    clock.advance(1)
+    assert checkpoint.due()
+
+
+def test_long_journal_is_due_for_compaction(tmp_path):
+    clock = SimulatedClock()
+    checkpoint = Checkpoint(str(tmp_path / 'state.checkpoint'), interval=60, clock=clock)
+    checkpoint.save({})
+    clock.advance(60)
+
+    for i in range(COMPACT_RECORDS - 1):
+        checkpoint.append(('vote', f'user{i}', 1))
+    assert not checkpoint.due()
+
+    checkpoint.append(('vote', 'last', 1))
+    assert checkpoint.due()
+
+    checkpoint.save({})
+    assert checkpoint.records == 0
+    assert not checkpoint.due()
+    checkpoint.close()
@@ -0,0 +1,56 @@
+from bot.emotes import Emotes
+
+
+def test_spans_are_decoded_in_message_order():
+    emotes = Emotes('25:0-4,12-16/1902:6-10', 'Kappa Keepo Kappa')
+
+    assert emotes.spans == ((0, 5, '25'), (6, 11, '1902'), (12, 17, '25'))
+    assert emotes.names() == ['Kappa', 'Keepo', 'Kappa']
+    assert emotes.counts() == {'25': 2, '1902': 1}
+
+
+def test_spans_are_only_decoded_when_needed():
+    emotes = Emotes('25:0-4', 'Kappa')
+
+    assert emotes._spans is None
+    assert emotes
+    assert emotes._spans is None
+    assert len(emotes) == 1
+
+
+def test_out_of_range_and_overlapping_spans_are_dropped():
+    emotes = Emotes('25:0-4,3-7,20-24/1:x-y', 'Kappa hello')
+
+    assert emotes.spans == ((0, 5, '25'),)
+
+
+def test_action_messages_are_read_from_inside_the_wrapper():
+    emotes = Emotes('25:6-10', '\x01ACTION waves Kappa\x01')
+
+    assert emotes.text == 'waves Kappa'
+    assert emotes.names() == ['Kappa']
+    assert emotes.stripped() == 'waves '
+    assert not emotes.only()
+
+
+def test_action_message_of_only_emotes():
+    emotes = Emotes('25:0-4,6-10', '\x01ACTION Kappa Kappa\x01')
+
+    assert emotes.only()
+    assert emotes.stripped() == ' '
+
+
+def test_emote_offsets_count_characters_not_bytes():
+    emotes = Emotes('25:2-6', '😀 Kappa')
+
+    assert emotes.names() == ['Kappa']
+
+
+def test_messages_without_emotes():
+    emotes = Emotes('', 'hello there')
+
+    assert not emotes
+    assert emotes.spans == ()
+    assert not emotes.only()
+    assert emotes.stripped() == 'hello there'
+    assert list(emotes.gaps()) == [(0, 11)]
@@ -0,0 +1,42 @@
+from bot.listings import paginate, split_bytes, SEPARATOR
+
+
+def test_split_bytes_never_cuts_a_character():
+    text = 'aé€😀' * 50
+    data = text.encode('utf8')
+
+    for size in range(4, 20):
+        pieces = split_bytes(data, size)
+
+        assert b''.join(pieces) == data
+        assert all(len(piece) <= size for piece in pieces)
+        assert ''.join(piece.decode('utf8') for piece in pieces) == text
+
+
+def test_split_bytes_leaves_short_text_whole():
+    assert split_bytes('€'.encode('utf8'), 3) == ['€'.encode('utf8')]
+    assert split_bytes(b'', 10) == [b'']
+
+
+def test_paginate_breaks_between_entries():
+    entries = [f'command{i}' for i in range(100)]
+
+    pages = paginate(entries, size=50)
+
+    assert all(len(page.encode('utf8')) <= 50 for page in pages)
+    assert SEPARATOR.join(pages).split(SEPARATOR) == entries
+
+
+def test_paginate_splits_an_entry_too_long_for_a_page():
+    entries = ['short', '😀' * 30, 'after']
+
+    pages = paginate(entries, size=20)
+
+    assert pages[0] == 'short'
+    assert ''.join(pages[1:-1]) == '😀' * 30
+    assert all(len(page.encode('utf8')) <= 20 for page in pages)
+    assert pages[-1].endswith('after')
+
+
+def test_paginate_without_entries():
+    assert paginate([]) == []
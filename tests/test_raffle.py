@@ -0,0 +1,67 @@
+import random
+
+from bot import raffle
+from bot.raffle import Raffle
+
+
+def enter_all(weights):
+    entries = Raffle()
+    for i, weight in enumerate(weights):
+        entries.enter(f'id{i}', f'user{i}', weight)
+
+    return entries
+
+
+def test_prefix_sums_match_the_weights():
+    weights = [random.Random(i).randint(0, 4) for i in range(257)]
+    entries = enter_all(weights)
+
+    for position in range(len(weights) + 1):
+        assert entries.prefix(position) == sum(weights[:position])
+    assert entries.total == sum(weights)
+
+
+def test_repeat_entries_are_ignored():
+    entries = Raffle()
+
+    assert entries.enter('1', 'alice', 2)
+    assert not entries.enter('1', 'alice_renamed', 4)
+    assert len(entries) == 1
+    assert entries.total == 2
+
+
+def test_each_ticket_draws_its_owner(monkeypatch):
+    weights = [3, 0, 1, 4, 2, 1, 0, 5]
+    owners = [f'user{i}' for i, weight in enumerate(weights) for _ in range(weight)]
+
+    for ticket, owner in enumerate(owners):
+        entries = enter_all(weights)
+        monkeypatch.setattr(raffle, 'randrange', lambda total: ticket)
+        assert entries.draw() == owner
+
+
+def test_winners_are_never_drawn_again():
+    random.seed(0)
+    weights = [1, 2, 3, 4] * 250
+    entries = enter_all(weights)
+
+    winners = [entries.draw() for _ in range(len(weights))]
+
+    assert sorted(winners) == sorted(f'user{i}' for i in range(len(weights)))
+    assert entries.total == 0
+    assert entries.draw() is None
+    assert entries.winners == winners
+    for position in range(len(weights) + 1):
+        assert entries.prefix(position) == 0
+
+
+def test_draws_after_a_win_use_the_remaining_weights(monkeypatch):
+    entries = enter_all([1, 5, 2])
+    monkeypatch.setattr(raffle, 'randrange', lambda total: min(1, total - 1))
+    assert entries.draw() == 'user1'
+
+    # user1's tickets are gone, so ticket 1 now belongs to user2
+    assert entries.total == 3
+    assert entries.draw() == 'user2'
+    assert entries.draw() == 'user0'
+    assert entries.draw() is None